@@ -0,0 +1,86 @@
+"""End-to-end timing of the score calibration on a synthetic labelled dataset.
+
+Generates --rows observations (default: ~10 years of daily sunsets at 55 viewpoints) whose 1-5
+quality labels come from a hidden parameter set plus noise, then runs calibrate.py on it for each
+--workers value (dry run, nothing written) and shows how close the calibrated parameters get.
+Usage: python benchmarks/bench_calibration.py [--rows 200000] [--candidates 4000] [--workers 1,4]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "services", "lambda", "sunset-score"))
+sys.path.insert(0, SERVICE_DIR)
+
+import calibrate  # noqa: E402
+import scoring  # noqa: E402
+
+HIDDEN = {
+    "cloud_optimum": 55,
+    "cloud_slope": 0.9,
+    "humidity_threshold": 65,
+    "humidity_slope": 0.6,
+    "wind_threshold": 4,
+    "wind_slope": 5,
+    "visibility_threshold": 8000,
+    "visibility_scale": 500,
+    "pm25_threshold": 15,
+    "pm25_slope": 1.5,
+}
+
+
+def synthetic_dataset(path, rows, seed):
+    rng = np.random.default_rng(seed)
+    inputs = {
+        "clouds": rng.uniform(0, 100, rows),
+        "humidity": rng.uniform(20, 100, rows),
+        "wind": rng.gamma(2.0, 1.8, rows),
+        "visibility": rng.uniform(1000, 10000, rows),
+        "pm25": rng.gamma(2.0, 7.0, rows),
+    }
+    score, _terms = scoring.score_arrays(*inputs.values(), params={**scoring.PARAMS, **HIDDEN})
+    observed = score + rng.normal(0, 8, rows)
+    label = np.digitize(observed, np.quantile(observed, [0.2, 0.4, 0.6, 0.8])) + 1
+    np.savez(path, time=np.sort(rng.integers(1420070400, 1735689600, rows)), label=label, **inputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--candidates", type=int, default=4000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="calibration-")
+    try:
+        path = os.path.join(directory, "observations.npz")
+        synthetic_dataset(path, args.rows, args.seed)
+        for workers in dict.fromkeys(int(value) for value in args.workers.split(",")):
+            print(f"--- {workers} worker(s)")
+            started = time.perf_counter()
+            calibrate.main(
+                [
+                    path,
+                    "--dry-run",
+                    f"--candidates={args.candidates}",
+                    f"--rounds={args.rounds}",
+                    f"--workers={workers}",
+                    f"--seed={args.seed}",
+                ]
+            )
+            print(f"total {time.perf_counter() - started:.1f}s")
+        print("hidden parameters:")
+        print("  " + ", ".join(f"{name}={value}" for name, value in HIDDEN.items()))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
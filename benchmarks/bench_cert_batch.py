@@ -0,0 +1,118 @@
+"""Batch mode of the certificate requestor against stub ACM / Route 53, on a sped-up clock.
+
+Ensures --sites certificates (each with --names names) spread over --zones hosted zones, once as one
+custom resource per certificate run one after another (how multi-domain stacks deploy today) and
+once as a single batch resource, then repeats the batch as a no-op Update. ACM publishes validation
+records 3 s and issues --issue-after seconds after each request. Reports simulated seconds, ACM
+describes, Route 53 record set pages read, change batches and changes sent.
+Usage: python benchmarks/bench_cert_batch.py [--sites 12] [--names 4] [--zones 2] [--issue-after 180]
+"""
+import argparse
+import functools
+import importlib.util
+import os
+import random
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+HANDLER_PATH = os.path.join(BENCH_DIR, "..", "services", "lambda", "site-certificate-requestor", "lambda_function.py")
+
+import fakes  # noqa: E402
+
+
+def load_requestor():
+    spec = importlib.util.spec_from_file_location("certificate_requestor", HANDLER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def site_specs(sites, names, zones):
+    specs = []
+    for index in range(sites):
+        zone = index % zones
+        domain = f"site{index}.example{zone}.com"
+        specs.append({
+            "DomainName": domain,
+            "SubjectAlternativeNames": [f"n{extra}.{domain}" for extra in range(names - 1)],
+            "HostedZoneId": f"/hostedzone/ZBENCH{zone}"
+        })
+    return specs
+
+
+def run(requestor, clients, clock, events):
+    """Invoke the handler for each event in turn; returns simulated seconds and the last response."""
+    responses = []
+    requestor._client = lambda service, region=None: clients[service]
+    requestor._send_response = lambda event, context, status, data, physical_id, reason: responses.append(
+        (status, data, physical_id, reason)
+    )
+    started = clock()
+    for event in events:
+        requestor.handler(event, fakes.FakeLambdaContext(clock, 900))
+        status, _data, _physical_id, reason = responses[-1]
+        if status != "SUCCESS":
+            raise RuntimeError(reason)
+    return clock() - started, responses[-1]
+
+
+def report(label, elapsed, acm, route53):
+    print(
+        f"{label:<30} {elapsed:>8.0f} {acm.faults.calls:>9} {route53.list_pages:>10} "
+        f"{route53.change_batches:>8} {route53.changes:>8}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=12)
+    parser.add_argument("--names", type=int, default=4)
+    parser.add_argument("--zones", type=int, default=2)
+    parser.add_argument("--issue-after", type=float, default=180)
+    parser.add_argument("--speedup", type=float, default=200, help="simulated seconds per real second")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    requestor = load_requestor()
+    requestor.LOGGER.disabled = True
+    poller = requestor.Poller
+    os.environ["MAX_WAIT_SECONDS"] = "3600"
+    specs = site_specs(args.sites, args.names, args.zones)
+
+    def fresh():
+        clock = fakes.ScaledClock(args.speedup)
+        requestor.Poller = functools.partial(
+            poller, clock=clock, sleep=clock.sleep, rng=random.Random(args.seed)
+        )
+        acm = fakes.FakeAcm(records_after=3, issue_after=args.issue_after, clock=clock)
+        return clock, {"acm": acm, "route53": fakes.FakeRoute53(), "lambda": None}
+
+    print(
+        f"{args.sites} certificates x {args.names} names in {args.zones} zones, "
+        f"issued after {args.issue_after:.0f}s"
+    )
+    print(f"{'':<30} {'seconds':>8} {'describes':>9} {'r53 pages':>10} {'batches':>8} {'changes':>8}")
+
+    clock, clients = fresh()
+    events = [
+        {"RequestType": "Create", "RequestId": f"bench-{index}", "ResourceProperties": spec}
+        for index, spec in enumerate(specs)
+    ]
+    elapsed, _response = run(requestor, clients, clock, events)
+    report("one resource each, serial", elapsed, clients["acm"], clients["route53"])
+
+    clock, clients = fresh()
+    event = {"RequestType": "Create", "RequestId": "bench", "ResourceProperties": {"Certificates": specs}}
+    elapsed, (_status, _data, physical_id, _reason) = run(requestor, clients, clock, [event])
+    report("batch", elapsed, clients["acm"], clients["route53"])
+
+    acm, route53 = clients["acm"], clients["route53"]
+    acm.faults.calls = route53.list_pages = route53.change_batches = route53.changes = 0
+    update = {**event, "RequestType": "Update", "RequestId": "bench-update", "PhysicalResourceId": physical_id}
+    elapsed, _response = run(requestor, clients, clock, [update])
+    report("batch, no-op Update", elapsed, acm, route53)
+
+
+if __name__ == "__main__":
+    main()
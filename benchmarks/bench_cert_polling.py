@@ -0,0 +1,126 @@
+"""Simulated certificate waits in the requestor, on a fake clock, against stub ACM / Route 53 / Lambda.
+
+Runs the real handler for Create events where validation records appear after 3 s and the
+certificate is issued around --issue-after seconds (each value is a scenario of --trials runs spread
++/-25% around it), polling at the previous fixed 20 s interval, adaptively, and adaptively with
+hand-off to a new invocation. Reports the mean time between issuance and the CloudFormation
+response, ACM describes, invocations and billed seconds, and how many runs succeeded.
+Nothing sleeps for real, so the whole run takes well under a second.
+Usage: python benchmarks/bench_cert_polling.py [--issue-after 20,60,180,600,1500] [--timeout 900]
+"""
+import argparse
+import functools
+import importlib.util
+import os
+import random
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+HANDLER_PATH = os.path.join(BENCH_DIR, "..", "services", "lambda", "site-certificate-requestor", "lambda_function.py")
+
+import fakes  # noqa: E402
+
+POLICIES = {
+    "fixed 20 s (previous)": {"initial": 20, "backoff": 1, "jitter": 0, "reserve": 0},
+    "adaptive": {},
+    "adaptive + hand-off": {},
+}
+
+
+def load_requestor():
+    spec = importlib.util.spec_from_file_location("certificate_requestor", HANDLER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeLambda:
+    def __init__(self):
+        self.queued = []
+
+    def invoke(self, FunctionName, InvocationType, Payload):  # noqa: N803
+        assert InvocationType == "Event", InvocationType
+        self.queued.append((FunctionName, Payload))
+        return {"StatusCode": 202}
+
+
+def simulate(requestor, policy, issue_after, timeout, max_wait, seed):
+    clock = fakes.FakeClock()
+    acm = fakes.FakeAcm(records_after=3, issue_after=issue_after, clock=clock)
+    clients = {"acm": acm, "route53": fakes.FakeRoute53(), "lambda": FakeLambda()}
+    responses = []
+
+    requestor._client = lambda service, region=None: clients[service]
+    requestor._send_response = lambda event, context, status, *args: responses.append((status, clock()))
+    requestor.Poller = functools.partial(
+        POLLER, clock=clock, sleep=clock.sleep, rng=random.Random(seed), **POLICIES[policy]
+    )
+    requestor.HANDOFF_ENABLED = policy.endswith("hand-off")
+    os.environ["MAX_WAIT_SECONDS"] = str(max_wait)
+
+    event = {
+        "RequestType": "Create",
+        "RequestId": "bench",
+        "ResponseURL": "https://example.invalid/",
+        "ResourceProperties": {"DomainName": "example.com", "HostedZoneId": "/hostedzone/ZBENCH"},
+    }
+    started, billed, invocations = clock(), 0.0, 0
+    pending = [event]
+    while pending and clock() - started < 3600:
+        context = fakes.FakeLambdaContext(clock, timeout)
+        invoked_at = clock()
+        requestor.handler(pending.pop(0), context)
+        invocations += 1
+        # A handler still "running" at its timeout is killed by Lambda and never responds.
+        billed += min(clock() - invoked_at, timeout)
+        if clock() > context.deadline:
+            break
+        pending.extend(requestor.json.loads(payload) for _name, payload in clients["lambda"].queued)
+        clients["lambda"].queued.clear()
+
+    status, responded_at = responses[-1] if responses else ("NONE", clock())
+    return status == "SUCCESS", responded_at - (started + issue_after), acm.faults.calls, invocations, billed
+
+
+POLLER = None
+
+
+def main():
+    global POLLER  # pylint: disable=global-statement
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--issue-after", default="20,60,180,600,1500")
+    parser.add_argument("--timeout", type=float, default=900, help="Lambda timeout in seconds")
+    parser.add_argument("--max-wait", type=float, default=1800, help="MAX_WAIT_SECONDS with hand-off")
+    parser.add_argument("--trials", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    requestor = load_requestor()
+    requestor.LOGGER.disabled = True
+    POLLER = requestor.Poller
+
+    print(
+        f"{'issued after':>12}  {'policy':<24} {'ok':>5} {'lag s':>7} {'describes':>9} "
+        f"{'invocations':>11} {'billed s':>9}"
+    )
+    rng = random.Random(args.seed)
+    for issue_after in (float(value) for value in args.issue_after.split(",")):
+        times = [issue_after * rng.uniform(0.75, 1.25) for _ in range(args.trials)]
+        for policy in POLICIES:
+            max_wait = args.max_wait if policy.endswith("hand-off") else args.timeout
+            runs = [
+                simulate(requestor, policy, at, args.timeout, max_wait, args.seed + index)
+                for index, at in enumerate(times)
+            ]
+            succeeded = [run for run in runs if run[0]]
+            lag = sum(run[1] for run in succeeded) / len(succeeded) if succeeded else float("nan")
+            means = [sum(run[column] for run in runs) / len(runs) for column in (2, 3, 4)]
+            print(
+                f"{issue_after:>11.0f}s  {policy:<24} {len(succeeded):>2}/{len(runs):<2} {lag:>7.1f} "
+                f"{means[0]:>9.1f} {means[1]:>11.1f} {means[2]:>9.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Latency of no-op certificate Updates in the requestor, with and without the stored state record.
+
+Creates a single-certificate resource and a --sites certificate batch against stub ACM / Route 53
+with per-call latency, then sends Updates whose properties equal OldResourceProperties, and one
+that changes what is requested. Without a state store every Update re-describes the certificates and re-reads
+the hosted zones; with CERTIFICATE_STATE_DIR set an unchanged, already issued resource answers from
+the stored record.
+Usage: python benchmarks/bench_cert_update.py [--sites 12] [--describe-latency fixed:60] [--repeat 5]
+"""
+import argparse
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+HANDLER_PATH = os.path.join(BENCH_DIR, "..", "services", "lambda", "site-certificate-requestor", "lambda_function.py")
+
+import fakes  # noqa: E402
+
+
+def load_requestor():
+    spec = importlib.util.spec_from_file_location("certificate_requestor", HANDLER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def site(index):
+    domain = f"site{index}.example.com"
+    return {"DomainName": domain, "SubjectAlternativeNames": [f"www.{domain}"], "HostedZoneId": "/hostedzone/ZBENCH"}
+
+
+def invoke(requestor, event):
+    responses = []
+    requestor._send_response = lambda event, context, status, data, physical_id, reason: responses.append(
+        (status, physical_id, reason)
+    )
+    started = time.perf_counter()
+    requestor.handler(event, fakes.FakeLambdaContext())
+    elapsed = (time.perf_counter() - started) * 1000
+    status, physical_id, reason = responses[-1]
+    if status != "SUCCESS":
+        raise RuntimeError(reason)
+    return elapsed, physical_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=12)
+    parser.add_argument("--describe-latency", default="fixed:60")
+    parser.add_argument("--list-latency", default="fixed:150")
+    parser.add_argument("--route53-latency", default="fixed:80")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    requestor = load_requestor()
+    requestor.LOGGER.disabled = True
+    single = site(0)
+    batch = {"HostedZoneId": "/hostedzone/ZBENCH", "Certificates": [site(index) for index in range(args.sites)]}
+    # Each resource with the properties of its first Update and of the one that changes something.
+    resources = {
+        "single": (single, {**single, "SubjectAlternativeNames": ["www.site0.example.com", "api.site0.example.com"]}),
+        f"batch of {args.sites}": (batch, {**batch, "Certificates": [*batch["Certificates"], site(args.sites)]}),
+    }
+    print(f"{'resource':<14} {'state store':<12} {'update':<16} {'ms':>8} {'describes':>9} {'r53 calls':>9}")
+    directory = tempfile.mkdtemp(prefix="certificate-state-")
+    try:
+        for store in ("none", "local"):
+            local = store == "local"
+            requestor.state_store = requestor.LocalStateStore(os.path.join(directory, store)) if local else None
+            for label, (props, changed) in resources.items():
+                acm = fakes.FakeAcm(describe_latency=args.describe_latency, list_latency=args.list_latency)
+                route53 = fakes.FakeRoute53(args.route53_latency)
+                clients = {"acm": acm, "route53": route53}
+                requestor._client = lambda service, region=None, clients=clients: clients[service]
+                base = {"StackId": "stack/bench", "LogicalResourceId": label, "ResponseURL": "https://example.invalid/"}
+                _elapsed, physical_id = invoke(
+                    requestor, {**base, "RequestType": "Create", "RequestId": "create", "ResourceProperties": props}
+                )
+                update = {
+                    **base,
+                    "RequestType": "Update",
+                    "PhysicalResourceId": physical_id,
+                    "ResourceProperties": props,
+                    "OldResourceProperties": props,
+                }
+                timings = []
+                acm.faults.calls = route53.faults.calls = 0
+                for attempt in range(args.repeat):
+                    timings.append(invoke(requestor, {**update, "RequestId": f"update-{attempt}"})[0])
+                print(
+                    f"{label:<14} {store:<12} {'unchanged':<16} {min(timings):>8.1f} "
+                    f"{acm.faults.calls / args.repeat:>9.0f} {route53.faults.calls / args.repeat:>9.0f}"
+                )
+                acm.faults.calls = route53.faults.calls = 0
+                elapsed, _physical_id = invoke(
+                    requestor, {**update, "RequestId": "update-names", "ResourceProperties": changed}
+                )
+                print(
+                    f"{label:<14} {store:<12} {'changed':<16} {elapsed:>8.1f} "
+                    f"{acm.faults.calls:>9} {route53.faults.calls:>9}"
+                )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Existing-certificate lookup in the certificate requestor against a stubbed ACM with hundreds of certificates.
+
+The account holds --certificates certificates; --reissued of them share the site's domain
+(superseded reissues with other names, pending and imported copies) and only the last one, the
+live ISSUED certificate, has exactly the site's names. Runs once for a 2-name certificate, whose list summaries show
+every name, and once for a 12-name one, whose summaries are truncated. Compares the previous
+serial loop with _find_existing_certificate and a whole Create that reuses the certificate.
+Usage: python benchmarks/bench_certificates.py [--certificates 400] [--reissued 60] [--describe-latency fixed:60]
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+HANDLER_PATH = os.path.join(BENCH_DIR, "..", "services", "lambda", "site-certificate-requestor", "lambda_function.py")
+
+import fakes  # noqa: E402
+
+DOMAIN = "example.com"
+
+
+def load_requestor():
+    spec = importlib.util.spec_from_file_location("certificate_requestor", HANDLER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def site_names(count):
+    return [f"www{index or ''}.example.com" for index in range(count - 1)]
+
+
+def account(total, reissued, sans):
+    """Unrelated certificates, then reissues of the site (superseded, failed, imported), then the live one."""
+    certificates = [
+        fakes.acm_certificate(f"arn:other-{index}", f"site{index}.example.net", []) for index in range(total - reissued)
+    ]
+    for index in range(reissued - 1):
+        variant = index % 4
+        if variant == 0:
+            cert = fakes.acm_certificate(f"arn:superseded-{index}", DOMAIN, [*sans, f"old{index}.example.com"])
+        elif variant == 1:
+            cert = fakes.acm_certificate(f"arn:apex-only-{index}", DOMAIN, [], status="INACTIVE")
+        elif variant == 2:
+            cert = fakes.acm_certificate(
+                f"arn:pending-{index}", DOMAIN, [f"api{index}.example.com"], "PENDING_VALIDATION"
+            )
+        else:
+            cert = fakes.acm_certificate(
+                f"arn:imported-{index}", DOMAIN, [*sans, "cdn.example.com"], cert_type="IMPORTED"
+            )
+        certificates.append(cert)
+    certificates.append(fakes.acm_certificate("arn:current", DOMAIN, sans))
+    return certificates
+
+
+def serial_lookup(acm, domain, sans):
+    """The lookup as it was: describe every summary whose domain matches, one at a time."""
+    sans_set = set(sans)
+    for page in acm.get_paginator("list_certificates").paginate(
+        CertificateStatuses=["ISSUED", "PENDING_VALIDATION", "INACTIVE"]
+    ):
+        for summary in page.get("CertificateSummaryList", []):
+            if summary.get("DomainName") != domain:
+                continue
+            description = acm.describe_certificate(CertificateArn=summary["CertificateArn"])["Certificate"]
+            cert_sans = {name for name in description.get("SubjectAlternativeNames", []) if name != domain}
+            if cert_sans == sans_set:
+                return description
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--certificates", type=int, default=400)
+    parser.add_argument("--reissued", type=int, default=60)
+    parser.add_argument("--describe-latency", default="fixed:60")
+    parser.add_argument("--list-latency", default="fixed:150")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    requestor = load_requestor()
+    for names in (2, 12):
+        sans = site_names(names)
+        certificates = account(args.certificates, args.reissued, sans)
+        print(f"{names}-name certificate (summaries {'truncated' if names > 10 else 'complete'}):")
+        run(requestor, certificates, sans, args)
+
+
+def run(requestor, certificates, sans, args):
+    def fresh_acm():
+        return fakes.FakeAcm(certificates, args.describe_latency, args.list_latency)
+
+    def report(label, started, acm, found):
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"  {label:<30} {elapsed:>6.0f} ms {acm.faults.calls:>4} describes  {found['CertificateArn']}")
+
+    acm = fresh_acm()
+    started = time.perf_counter()
+    report("serial (previous)", started, acm, serial_lookup(acm, DOMAIN, sans))
+
+    for concurrency in dict.fromkeys((1, args.concurrency)):
+        acm = fresh_acm()
+        lookup = requestor.CertificateLookup(acm, concurrency=concurrency)
+        started = time.perf_counter()
+        found = requestor._find_existing_certificate(lookup, DOMAIN, sans)
+        report(f"filtered, {concurrency} worker(s)", started, acm, found)
+
+    acm = fresh_acm()
+    started = time.perf_counter()
+    arn, status = requestor._ensure_certificate(
+        {"RequestId": "bench"},
+        requestor.CertificateLookup(acm, concurrency=args.concurrency),
+        fakes.FakeRoute53(),
+        DOMAIN,
+        sans,
+        "/hostedzone/ZBENCH",
+        None,
+        False,
+        requestor.Poller(60),
+        None,
+    )
+    report(f"whole Create ({status})", started, acm, {"CertificateArn": arn})
+
+
+if __name__ == "__main__":
+    main()
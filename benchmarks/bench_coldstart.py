@@ -0,0 +1,197 @@
+"""Import time and first-request latency per Lambda handler, each in a fresh interpreter.
+
+Every run starts a new `python -X importtime` process, so nothing is shared between measurements.
+AWS and OpenWeather calls are stubbed (clients are still really constructed inside the timed request),
+and pre-warm network calls are disabled, so the numbers are offline and repeatable.
+Usage: python benchmarks/bench_coldstart.py [--runs 3] [--top 8] [--prewarm]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+LAMBDA_DIR = os.path.join(ROOT, "services", "lambda")
+SHARED_DIR = os.path.join(LAMBDA_DIR, "shared", "python")
+HANDLERS = {
+    "generate-card": os.path.join(LAMBDA_DIR, "generate-card"),
+    "sunset-score": os.path.join(LAMBDA_DIR, "sunset-score"),
+    "site-certificate-requestor": os.path.join(LAMBDA_DIR, "site-certificate-requestor"),
+}
+BASE_ENV = {
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "bench",
+    "AWS_SECRET_ACCESS_KEY": "bench",
+    "AWS_EC2_METADATA_DISABLED": "true",
+    "OUTPUT_BUCKET": "bench-bucket",
+    "IMAGE_CACHE_ENABLED": "0",
+    "OPENWEATHER_API": "bench",
+    "SCORE_TILE_URI": "",
+}
+
+
+class _Body:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def read(self):
+        return self.payload
+
+
+def _generate_card_request(module):
+    import base64  # pylint: disable=import-outside-toplevel
+    from io import BytesIO  # pylint: disable=import-outside-toplevel
+
+    from PIL import Image  # pylint: disable=import-outside-toplevel
+
+    buffer = BytesIO()
+    Image.new("RGB", (1024, 1024), (240, 140, 60)).save(buffer, format="PNG")
+    body = json.dumps({"images": [base64.b64encode(buffer.getvalue()).decode("ascii")]}).encode()
+
+    def first():
+        module.bedrock.get().invoke_model = lambda **_kwargs: {"body": _Body(body)}
+        module.s3.get().put_object = lambda **_kwargs: {}
+        event = {"httpMethod": "POST", "body": json.dumps({"location": "宍道湖"})}
+        return module.lambda_handler(event, None)["statusCode"]
+
+    return first
+
+
+def _sunset_score_request(module):
+    import openweather  # pylint: disable=import-outside-toplevel
+
+    canned = {
+        "weather": {
+            "clouds": {"all": 40}, "main": {"humidity": 60}, "wind": {"speed": 3}, "visibility": 10000,
+            "coord": {"lat": 35.468, "lon": 133.048}, "timezone": 32400, "weather": [{"description": "clouds"}],
+        },
+        "air_pollution": {"list": [{"components": {"pm2_5": 8.0}}]},
+    }
+
+    def first():
+        openweather.session()
+        openweather.get_json = lambda path, _params, _timeout=None: canned[path]
+        return module.lambda_handler({"httpMethod": "GET", "queryStringParameters": {}}, None)["statusCode"]
+
+    return first
+
+
+def _certificate_request(module):
+    def first():
+        module._client("acm", "us-east-1")
+        module._client("route53")
+        module.handler({"RequestType": "Delete", "ResourceProperties": {"DomainName": "a", "HostedZoneId": "Z"}}, None)
+        return 200
+
+    return first
+
+
+REQUESTS = {
+    "generate-card": _generate_card_request,
+    "sunset-score": _sunset_score_request,
+    "site-certificate-requestor": _certificate_request,
+}
+
+
+def run_worker(name):
+    import logging  # pylint: disable=import-outside-toplevel
+
+    logging.disable(logging.CRITICAL)
+    sys.path[:0] = [HANDLERS[name], SHARED_DIR]
+    if os.path.isdir(SHARED_DIR):
+        import coldstart  # pylint: disable=import-outside-toplevel
+
+        # Still build the client (the expensive local part) but skip the network round trip.
+        coldstart.open_connection = lambda client, *_args, **_kwargs: getattr(client, "get", lambda: None)()
+
+    started = time.perf_counter()
+    import lambda_function  # pylint: disable=import-outside-toplevel
+
+    import_ms = (time.perf_counter() - started) * 1000
+    heavy_at_import = sorted(module for module in ("boto3", "requests", "numpy", "PIL.Image") if module in sys.modules)
+    request = REQUESTS[name](lambda_function)
+
+    timings = []
+    for _ in range(2):
+        started = time.perf_counter()
+        request()
+        timings.append((time.perf_counter() - started) * 1000)
+    print(json.dumps({"importMs": import_ms, "firstMs": timings[0], "secondMs": timings[1], "loaded": heavy_at_import}))
+
+
+def import_breakdown(stderr, top):
+    """Direct imports of lambda_function from -X importtime output, by cumulative microseconds."""
+    pending = []
+    for line in stderr.splitlines():
+        parts = line[len("import time:"):].split("|") if line.startswith("import time:") else []
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        self_us, cumulative_us, name = parts
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        module = name.strip()
+        if depth == 0:
+            if module == "lambda_function":
+                children = sorted(pending, key=lambda item: item[1], reverse=True)[:top]
+                return int(self_us), children
+            pending = []
+        elif depth == 1:
+            pending.append((module, int(cumulative_us)))
+    return 0, []
+
+
+def measure(name, prewarm, runs, top):
+    env = {**os.environ, **BASE_ENV, "PREWARM_ON_INIT": "1" if prewarm else "0"}
+    results = []
+    breakdown = (0, [])
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", __file__, "--worker", name],
+            check=True,
+            capture_output=True,
+            text=True,
+            env=env,
+            cwd=HANDLERS[name],
+        )
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+        breakdown = import_breakdown(completed.stderr, top)
+    return results, breakdown
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--prewarm", action="store_true", help="also measure with PREWARM_ON_INIT=1")
+    parser.add_argument("--worker", choices=sorted(HANDLERS))
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker)
+        return
+
+    modes = [False, True] if args.prewarm else [False]
+    print(f"{'handler':<28} {'init':<8} {'import ms':>10} {'1st req ms':>11} {'2nd req ms':>11}  loaded at import")
+    breakdowns = {}
+    for name in HANDLERS:
+        for prewarm in modes:
+            results, breakdown = measure(name, prewarm, args.runs, args.top)
+            breakdowns.setdefault(name, breakdown)
+            median = {key: statistics.median(result[key] for result in results) for key in ("importMs", "firstMs", "secondMs")}
+            mode = "prewarm" if prewarm else "lazy"
+            loaded = ", ".join(results[-1]["loaded"]) or "-"
+            print(
+                f"{name:<28} {mode:<8} {median['importMs']:>10.1f} {median['firstMs']:>11.1f} "
+                f"{median['secondMs']:>11.1f}  {loaded}"
+            )
+
+    for name, (self_us, children) in breakdowns.items():
+        print(f"\n-X importtime, {name} (lambda_function self {self_us / 1000:.1f} ms); top direct imports:")
+        for module, cumulative_us in children:
+            print(f"  {module:<32} {cumulative_us / 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
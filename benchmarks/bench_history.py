@@ -0,0 +1,107 @@
+"""Append and range/radius query speed of the columnar score history.
+
+Writes --rows synthetic scores spread over --days of tile runs across the San'in region into a
+temporary directory, then times queries for a month, a season and the whole range, each with and
+without a 15 km radius around Matsue, and a 30-day query by sunset time.
+Usage: python benchmarks/bench_history.py [--rows 5000000] [--days 365] [--repeat 5]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "services", "lambda", "sunset-score"))
+sys.path.insert(0, SERVICE_DIR)
+
+import history  # noqa: E402
+import scoring  # noqa: E402
+
+ORIGIN = 1735657200  # 2025-01-01 00:00 JST
+MATSUE = (35.468, 133.048)
+
+
+def synthetic_rows(count, days, seed):
+    rng = np.random.default_rng(seed)
+    times = np.sort(rng.integers(ORIGIN, ORIGIN + days * 86400, count))
+    score, terms = scoring.score_arrays(
+        rng.uniform(0, 100, count),
+        rng.uniform(20, 100, count),
+        rng.uniform(0, 12, count),
+        rng.uniform(1000, 10000, count),
+        rng.uniform(0, 60, count),
+    )
+    return {
+        "time": times,
+        "sunset": times // 86400 * 86400 + 9 * 3600,
+        "lat": rng.uniform(34.3, 35.7, count),
+        "lon": rng.uniform(131.6, 134.5, count),
+        "score": score,
+        "kind": np.full(count, history.KINDS.index("tile")),
+        **terms,
+    }
+
+
+def timed(func, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="score-history-")
+    try:
+        store = history.HistoryStore(directory)
+        rows = synthetic_rows(args.rows, args.days, args.seed)
+        batch = 435  # one tile run over the default grid
+        started = time.perf_counter()
+        for first in range(0, min(args.rows, 200 * batch), batch):
+            store.append({name: values[first:first + batch] for name, values in rows.items()})
+        small_ms = (time.perf_counter() - started) * 1000 / min(200, -(-args.rows // batch))
+        remaining = min(args.rows, 200 * batch)
+        started = time.perf_counter()
+        store.append({name: values[remaining:] for name, values in rows.items()})
+        bulk_s = time.perf_counter() - started
+        stats = store.stats()
+        print(
+            f"{stats['rows']:,} rows in {stats['segments']} segments, {stats['bytesPerRow']} bytes/row; "
+            f"append {small_ms:.2f} ms per {batch}-row batch, bulk {bulk_s:.2f} s"
+        )
+
+        print(f"{'query':<34} {'ms':>8} {'rows':>10} {'mean score':>11}")
+        for label, days in (("30 days", 30), ("90 days", 90), (f"{args.days} days", args.days)):
+            end = ORIGIN + days * 86400
+            for radius in (None, 15.0):
+                elapsed, result = timed(
+                    lambda end=end, radius=radius: store.query(
+                        ORIGIN, end, *MATSUE, radius_km=radius, columns=("time", "score")
+                    ),
+                    args.repeat,
+                )
+                name = f"{label}" + (f", {radius:.0f} km radius" if radius else "")
+                mean = float(result["score"].astype(np.float64).mean()) if result["score"].size else 0.0
+                print(f"{name:<34} {elapsed:>8.2f} {result['score'].size:>10,} {mean:>11.1f}")
+
+        elapsed, result = timed(
+            lambda: store.query(ORIGIN, ORIGIN + 30 * 86400, *MATSUE, radius_km=15.0, by="sunset"), args.repeat
+        )
+        print(f"{'30 days by sunset, 15 km radius':<34} {elapsed:>8.2f} {result['score'].size:>10,}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
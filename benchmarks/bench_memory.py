@@ -0,0 +1,95 @@
+"""Peak Python allocation per card (tracemalloc) from Bedrock response to S3 put, with a budget check.
+
+Bedrock and S3 are stubbed; the response carries a realistic 1024px PNG. Exits non-zero when the
+pipeline's peak exceeds --max-peak-mib, so it can gate a Lambda memory-size reduction.
+Pillow's pixel buffers are allocated outside the Python allocator and are not counted.
+Usage: python benchmarks/bench_memory.py [--cards 3] [--size 1024] [--max-peak-mib 6]
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import tracemalloc
+from io import BytesIO
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "services", "lambda", "generate-card"))
+SHARED_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "services", "lambda", "shared", "python"))
+sys.path[:0] = [SERVICE_DIR, SHARED_DIR]
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("IMAGE_CACHE_ENABLED", "0")
+os.environ.setdefault("OUTPUT_BUCKET", "benchmark-bucket")
+
+from PIL import Image  # noqa: E402
+
+import lambda_function  # noqa: E402
+
+MIB = 1024 * 1024
+
+
+class FakeBody:
+    def __init__(self, payload):
+        self._stream = BytesIO(payload)
+
+    def read(self):
+        return self._stream.read()
+
+
+def titan_response(size):
+    sky = Image.linear_gradient("L").resize((size, size))
+    noise = Image.effect_noise((size, size), 30)
+    image = Image.merge("RGB", [Image.blend(sky.rotate(angle), noise, 0.25) for angle in (0, 90, 180)])
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return json.dumps({"images": [base64.b64encode(buffer.getvalue()).decode("ascii")], "error": None}).encode()
+
+
+def legacy_decode(payload):
+    """Former response handling: parse the whole body, then decode the base64 str."""
+    parsed = json.loads(payload.decode("utf-8"))
+    return base64.b64decode(lambda_function._extract_image_base64(parsed))
+
+
+def peak_of(func, *args):
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    result = func(*args)
+    return result, tracemalloc.get_traced_memory()[1] - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=3)
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--max-peak-mib", type=float, default=6.0)
+    args = parser.parse_args()
+
+    payload = titan_response(args.size)
+    uploaded = []
+    lambda_function.bedrock.invoke_model = lambda **_kwargs: {"body": FakeBody(payload)}
+    lambda_function.s3.put_object = lambda **kwargs: uploaded.append(len(kwargs["Body"]))
+    card = lambda_function.CardRequest(
+        location="宍道湖 嫁ヶ島", date="2025-11-07", style="gradient", text_size="md",
+        score="80", sunset_time="17:05", conditions="clear sky", prompt=None,
+    )
+    lambda_function._render_card(card, "warmup")  # fonts, text masks, gradient band
+
+    tracemalloc.start()
+    _image, legacy_peak = peak_of(legacy_decode, payload)
+    _images, decode_peak = peak_of(lambda_function._invoke_bedrock, {})
+    card_peaks = [peak_of(lambda_function._render_card, card, f"card-{index}")[1] for index in range(args.cards)]
+    tracemalloc.stop()
+
+    print(f"Bedrock response: {len(payload) / MIB:.2f} MiB")
+    print(f"response decode peak, legacy json.loads: {legacy_peak / MIB:8.2f} MiB")
+    print(f"response decode peak, current:           {decode_peak / MIB:8.2f} MiB")
+    print(f"per-card pipeline peak (max of {args.cards}):   {max(card_peaks) / MIB:8.2f} MiB")
+    print(f"objects uploaded per card: {len(uploaded) // (args.cards + 1)}")
+    if max(card_peaks) > args.max_peak_mib * MIB:
+        print(f"FAIL: peak exceeds {args.max_peak_mib} MiB")
+        sys.exit(1)
+    print(f"OK: peak within {args.max_peak_mib} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Compare the band-only `_overlay_text` against the former full-frame implementation.
+
+Each implementation runs in a fresh interpreter so peak RSS is not shared.
+Usage: python benchmarks/bench_overlay.py [--cards 20] [--size 1024]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from io import BytesIO
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "services", "lambda", "generate-card"))
+SHARED_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "services", "lambda", "shared", "python"))
+sys.path[:0] = [SERVICE_DIR, SHARED_DIR]
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("IMAGE_CACHE_ENABLED", "0")
+os.environ.setdefault("OUTPUT_BUCKET", "benchmark-bucket")
+
+
+def legacy_overlay_text(image_bytes, card):
+    """Pre-optimisation implementation: per-row gradient lines and full-frame RGBA composite."""
+    from PIL import Image, ImageDraw  # pylint: disable=import-outside-toplevel
+
+    import lambda_function  # pylint: disable=import-outside-toplevel
+
+    with Image.open(BytesIO(image_bytes)).convert("RGBA") as base:
+        width, height = base.size
+        overlay = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(overlay)
+
+        gradient_height = int(height * 0.4)
+        for y in range(gradient_height):
+            alpha = int(220 * (y / gradient_height))
+            draw.line([(0, height - y), (width, height - y)], fill=(13, 16, 35, alpha))
+
+        size_multiplier = 1.2 if card.text_size == "lg" else 1.0
+        font_large = lambda_function._load_font(int(width * 0.08 * size_multiplier))
+        font_medium = lambda_function._load_font(int(width * 0.045 * size_multiplier))
+        font_small = lambda_function._load_font(int(width * 0.035 * size_multiplier))
+
+        padding = int(width * 0.06)
+        draw.text((padding, height - gradient_height + padding), f"Sunset Score {card.score}",
+                  font=font_large, fill=(255, 255, 255, 240))
+        draw.text((padding, height - gradient_height + padding + font_large.size + 12),
+                  f"{card.date} | 日の入り {card.sunset_time}", font=font_medium, fill=(255, 223, 186, 235))
+        draw.text((padding, height - padding * 0.4), f"{card.location} — {card.conditions}",
+                  font=font_small, fill=(255, 200, 137, 235))
+        draw.text((width - 40, height - 40), f"Sunset {card.sunset_time} JST",
+                  font=font_small, anchor="rd", fill=(255, 255, 255, 230))
+
+        composed = Image.alpha_composite(base, overlay)
+        buffer = BytesIO()
+        composed.convert("RGB").save(buffer, format="JPEG", quality=92, optimize=True)
+        buffer.seek(0)
+        return buffer.read()
+
+
+def sample_inputs(size):
+    from PIL import Image  # pylint: disable=import-outside-toplevel
+
+    import lambda_function  # pylint: disable=import-outside-toplevel
+
+    pixels = bytes((x * 7 + y * 3) % 256 for y in range(64) for x in range(64))
+    noise = Image.frombytes("L", (64, 64), pixels).resize((size, size))
+    image = Image.merge("RGB", (noise, noise.rotate(90), noise.rotate(180)))
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    card = lambda_function.CardRequest(
+        location="宍道湖 嫁ヶ島", date="2025-11-07", style="gradient", text_size="md",
+        score="80", sunset_time="17:05", conditions="clear sky", prompt=None,
+    )
+    return buffer.getvalue(), card
+
+
+def run_worker(impl, cards, size):
+    import lambda_function  # pylint: disable=import-outside-toplevel
+
+    func = legacy_overlay_text if impl == "legacy" else lambda_function._overlay_text
+    image_bytes, card = sample_inputs(size)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    func(image_bytes, card)  # warm fonts and caches
+    started = time.perf_counter()
+    for _ in range(cards):
+        output = func(image_bytes, card)
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"msPerCard": elapsed * 1000 / cards, "peakDeltaKiB": peak - baseline, "bytes": len(output)}))
+
+
+def compare_pixels(size):
+    from PIL import Image, ImageChops  # pylint: disable=import-outside-toplevel
+
+    import lambda_function  # pylint: disable=import-outside-toplevel
+
+    image_bytes, card = sample_inputs(size)
+    legacy = Image.open(BytesIO(legacy_overlay_text(image_bytes, card)))
+    current = Image.open(BytesIO(lambda_function._overlay_text(image_bytes, card)))
+    diff = ImageChops.difference(legacy, current).getextrema()
+    return max(high for _low, high in diff)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=20)
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--worker", choices=("legacy", "current"))
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.cards, args.size)
+        return
+
+    results = {}
+    for impl in ("legacy", "current"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--worker", impl, "--cards", str(args.cards), "--size", str(args.size)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        results[impl] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'impl':<8} {'ms/card':>9} {'peak RSS Δ KiB':>15} {'jpeg bytes':>11}")
+    for impl, result in results.items():
+        print(f"{impl:<8} {result['msPerCard']:>9.2f} {result['peakDeltaKiB']:>15} {result['bytes']:>11}")
+    print(f"max pixel difference: {compare_pixels(args.size)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Pre-sunset card traffic with and without the pre-generation job, against stub Bedrock and S3.
+
+Runs pregen.handler as a dry run and then for real, 90 minutes before today's sunset, with a stubbed
+sunset-score answer. Then it replays --requests live card requests at --concurrency: each picks a
+popular combination by its share, and --custom of them ask for another location. The replay is run
+once with the card index and once without it (image cache on in both), from empty caches, and
+reports latency percentiles and the Bedrock calls made during the peak.
+Usage: python benchmarks/bench_pregen.py [--requests 300] [--concurrency 8] [--bedrock-latency lognormal:6000,0.3]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDA_DIR = os.path.join(BENCH_DIR, "..", "services", "lambda")
+sys.path[:0] = [os.path.join(LAMBDA_DIR, "generate-card"), os.path.join(LAMBDA_DIR, "shared", "python")]
+
+import fakes  # noqa: E402
+
+SCORE_PAYLOAD = {"score": 78.5, "sunsetTime": "18:40", "metrics": {"weather": "Few Clouds"}}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def live_payloads(pregen, count, custom, seed):
+    """Requests as the web page sends them after reading the same sunset-score answer."""
+    rng = random.Random(seed)
+    popular = pregen.load_popular()
+    score, conditions = pregen.card_fields(SCORE_PAYLOAD)
+    today = datetime.now(pregen.lambda_function.JST).date().isoformat()
+    payloads = []
+    for _ in range(count):
+        if rng.random() < custom:
+            entry = {"location": f"カスタム地点 {rng.randint(1, 20)}", "style": "gradient", "textSize": "md"}
+        else:
+            entry = rng.choices(popular, weights=[item["share"] for item in popular])[0]
+        payloads.append(
+            {
+                "location": entry["location"],
+                "date": today,
+                "conditions": conditions,
+                "score": int(score),
+                "sunsetTime": SCORE_PAYLOAD["sunsetTime"],
+                "style": entry["style"],
+                "textSize": entry["textSize"],
+            }
+        )
+    return payloads
+
+
+def replay(card, payloads, concurrency):
+    def one(payload):
+        started = time.perf_counter()
+        response = card.lambda_handler({"httpMethod": "POST", "body": json.dumps(payload)}, None)
+        elapsed = (time.perf_counter() - started) * 1000
+        return elapsed, response["statusCode"], json.loads(response["body"]).get("pregenerated", False)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, payloads))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--custom", type=float, default=0.1, help="share of requests for unlisted locations")
+    parser.add_argument("--bedrock-latency", default="lognormal:6000,0.3")
+    parser.add_argument("--s3-latency", default="lognormal:40,0.4")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    directory = tempfile.mkdtemp(prefix="pregen-")
+    os.environ.update(
+        OUTPUT_BUCKET="bench-bucket",
+        ADMISSION_ENABLED="0",
+        IMAGE_CACHE_DIR=os.path.join(directory, "image-cache"),
+        PREGEN_INDEX_DIR=os.path.join(directory, "index"),
+        TELEMETRY_SAMPLE_RATE="0",
+    )
+    try:
+        import card_index  # pylint: disable=import-outside-toplevel
+        import image_cache  # pylint: disable=import-outside-toplevel
+        import lambda_function as card  # pylint: disable=import-outside-toplevel
+        import pregen  # pylint: disable=import-outside-toplevel
+
+        bedrock = fakes.FakeBedrock(args.bedrock_latency, seed=args.seed)
+        card.bedrock_invoker.primary.client = bedrock
+        card.s3 = fakes.FakeS3(args.s3_latency, seed=args.seed)
+        pregen.fetch_score = lambda lat, lon: SCORE_PAYLOAD
+        at = card.compute_sunset_jst(datetime.now(card.JST).date()) - timedelta(minutes=90)
+
+        plan = pregen.handler({"dryRun": True, "at": at.isoformat()}, None)
+        print(
+            f"sunset {plan['sunset']}, render window {plan['windowStart']}-{plan['windowStop']}, "
+            f"dry run at {at:%H:%M}:"
+        )
+        print("  " + json.dumps(plan["estimate"]))
+        started = time.perf_counter()
+        result = pregen.handler({"at": at.isoformat()}, None)
+        print(
+            f"pre-generation: {result['rendered']} cards in {time.perf_counter() - started:.1f}s, "
+            f"{bedrock.faults.calls} Bedrock calls; rerun renders "
+            f"{pregen.handler({'at': at.isoformat()}, None)['rendered']}"
+        )
+
+        payloads = live_payloads(pregen, args.requests, args.custom, args.seed)
+        print(f"\n{args.requests} live requests at concurrency {args.concurrency}:")
+        print(f"{'':<18} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'from index':>10} {'bedrock':>8} {'errors':>6}")
+        for label, index in (("without index", None), ("with index", card.card_index)):
+            # Each replay starts from an empty image cache, as the peak would without the job.
+            cache_dir = os.path.join(directory, f"image-cache-{label.replace(' ', '-')}")
+            card.image_cache = image_cache.ImageCache(image_cache.LocalImageStore(cache_dir))
+            card.card_index = index
+            bedrock.faults.calls = 0
+            results = replay(card, payloads, args.concurrency)
+            latencies = [elapsed for elapsed, _status, _hit in results]
+            print(
+                f"{label:<18} {percentile(latencies, 0.5):>8.0f} {percentile(latencies, 0.95):>8.0f} "
+                f"{max(latencies):>8.0f} {sum(hit for _e, _s, hit in results):>10} {bedrock.faults.calls:>8} "
+                f"{sum(status != 200 for _e, status, _h in results):>6}"
+            )
+        assert isinstance(card.card_index, card_index.CardIndex)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Encoded size and encode time per rendition format and quality for a composited card.
+
+Usage: python benchmarks/bench_renditions.py [--size 1024] [--repeat 5] [--qualities 50,65,80,92]
+"""
+import argparse
+import os
+import sys
+import time
+from io import BytesIO
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "services", "lambda", "generate-card"))
+SHARED_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "services", "lambda", "shared", "python"))
+sys.path[:0] = [SERVICE_DIR, SHARED_DIR]
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("IMAGE_CACHE_ENABLED", "0")
+os.environ.setdefault("OUTPUT_BUCKET", "benchmark-bucket")
+
+from PIL import Image  # noqa: E402
+
+import lambda_function  # noqa: E402
+import renditions  # noqa: E402
+
+
+def sunset_frame(size):
+    """Smooth sky gradient with fine noise, closer to a Titan photo than flat noise."""
+    sky = Image.linear_gradient("L").resize((size, size))
+    noise = Image.effect_noise((size, size), 18)
+    red = Image.blend(sky.point(lambda v: 255 - v // 3), noise, 0.15)
+    green = Image.blend(sky.point(lambda v: 200 - v // 2), noise, 0.15)
+    blue = Image.blend(sky.point(lambda v: 90 + v // 2), noise, 0.15)
+    buffer = BytesIO()
+    Image.merge("RGB", (red, green, blue)).save(buffer, format="PNG")
+    card = lambda_function.CardRequest(
+        location="宍道湖 嫁ヶ島", date="2025-11-07", style="gradient", text_size="md",
+        score="80", sunset_time="17:05", conditions="clear sky", prompt=None,
+    )
+    return lambda_function._compose_card(buffer.getvalue(), card)
+
+
+def measure(image, rendition, repeat):
+    renditions.encode(image, rendition)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        body = renditions.encode(image, rendition)
+    return len(body), (time.perf_counter() - started) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--qualities", default="50,65,80,92")
+    args = parser.parse_args()
+
+    frame = sunset_frame(args.size)
+    qualities = [int(value) for value in args.qualities.split(",")]
+    widths = sorted({rendition.width or args.size for rendition in renditions.RENDITIONS})
+    sizes = {width: frame if width >= frame.width else frame.resize((width, width), Image.LANCZOS) for width in widths}
+
+    print(f"{'format':<6} {'width':>6} {'quality':>8} {'bytes':>9} {'encode ms':>10}")
+    for rendition in renditions.RENDITIONS:
+        if not renditions.supported(rendition.format):
+            print(f"{rendition.format:<6} {'-':>6} {'-':>8} {'unsupported by this Pillow build':>30}")
+            continue
+        width = rendition.width or args.size
+        for quality in sorted(set(qualities) | {rendition.quality}):
+            candidate = renditions.Rendition(
+                rendition.name, rendition.format, rendition.content_type, rendition.extension,
+                rendition.width, quality, rendition.options,
+            )
+            size, elapsed = measure(sizes[width], candidate, args.repeat)
+            marker = " *" if quality == rendition.quality else ""
+            print(f"{rendition.format:<6} {width:>6} {quality:>8} {size:>9} {elapsed:>10.2f}{marker}")
+    print("* current setting")
+
+
+if __name__ == "__main__":
+    main()
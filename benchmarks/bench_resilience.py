@@ -0,0 +1,174 @@
+"""Bedrock retry / hedging / circuit-breaker behaviour against fake clients that throttle and stall.
+
+Latencies are scaled down (hundreds of ms instead of seconds) together with the deadline and backoff,
+so each scenario runs in seconds. Compares a single bare invoke_model call with BedrockInvoker on:
+a 30% throttle rate, a heavy latency tail (hedged to a second fake), a full outage (breaker) and the
+breaker's half-open probe and recovery. Checks the expected behaviour along the way (retries recover
+throttled calls, hedging cuts the tail, the breaker opens and limits primary calls, one probe per
+cooldown, no request outlives its deadline) and exits non-zero if any check fails.
+Usage: python benchmarks/bench_resilience.py [--requests 60] [--concurrency 4]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SERVICE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "services", "lambda", "generate-card"))
+SHARED_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "services", "lambda", "shared", "python"))
+sys.path[:0] = [SERVICE_DIR, SHARED_DIR]
+
+import fakes  # noqa: E402
+import resilience  # noqa: E402
+
+BODY = json.dumps({"taskType": "TEXT_IMAGE", "imageGenerationConfig": {"numberOfImages": 1}}).encode()
+DEADLINE = 4.0
+SCALED = {"base_delay": 0.05, "max_delay": 0.5, "min_attempt": 0.3}
+# Scheduling slack allowed past the deadline before a request counts as overrunning it.
+DEADLINE_SLACK_MS = 250
+FAILED_CHECKS = []
+
+
+def check(condition, message):
+    print(f"    {'ok  ' if condition else 'FAIL'} {message}")
+    if not condition:
+        FAILED_CHECKS.append(message)
+
+
+def within_deadline(results):
+    return max(ms for _ok, ms in results) <= DEADLINE * 1000 + DEADLINE_SLACK_MS
+
+
+def succeeded(results):
+    return sum(ok for ok, _ms in results)
+
+
+def bare(target):
+    def call():
+        return target.invoke(BODY)
+
+    return call
+
+
+def resilient(invoker):
+    def call():
+        return invoker.invoke(BODY, resilience.Deadline(DEADLINE))
+
+    return call
+
+
+def run(call, requests, concurrency):
+    def one(_index):
+        started = time.perf_counter()
+        try:
+            call()
+            ok = True
+        except Exception:  # pylint: disable=broad-except
+            ok = False
+        return ok, (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, range(requests)))
+
+
+def pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] if values else 0.0
+
+
+def report(label, results, calls):
+    latencies = sorted(ms for _ok, ms in results)
+    failures = sorted(ms for ok, ms in results if not ok)
+    print(
+        f"  {label:<26} ok {sum(ok for ok, _ms in results):>3}/{len(results):<3} p50 {pct(latencies, 50):>7.0f} ms"
+        f"  p99 {pct(latencies, 99):>7.0f} ms  failures p50 {pct(failures, 50):>6.0f} ms  upstream calls {calls}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    n, c = args.requests, args.concurrency
+
+    print("30% throttling (lognormal 200 ms):")
+    outcomes = {}
+    for label, wrap in (("bare invoke_model", bare), ("retry with jitter", None)):
+        fake = fakes.FakeBedrock("lognormal:200,0.3", 0.3, seed=1, size=64)
+        target = resilience.Target("primary", fake, "titan", resilience.CircuitBreaker(failures=50))
+        call = wrap(target) if wrap else resilient(resilience.BedrockInvoker(target, **SCALED))
+        outcomes[label] = run(call, n, c)
+        report(label, outcomes[label], fake.faults.calls)
+    retried = outcomes["retry with jitter"]
+    # Four attempts all throttled is 0.3**4, under 1% of requests.
+    check(succeeded(retried) >= 0.95 * n, f"retries recover throttled calls ({succeeded(retried)}/{n} ok)")
+    check(within_deadline(retried), "retries stay within the deadline")
+
+    print("heavy tail (lognormal 200 ms, sigma 1.0), hedge after 400 ms:")
+    tails = {}
+    for hedged in (False, True):
+        primary_fake = fakes.FakeBedrock("lognormal:200,1.0", 0.0, seed=2, size=64)
+        hedge_fake = fakes.FakeBedrock("lognormal:200,1.0", 0.0, seed=3, size=64)
+        hedge = resilience.Target("hedge", hedge_fake, "titan") if hedged else None
+        invoker = resilience.BedrockInvoker(resilience.Target("primary", primary_fake, "titan"), hedge, 0.4, **SCALED)
+        results = run(resilient(invoker), n, c)
+        report("hedged" if hedged else "retry only", results, primary_fake.faults.calls + hedge_fake.faults.calls)
+        tails[hedged] = pct([ms for _ok, ms in results], 95)
+        check(within_deadline(results), f"{'hedged' if hedged else 'unhedged'} requests stay within the deadline")
+    check(tails[True] < tails[False], f"hedging cuts p95 ({tails[False]:.0f} -> {tails[True]:.0f} ms)")
+
+    print("primary outage (every call ServiceUnavailable after 300 ms):")
+    for label, with_hedge in (("breaker", False), ("breaker + hedge region", True)):
+        down = fakes.FakeBedrock("fixed:300", 1.0, seed=4, size=64, error_code="ServiceUnavailableException")
+        healthy = fakes.FakeBedrock("lognormal:200,0.3", 0.0, seed=5, size=64)
+        breaker = resilience.CircuitBreaker(failures=5, cooldown=60)
+        hedge = resilience.Target("hedge", healthy, "titan") if with_hedge else None
+        invoker = resilience.BedrockInvoker(resilience.Target("primary", down, "titan", breaker), hedge, 0.4, **SCALED)
+        results = run(resilient(invoker), n, c)
+        report(label, results, down.faults.calls + healthy.faults.calls)
+        print(f"    breaker state after run: {breaker.state}, primary calls {down.faults.calls}")
+        check(breaker.state == "open", f"{label}: breaker is open after the outage")
+        # Only calls already in flight when the breaker opened may reach the primary afterwards.
+        check(
+            down.faults.calls <= breaker.failures + c,
+            f"{label}: primary calls capped ({down.faults.calls} <= {breaker.failures + c})",
+        )
+        check(within_deadline(results), f"{label}: requests stay within the deadline")
+        if with_hedge:
+            check(succeeded(results) >= 0.95 * n, f"{label}: hedge region serves ({succeeded(results)}/{n} ok)")
+        else:
+            failures = [ms for ok, ms in results if not ok]
+            check(pct(failures, 50) < 100, f"{label}: open breaker fails fast (p50 {pct(failures, 50):.0f} ms)")
+
+    print("half-open probe and recovery (cooldown 500 ms):")
+    down = fakes.FakeBedrock("fixed:100", 1.0, seed=6, size=64, error_code="ServiceUnavailableException")
+    breaker = resilience.CircuitBreaker(failures=3, cooldown=0.5)
+    invoker = resilience.BedrockInvoker(resilience.Target("primary", down, "titan", breaker), **SCALED)
+    run(resilient(invoker), c, c)
+    check(breaker.state == "open", "breaker opens during the outage")
+    time.sleep(breaker.cooldown)
+    check(breaker.state == "half-open", "breaker is half-open after the cooldown")
+    before = down.faults.calls
+    run(resilient(invoker), c, c)
+    check(
+        down.faults.calls - before == 1 and breaker.state == "open",
+        f"one probe while still down, then open again ({down.faults.calls - before} call(s), {breaker.state})",
+    )
+    down.faults.error_rate = 0.0
+    time.sleep(breaker.cooldown)
+    # Requests arriving while the probe is in flight are still refused, so let the probe go first.
+    run(resilient(invoker), 1, 1)
+    check(breaker.state == "closed", f"a successful probe closes the breaker ({breaker.state})")
+    results = run(resilient(invoker), n, c)
+    check(succeeded(results) == n, f"recovered primary serves every request ({succeeded(results)}/{n} ok)")
+
+    if FAILED_CHECKS:
+        print(f"FAIL: {len(FAILED_CHECKS)} check(s) failed")
+        sys.exit(1)
+    print("OK: all checks passed")
+
+
+if __name__ == "__main__":
+    main()
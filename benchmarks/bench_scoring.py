@@ -0,0 +1,84 @@
+"""Compare scalar `_compute_score` against the vectorized scoring pass.
+
+Usage: python benchmarks/bench_scoring.py [--sizes 10,1000,100000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+SERVICE_DIR = os.path.join(os.path.dirname(__file__), "..", "services", "lambda", "sunset-score")
+sys.path.insert(0, os.path.abspath(SERVICE_DIR))
+sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "services", "lambda", "shared", "python")))
+
+import lambda_function  # noqa: E402
+import scoring  # noqa: E402
+
+
+def _random_conditions(count: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    columns = {
+        "clouds": rng.uniform(0, 100, count),
+        "humidity": rng.uniform(20, 100, count),
+        "wind": rng.uniform(0, 12, count),
+        "visibility": rng.uniform(1000, 10000, count),
+        "pm25": rng.uniform(0, 60, count),
+    }
+    weathers = [
+        {
+            "clouds": {"all": float(columns["clouds"][i])},
+            "main": {"humidity": float(columns["humidity"][i])},
+            "wind": {"speed": float(columns["wind"][i])},
+            "visibility": float(columns["visibility"][i]),
+        }
+        for i in range(count)
+    ]
+    return columns, weathers, [float(value) for value in columns["pm25"]]
+
+
+def _best_of(repeat: int, func) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,1000,100000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'points':>8} {'scalar ms':>11} {'score_many ms':>14} {'arrays ms':>10} {'speedup':>8}")
+    for size in (int(value) for value in args.sizes.split(",")):
+        columns, weathers, pm25 = _random_conditions(size)
+        pairs = list(zip(weathers, pm25))
+
+        scalar = _best_of(args.repeat, lambda: [lambda_function._compute_score(w, p) for w, p in pairs])
+        many = _best_of(args.repeat, lambda: scoring.score_many(pairs))
+        arrays = _best_of(
+            args.repeat,
+            lambda: scoring.score_arrays(
+                columns["clouds"], columns["humidity"], columns["wind"], columns["visibility"], columns["pm25"]
+            ),
+        )
+
+        expected = np.array([lambda_function._compute_score(w, p)[0] for w, p in pairs])
+        actual, _terms = scoring.score_arrays(
+            columns["clouds"], columns["humidity"], columns["wind"], columns["visibility"], columns["pm25"]
+        )
+        if not np.allclose(expected, actual):
+            raise SystemExit(f"vectorized scores diverge from scalar at size {size}")
+
+        print(
+            f"{size:>8} {scalar * 1000:>11.3f} {many * 1000:>14.3f} {arrays * 1000:>10.3f} "
+            f"{scalar / arrays:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
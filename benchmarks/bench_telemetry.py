@@ -0,0 +1,54 @@
+"""Per-request overhead of the telemetry spans, sampled and unsampled.
+
+A "request" here is what the handlers do: start, ten spans, one bound call and emit (serialized to
+JSON, but written to a discarding sink instead of stdout).
+Usage: python benchmarks/bench_telemetry.py [--requests 20000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+SHARED_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "services", "lambda", "shared", "python"))
+sys.path.insert(0, SHARED_DIR)
+
+import telemetry  # noqa: E402
+
+STAGES = ("parse", "invoke", "decode", "overlay", "encode", "upload", "upload", "upload", "upload", "scoring")
+
+
+def one_request(sample_rate):
+    trace = telemetry.start("bench", "request-id", operation="sync", sample_rate=sample_rate)
+    for stage in STAGES:
+        with telemetry.span(stage):
+            pass
+    telemetry.bind(len)(STAGES)
+    trace.emit(statusCode=200)
+
+
+def per_request_us(sample_rate, requests):
+    started = time.perf_counter()
+    for _ in range(requests):
+        one_request(sample_rate)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    sizes = []
+    telemetry.set_sink(lambda record: sizes.append(len(json.dumps(record, ensure_ascii=False, separators=(",", ":")))))
+    per_request_us(1.0, 1000)  # warm up
+
+    print(f"{'sample rate':>12} {'us/request':>11} {'us/span':>8}")
+    for rate in (1.0, 0.1, 0.0):
+        elapsed = per_request_us(rate, args.requests)
+        print(f"{rate:>12.2f} {elapsed:>11.2f} {elapsed / len(STAGES):>8.2f}")
+    print(f"EMF record size: {sizes[-1]} bytes")
+
+
+if __name__ == "__main__":
+    main()
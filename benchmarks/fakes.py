@@ -0,0 +1,456 @@
+"""Local stand-ins for OpenWeather, Bedrock Titan, S3, ACM and Route 53 with configurable latency and error rates.
+
+Latency specs: "0", "fixed:50", "uniform:20-80" or "lognormal:80,0.5" (median ms, sigma).
+"""
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from botocore.exceptions import ClientError
+
+
+def latency(spec: str, rng: Optional[random.Random] = None) -> Callable[[], float]:
+    """Sampler returning seconds for a latency spec."""
+    rng = rng or random.Random()
+    kind, _, args = spec.partition(":")
+    if kind in ("", "0", "none"):
+        return lambda: 0.0
+    if kind == "fixed":
+        value = float(args) / 1000
+        return lambda: value
+    if kind == "uniform":
+        low, high = (float(part) / 1000 for part in args.split("-"))
+        return lambda: rng.uniform(low, high)
+    if kind == "lognormal":
+        median, sigma = (float(part) for part in args.split(","))
+        return lambda: rng.lognormvariate(0.0, sigma) * median / 1000
+    raise ValueError(f"Unknown latency spec {spec!r}")
+
+
+class _Faults:
+    def __init__(self, latency_spec: str, error_rate: float, seed: int) -> None:
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._sample = latency(latency_spec, self._rng)
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+
+    def next(self) -> bool:
+        """Sleep for one sampled latency; True if this call should fail."""
+        with self._lock:
+            delay = self._sample()
+            failed = self._rng.random() < self.error_rate
+            self.calls += 1
+            self.errors += failed
+        time.sleep(delay)
+        return failed
+
+
+def _client_error(code: str, operation: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": "injected by fakes"}}, operation)
+
+
+def sample_png(size: int = 1024, seed: int = 0) -> bytes:
+    """Gradient sky plus noise; encodes to roughly the size of a Titan PNG."""
+    from PIL import Image  # pylint: disable=import-outside-toplevel
+
+    rng = random.Random(seed)
+    sky = Image.linear_gradient("L").resize((size, size))
+    noise = Image.effect_noise((size, size), 20 + rng.random() * 20)
+    image = Image.merge("RGB", [Image.blend(sky.rotate(angle), noise, 0.25) for angle in (0, 90, 180)])
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class _Body:
+    def __init__(self, payload: bytes) -> None:
+        self._stream = BytesIO(payload)
+
+    def read(self) -> bytes:
+        return self._stream.read()
+
+
+class FakeBedrock:
+    """``invoke_model`` returning Titan-shaped JSON with real base64 PNG payloads; failures raise ``error_code``."""
+
+    def __init__(
+        self,
+        latency_spec: str = "0",
+        error_rate: float = 0.0,
+        seed: int = 0,
+        size: int = 1024,
+        error_code: str = "ThrottlingException",
+    ) -> None:
+        self.faults = _Faults(latency_spec, error_rate, seed)
+        self.error_code = error_code
+        self._images = [base64.b64encode(sample_png(size, index)).decode("ascii") for index in range(2)]
+
+    def invoke_model(self, **kwargs: Any) -> Dict[str, Any]:
+        count = json.loads(kwargs["body"]).get("imageGenerationConfig", {}).get("numberOfImages", 1)
+        if self.faults.next():
+            raise _client_error(self.error_code, "InvokeModel")
+        images = [self._images[index % len(self._images)] for index in range(count)]
+        return {"body": _Body(json.dumps({"images": images, "error": None}).encode())}
+
+
+class FakeS3:
+    """``put_object`` that keeps only sizes; other calls used by the handlers are no-ops."""
+
+    def __init__(self, latency_spec: str = "0", error_rate: float = 0.0, seed: int = 0) -> None:
+        self.faults = _Faults(latency_spec, error_rate, seed)
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+
+    def put_object(self, **kwargs: Any) -> Dict[str, Any]:
+        if self.faults.next():
+            raise _client_error("InternalError", "PutObject")
+        with self._lock:
+            self.bytes_written += len(kwargs.get("Body") or b"")
+        return {"ETag": '"fake"'}
+
+    def head_bucket(self, **_kwargs: Any) -> Dict[str, Any]:
+        return {}
+
+
+class FakeClock:
+    """Wall clock that only moves when something sleeps on it; pass ``clock`` and ``clock.sleep`` together."""
+
+    def __init__(self, start: float = 1_700_000_000.0) -> None:
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += max(0.0, seconds)
+
+
+class ScaledClock:
+    """Wall clock running ``speedup`` times faster than real time; unlike FakeClock, threads can sleep on it at once."""
+
+    def __init__(self, speedup: float = 1000.0, start: float = 1_700_000_000.0) -> None:
+        self.speedup = speedup
+        self.start = start
+        self._origin = time.monotonic()
+
+    def __call__(self) -> float:
+        return self.start + (time.monotonic() - self._origin) * self.speedup
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(max(0.0, seconds) / self.speedup)
+
+
+class FakeLambdaContext:
+    def __init__(
+        self,
+        clock: Callable[[], float] = time.time,
+        timeout_seconds: float = 900.0,
+        function_arn: str = "arn:aws:lambda:us-east-1:000000000000:function:fake",
+    ) -> None:
+        self.clock = clock
+        self.deadline = clock() + timeout_seconds
+        self.invoked_function_arn = function_arn
+        self.aws_request_id = "fake-request"
+        self.log_stream_name = "fake-stream"
+
+    def get_remaining_time_in_millis(self) -> int:
+        return int(max(0.0, self.deadline - self.clock()) * 1000)
+
+
+def acm_certificate(
+    arn: str,
+    domain: str,
+    sans: List[str],
+    status: str = "ISSUED",
+    key_algorithm: str = "RSA-2048",
+    cert_type: str = "AMAZON_ISSUED",
+) -> Dict[str, Any]:
+    """A describe_certificate-shaped certificate with one DNS validation record per name."""
+    names = [domain, *[name for name in sans if name != domain]]
+    return {
+        "CertificateArn": arn,
+        "DomainName": domain,
+        "SubjectAlternativeNames": names,
+        "Status": status,
+        "KeyAlgorithm": key_algorithm,
+        "Type": cert_type,
+        "DomainValidationOptions": [
+            {
+                "DomainName": name,
+                "ValidationStatus": "SUCCESS" if status == "ISSUED" else "PENDING_VALIDATION",
+                "ResourceRecord": {
+                    # Like ACM, the record depends only on the account and the name, so reissues share it.
+                    "Name": f"_{hashlib.sha256(('name:' + name).encode()).hexdigest()[:16]}.{name}.",
+                    "Type": "CNAME",
+                    "Value": f"_{hashlib.sha256(name.encode()).hexdigest()[:16]}.acm-validations.aws.",
+                },
+            }
+            for name in names
+        ],
+    }
+
+
+class _Paginator:
+    def __init__(self, pages: Callable[..., List[Dict[str, Any]]]) -> None:
+        self._pages = pages
+
+    def paginate(self, **kwargs: Any) -> Any:
+        return iter(self._pages(**kwargs))
+
+
+class FakeAcm:
+    """ACM with a fixed certificate list; ``list_certificates`` pages and ``describe_certificate`` each sleep.
+
+    Requested certificates get validation records ``records_after`` seconds and turn ISSUED
+    ``issue_after`` seconds after the request, measured on ``clock``.
+    """
+
+    def __init__(
+        self,
+        certificates: Optional[List[Dict[str, Any]]] = None,
+        describe_latency: str = "0",
+        list_latency: str = "0",
+        page_size: int = 100,
+        seed: int = 0,
+        records_after: float = 0.0,
+        issue_after: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.certificates = {cert["CertificateArn"]: cert for cert in certificates or []}
+        self.faults = _Faults(describe_latency, 0.0, seed)
+        self.list_faults = _Faults(list_latency, 0.0, seed + 1)
+        self.page_size = page_size
+        self.records_after = records_after
+        self.issue_after = issue_after
+        self.clock = clock
+        self.requested: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get_paginator(self, operation: str) -> _Paginator:
+        assert operation == "list_certificates", operation
+        return _Paginator(self._list_pages)
+
+    def _list_pages(self, CertificateStatuses=None, Includes=None, **_kwargs: Any):  # noqa: N803
+        key_types = set((Includes or {}).get("keyTypes") or ["RSA_2048"])
+        matching = [
+            self._summary(cert)
+            for cert in list(self.certificates.values())
+            if (not CertificateStatuses or cert["Status"] in CertificateStatuses)
+            and cert["KeyAlgorithm"].replace("-", "_") in key_types
+        ]
+        for start in range(0, max(1, len(matching)), self.page_size):
+            self.list_faults.next()
+            yield {"CertificateSummaryList": matching[start:start + self.page_size]}
+
+    @staticmethod
+    def _summary(cert: Dict[str, Any]) -> Dict[str, Any]:
+        names = cert["SubjectAlternativeNames"]
+        return {
+            "CertificateArn": cert["CertificateArn"],
+            "DomainName": cert["DomainName"],
+            "SubjectAlternativeNameSummaries": names[:10],
+            "HasAdditionalSubjectAlternativeNames": len(names) > 10,
+            "Status": cert["Status"],
+            "Type": cert["Type"],
+            "KeyAlgorithm": cert["KeyAlgorithm"].replace("-", "_"),
+        }
+
+    def describe_certificate(self, CertificateArn: str) -> Dict[str, Any]:  # noqa: N803
+        self.faults.next()
+        with self._lock:
+            cert = self.certificates.get(CertificateArn)
+            if cert is None:
+                raise _client_error("ResourceNotFoundException", "DescribeCertificate")
+            if CertificateArn in self.requested:
+                elapsed = self.clock() - self.requested[CertificateArn]
+                if elapsed >= self.issue_after and cert["Status"] == "PENDING_VALIDATION":
+                    cert["Status"] = "ISSUED"
+                    for option in cert["DomainValidationOptions"]:
+                        option["ValidationStatus"] = "SUCCESS"
+                if elapsed < self.records_after:
+                    return {"Certificate": {**cert, "DomainValidationOptions": []}}
+            return {"Certificate": json.loads(json.dumps(cert))}
+
+    def request_certificate(
+        self, DomainName: str, SubjectAlternativeNames=None, KeyAlgorithm="RSA_2048", **_kwargs: Any  # noqa: N803
+    ) -> Dict[str, Any]:
+        with self._lock:
+            arn = f"arn:aws:acm:us-east-1:000000000000:certificate/requested-{len(self.requested)}"
+            self.certificates[arn] = acm_certificate(
+                arn, DomainName, SubjectAlternativeNames or [], "PENDING_VALIDATION", KeyAlgorithm.replace("_", "-")
+            )
+            self.requested[arn] = self.clock()
+        return {"CertificateArn": arn}
+
+
+class FakeRoute53:
+    """Hosted zones as in-memory record sets; counts record set pages read, change batches and changes applied."""
+
+    def __init__(self, latency_spec: str = "0", seed: int = 0, page_size: int = 300) -> None:
+        self.faults = _Faults(latency_spec, 0.0, seed)
+        self.zones: Dict[str, Dict[tuple, Dict[str, Any]]] = {}
+        self.page_size = page_size
+        self.list_pages = 0
+        self.change_batches = 0
+        self.changes = 0
+        self._lock = threading.Lock()
+
+    def get_paginator(self, operation: str) -> _Paginator:
+        assert operation == "list_resource_record_sets", operation
+        return _Paginator(self._record_pages)
+
+    def _record_pages(self, HostedZoneId: str, **_kwargs: Any):  # noqa: N803
+        with self._lock:
+            record_sets = sorted(self.zones.get(HostedZoneId, {}).values(), key=lambda record: record["Name"])
+        for start in range(0, max(1, len(record_sets)), self.page_size):
+            self.faults.next()
+            self.list_pages += 1
+            yield {"ResourceRecordSets": json.loads(json.dumps(record_sets[start:start + self.page_size]))}
+
+    def change_resource_record_sets(
+        self, HostedZoneId: str, ChangeBatch: Dict[str, Any]  # noqa: N803
+    ) -> Dict[str, Any]:
+        self.faults.next()
+        records = chars = 0
+        for change in ChangeBatch["Changes"]:
+            weight = 2 if change["Action"] == "UPSERT" else 1
+            values = [value["Value"] for value in change["ResourceRecordSet"].get("ResourceRecords", [])]
+            records += weight * len(values)
+            chars += weight * sum(len(value) for value in values)
+        if records > 1000 or chars > 32000:
+            raise _client_error("InvalidChangeBatch", "ChangeResourceRecordSets")
+        with self._lock:
+            zone = self.zones.setdefault(HostedZoneId, {})
+            for change in ChangeBatch["Changes"]:
+                record = change["ResourceRecordSet"]
+                key = (record["Name"], record["Type"])
+                if change["Action"] == "DELETE":
+                    zone.pop(key, None)
+                else:
+                    zone[key] = json.loads(json.dumps(record))
+            self.change_batches += 1
+            self.changes += len(ChangeBatch["Changes"])
+        return {"ChangeInfo": {"Id": f"/change/C{self.change_batches}", "Status": "PENDING"}}
+
+
+def _seeded(lat: float, lon: float, salt: str) -> random.Random:
+    digest = hashlib.sha256(f"{lat:.2f},{lon:.2f},{salt}".encode()).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def weather_payload(lat: float, lon: float) -> Dict[str, Any]:
+    rng = _seeded(lat, lon, "weather")
+    now = int(time.time())
+    return {
+        "coord": {"lat": round(lat, 4), "lon": round(lon, 4)},
+        "weather": [{"description": rng.choice(["clear sky", "few clouds", "scattered clouds", "light rain"])}],
+        "main": {"humidity": rng.randint(35, 95)},
+        "visibility": rng.choice([6000, 8000, 10000]),
+        "wind": {"speed": round(rng.uniform(0.5, 9.0), 1)},
+        "clouds": {"all": rng.randint(0, 100)},
+        "dt": now,
+        "sys": {"sunset": now + 3600},
+        "timezone": 32400,
+    }
+
+
+def air_payload(lat: float, lon: float) -> Dict[str, Any]:
+    rng = _seeded(lat, lon, "air")
+    return {"list": [{"dt": int(time.time()), "components": {"pm2_5": round(rng.uniform(2, 40), 1)}}]}
+
+
+def forecast_payload(lat: float, lon: float) -> Dict[str, Any]:
+    rng = _seeded(lat, lon, "forecast")
+    start = (int(time.time()) // 10800 + 1) * 10800
+    slots = [
+        {
+            "dt": start + index * 10800,
+            "main": {"humidity": rng.randint(35, 95)},
+            "clouds": {"all": rng.randint(0, 100)},
+            "wind": {"speed": round(rng.uniform(0.5, 9.0), 1)},
+            "visibility": 10000,
+            "weather": [{"description": "scattered clouds"}],
+        }
+        for index in range(40)
+    ]
+    return {"list": slots, "city": {"coord": {"lat": lat, "lon": lon}, "timezone": 32400}}
+
+
+def air_forecast_payload(lat: float, lon: float) -> Dict[str, Any]:
+    rng = _seeded(lat, lon, "air-forecast")
+    start = int(time.time()) // 3600 * 3600
+    return {"list": [{"dt": start + index * 3600, "components": {"pm2_5": round(rng.uniform(2, 40), 1)}} for index in range(120)]}
+
+
+ROUTES: Dict[str, Callable[[float, float], Dict[str, Any]]] = {
+    "/data/2.5/weather": weather_payload,
+    "/data/2.5/air_pollution": air_payload,
+    "/data/2.5/forecast": forecast_payload,
+    "/data/2.5/air_pollution/forecast": air_forecast_payload,
+}
+
+
+class FakeOpenWeather:
+    """Local HTTP server for the OpenWeather endpoints sunset-score calls; use ``base_url`` as BASE_URL."""
+
+    def __init__(self, latency_spec: str = "0", error_rate: float = 0.0, seed: int = 0) -> None:
+        self.faults = _Faults(latency_spec, error_rate, seed)
+        self.requests: List[str] = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:  # noqa: N802
+                url = urlparse(self.path)
+                route = ROUTES.get(url.path)
+                query = parse_qs(url.query)
+                if route is None:
+                    self._send(404, {"message": "not found"})
+                    return
+                if fake.faults.next():
+                    self._send(500, {"message": "injected by fakes"})
+                    return
+                self._send(200, route(float(query["lat"][0]), float(query["lon"][0])))
+
+            def do_HEAD(self) -> None:  # noqa: N802
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def _send(self, status: int, payload: Dict[str, Any]) -> None:
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_args: Any) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/data/2.5"
+
+    def __enter__(self) -> "FakeOpenWeather":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.server.shutdown()
+        self.server.server_close()
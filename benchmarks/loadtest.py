@@ -0,0 +1,336 @@
+"""Offline end-to-end load test of both API handlers against local OpenWeather, Bedrock and S3 fakes.
+
+Both lambda_handler functions run in-process, driven by a thread pool at --concurrency with a weighted
+request mix. OpenWeather is a local HTTP server (so the requests session, pooling and JSON parsing are
+exercised); Bedrock and S3 are stub clients. Each fake takes a latency spec ("fixed:50",
+"uniform:20-80", "lognormal:80,0.5") and an error rate. Reports throughput, p50/p95/p99 per request
+kind and per pipeline stage (collected from the handlers' telemetry spans). With --check it exits 1
+when p95 or throughput regresses past --tolerance against the stored baseline; --save-baseline
+rewrites it (baselines are machine-specific).
+Usage: python benchmarks/loadtest.py [--requests 300] [--concurrency 8] [--mix score=6,batch=1,forecast=1,card=2]
+       [--owm-latency lognormal:80,0.4] [--bedrock-latency lognormal:900,0.3] [--check | --save-baseline]
+"""
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+LAMBDA_DIR = os.path.join(ROOT, "services", "lambda")
+SHARED_DIR = os.path.join(LAMBDA_DIR, "shared", "python")
+CARD_DIR = os.path.join(LAMBDA_DIR, "generate-card")
+SCORE_DIR = os.path.join(LAMBDA_DIR, "sunset-score")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "loadtest_baseline.json")
+sys.path[:0] = [CARD_DIR, SCORE_DIR, SHARED_DIR]
+for key, value in {
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "loadtest",
+    "AWS_SECRET_ACCESS_KEY": "loadtest",
+    "AWS_EC2_METADATA_DISABLED": "true",
+    "OUTPUT_BUCKET": "loadtest-bucket",
+    "IMAGE_CACHE_ENABLED": "0",
+    "OPENWEATHER_API": "loadtest",
+    "SCORE_TILE_URI": "",
+    "TELEMETRY_SAMPLE_RATE": "1",
+}.items():
+    os.environ.setdefault(key, value)
+
+import fakes  # noqa: E402
+
+# Shimane / Tottori coast, where real traffic concentrates.
+REGION = (35.0, 36.0, 132.4, 133.8)
+LOCATIONS = ["宍道湖 嫁ヶ島", "稲佐の浜", "日御碕", "美保関", "島根半島"]
+CLIENTS = 40
+
+
+def load_handler(name: str, path: str) -> Any:
+    """Both services name their entry module lambda_function, so load each under its own name."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class SpanCollector:
+    """telemetry sink keeping every span duration the handlers emit, keyed "service.stage"."""
+
+    def __init__(self) -> None:
+        self.samples: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record: Dict[str, Any]) -> None:
+        names = [metric["Name"] for metric in record["_aws"]["CloudWatchMetrics"][0]["Metrics"]]
+        with self._lock:
+            for name in names:
+                if name == "total":
+                    continue
+                values = record[name] if isinstance(record[name], list) else [record[name]]
+                self.samples.setdefault(f"{record['Service']}.{name}", []).extend(values)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.samples = {}
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def distribution(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "max": round(max(values), 2) if values else 0.0,
+    }
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        if kind.strip() not in REQUESTS:
+            raise SystemExit(f"unknown request kind {kind!r}; choose from {', '.join(REQUESTS)}")
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+
+def score_event(rng: random.Random, points: List[Any]) -> Dict[str, Any]:
+    lat, lon = rng.choice(points)
+    return {"httpMethod": "GET", "queryStringParameters": {"lat": str(lat), "lon": str(lon)}}
+
+
+def forecast_event(rng: random.Random, points: List[Any]) -> Dict[str, Any]:
+    event = score_event(rng, points)
+    event["queryStringParameters"]["mode"] = "forecast"
+    return event
+
+
+def batch_event(rng: random.Random, points: List[Any]) -> Dict[str, Any]:
+    batch = [{"lat": lat, "lon": lon} for lat, lon in rng.sample(points, min(10, len(points)))]
+    return {"httpMethod": "POST", "body": json.dumps({"points": batch})}
+
+
+def card_event(rng: random.Random, _points: List[Any]) -> Dict[str, Any]:
+    body = {
+        "location": rng.choice(LOCATIONS),
+        "style": rng.choice(["photo", "illustration", "gradient"]),
+        "score": str(rng.randint(40, 95)),
+        "conditions": "scattered clouds",
+    }
+    # Source IPs drive generate-card's per-client rate limit.
+    identity = {"sourceIp": f"198.51.100.{rng.randrange(CLIENTS)}"}
+    return {
+        "httpMethod": "POST",
+        "body": json.dumps(body, ensure_ascii=False),
+        "requestContext": {"identity": identity},
+    }
+
+
+def variants_event(rng: random.Random, points: List[Any]) -> Dict[str, Any]:
+    event = card_event(rng, points)
+    event["body"] = json.dumps({**json.loads(event["body"]), "variants": 3}, ensure_ascii=False)
+    return event
+
+
+# kind -> (handler module, event factory)
+REQUESTS: Dict[str, Any] = {
+    "score": ("score", score_event),
+    "batch": ("score", batch_event),
+    "forecast": ("score", forecast_event),
+    "card": ("card", card_event),
+    "variants": ("card", variants_event),
+}
+
+
+def build_plan(args: argparse.Namespace, count: int, seed: int) -> List[Any]:
+    rng = random.Random(seed)
+    lat_min, lat_max, lon_min, lon_max = REGION
+    points = [
+        (round(rng.uniform(lat_min, lat_max), 4), round(rng.uniform(lon_min, lon_max), 4)) for _ in range(args.points)
+    ]
+    mix = parse_mix(args.mix)
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=count)
+    return [(kind, REQUESTS[kind][1](rng, points)) for kind in kinds]
+
+
+def drive(handlers: Dict[str, Any], plan: List[Any], concurrency: int) -> Dict[str, Any]:
+    results: Dict[str, Dict[str, List[Any]]] = {}
+    lock = threading.Lock()
+
+    def one(item: Any) -> None:
+        kind, event = item
+        module = handlers[REQUESTS[kind][0]]
+        started = time.perf_counter()
+        try:
+            status = module.lambda_handler(event, None)["statusCode"]
+        except Exception:  # pylint: disable=broad-except
+            status = 599
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            entry = results.setdefault(kind, {"latencies": [], "errors": [], "shed": 0})
+            if status == 429:
+                # Shed by admission control: counted, but kept out of the admitted latency distribution.
+                entry["shed"] += 1
+                return
+            entry["latencies"].append(elapsed)
+            if status >= 500:
+                entry["errors"].append(status)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, plan))
+    return {"wall": time.perf_counter() - started, "results": results}
+
+
+def summarize(run: Dict[str, Any], timer: SpanCollector) -> Dict[str, Any]:
+    everything = [value for entry in run["results"].values() for value in entry["latencies"]]
+    shed = sum(entry["shed"] for entry in run["results"].values())
+    total = len(everything) + shed
+    errors = sum(len(entry["errors"]) for entry in run["results"].values())
+    return {
+        "throughputRps": round(total / run["wall"], 2) if run["wall"] else 0.0,
+        "errorRate": round(errors / total, 4) if total else 0.0,
+        "shedRate": round(shed / total, 4) if total else 0.0,
+        "overall": distribution(everything),
+        "kinds": {
+            kind: {**distribution(entry["latencies"]), "errors": len(entry["errors"]), "shed": entry["shed"]}
+            for kind, entry in sorted(run["results"].items())
+        },
+        "stages": {stage: distribution(values) for stage, values in sorted(timer.samples.items())},
+    }
+
+
+def print_report(summary: Dict[str, Any], fakes_used: Dict[str, Any]) -> None:
+    print(
+        f"throughput {summary['throughputRps']:.1f} req/s, error rate {summary['errorRate'] * 100:.2f}%, "
+        f"shed (429) {summary['shedRate'] * 100:.2f}%"
+    )
+    header = f"{'':<22} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    print(f"\n{header} {'5xx':>5} {'429':>5}")
+    for kind, row in [("overall", {**summary["overall"], "errors": "", "shed": ""}), *summary["kinds"].items()]:
+        print(
+            f"{kind:<22} {row['count']:>6} {row['p50']:>9.1f} {row['p95']:>9.1f} {row['p99']:>9.1f} "
+            f"{row['max']:>9.1f} {row['errors']:>5} {row['shed']:>5}"
+        )
+    print(f"\nper stage\n{header}")
+    for stage, row in summary["stages"].items():
+        print(f"{stage:<22} {row['count']:>6} {row['p50']:>9.1f} {row['p95']:>9.1f} {row['p99']:>9.1f} {row['max']:>9.1f}")
+    calls = ", ".join(f"{name} {fake.faults.calls} calls/{fake.faults.errors} injected errors" for name, fake in fakes_used.items())
+    print(f"\nfakes: {calls}")
+
+
+def compare(summary: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions beyond tolerance: lower throughput, or a higher p95 overall, per kind or per stage."""
+    failures = []
+    floor = baseline["throughputRps"] * (1 - tolerance)
+    if summary["throughputRps"] < floor:
+        failures.append(f"throughput {summary['throughputRps']:.1f} req/s < {floor:.1f} (baseline {baseline['throughputRps']:.1f})")
+    rows = [("overall", summary["overall"], baseline["overall"])]
+    for group in ("kinds", "stages"):
+        rows += [(name, row, baseline[group][name]) for name, row in summary[group].items() if name in baseline.get(group, {})]
+    for name, row, base in rows:
+        ceiling = base["p95"] * (1 + tolerance)
+        if row["p95"] > ceiling:
+            failures.append(f"{name} p95 {row['p95']:.1f} ms > {ceiling:.1f} ms (baseline {base['p95']:.1f})")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=20, help="unrecorded requests run first")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", default="score=6,batch=1,forecast=1,card=2")
+    parser.add_argument(
+        "--bedrock-slots", type=int, default=8, help="generate-card BEDROCK_MAX_CONCURRENCY; lower it to watch shedding"
+    )
+    parser.add_argument("--points", type=int, default=60, help="distinct coordinates the score requests draw from")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--owm-latency", default="lognormal:80,0.4")
+    parser.add_argument("--owm-error-rate", type=float, default=0.0)
+    parser.add_argument("--bedrock-latency", default="lognormal:900,0.3")
+    parser.add_argument("--bedrock-error-rate", type=float, default=0.0)
+    parser.add_argument("--s3-latency", default="lognormal:40,0.4")
+    parser.add_argument("--s3-error-rate", type=float, default=0.0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--check", action="store_true", help="exit 1 on regression against --baseline")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    parser.add_argument("--verbose", action="store_true", help="keep handler logging")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+
+    owm = fakes.FakeOpenWeather(args.owm_latency, args.owm_error_rate, args.seed)
+    bedrock = fakes.FakeBedrock(args.bedrock_latency, args.bedrock_error_rate, args.seed)
+    s3 = fakes.FakeS3(args.s3_latency, args.s3_error_rate, args.seed)
+
+    os.environ["BEDROCK_MAX_CONCURRENCY"] = str(args.bedrock_slots)
+    card = load_handler("generate_card_lambda", os.path.join(CARD_DIR, "lambda_function.py"))
+    score = load_handler("sunset_score_lambda", os.path.join(SCORE_DIR, "lambda_function.py"))
+    card.bedrock_invoker.primary.client, card.s3 = bedrock, s3
+
+    import openweather  # pylint: disable=import-outside-toplevel
+    import telemetry  # pylint: disable=import-outside-toplevel
+
+    openweather.BASE_URL = owm.base_url
+    timer = SpanCollector()
+    telemetry.set_sink(timer)
+
+    handlers = {"card": card, "score": score}
+    with owm:
+        drive(handlers, build_plan(args, args.warmup, args.seed + 1), args.concurrency)
+        for fake in (owm, bedrock, s3):
+            fake.faults.calls = fake.faults.errors = 0
+        timer.reset()
+        run = drive(handlers, build_plan(args, args.requests, args.seed), args.concurrency)
+
+    summary = summarize(run, timer)
+    summary["config"] = {
+        key: getattr(args, key)
+        for key in (
+            "requests", "concurrency", "mix", "bedrock_slots", "points", "seed", "owm_latency", "bedrock_latency", "s3_latency"
+        )
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_report(summary, {"openweather": owm, "bedrock": bedrock, "s3": s3})
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as handle:
+            json.dump(summary, handle, indent=2)
+            handle.write("\n")
+        print(f"\nbaseline written to {os.path.relpath(args.baseline)}")
+    if args.check:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        if baseline.get("config") != summary["config"]:
+            print("\nWARNING: baseline was recorded with a different configuration")
+        failures = compare(summary, baseline, args.tolerance)
+        if failures:
+            print(f"\nFAIL: regression beyond {args.tolerance:.0%} of baseline")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+        print(f"\nOK: within {args.tolerance:.0%} of baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -78,6 +78,8 @@ export interface GenerateCardResponse {
   s3Url?: string;
   objectKey?: string;
   sunsetJst?: string;
+  renditions?: Record<string, { contentType: string; width: number; height: number; bytes: number; imageUrl: string }>;
+  srcset?: Record<string, string>;
 }
 
 export async function getSunsetIndex(params: SunsetIndexParams) {
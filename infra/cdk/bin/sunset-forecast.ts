@@ -18,8 +18,11 @@ new SunsetForecastStack(app, "SunsetForecastStack", {
   frontendOrigin: process.env.FRONTEND_ORIGIN ?? "http://localhost:5173",
   bedrockModelId: process.env.MODEL_ID ?? "amazon.titan-image-generator-v1",
   bedrockRegion: process.env.BEDROCK_REGION ?? "us-east-1",
+  bedrockHedgeRegion: process.env.BEDROCK_HEDGE_REGION,
+  bedrockHedgeModelId: process.env.BEDROCK_HEDGE_MODEL_ID,
   weatherApiKey: process.env.OPENWEATHER_API ?? "",
   defaultLat: process.env.DEFAULT_LAT ?? "35.468",
   defaultLon: process.env.DEFAULT_LON ?? "133.050",
-  cdnHost: process.env.CDN_HOST
+  cdnHost: process.env.CDN_HOST,
+  telemetrySampleRate: process.env.TELEMETRY_SAMPLE_RATE
 });
@@ -11,21 +11,29 @@ import {
 import { Construct } from "constructs";
 import * as apigateway from "aws-cdk-lib/aws-apigateway";
 import * as cloudfront from "aws-cdk-lib/aws-cloudfront";
+import * as dynamodb from "aws-cdk-lib/aws-dynamodb";
+import * as events from "aws-cdk-lib/aws-events";
+import * as targets from "aws-cdk-lib/aws-events-targets";
 import * as iam from "aws-cdk-lib/aws-iam";
 import * as lambda from "aws-cdk-lib/aws-lambda";
+import * as lambdaEventSources from "aws-cdk-lib/aws-lambda-event-sources";
 import * as logs from "aws-cdk-lib/aws-logs";
 import * as route53 from "aws-cdk-lib/aws-route53";
 import * as s3 from "aws-cdk-lib/aws-s3";
+import * as sqs from "aws-cdk-lib/aws-sqs";
 
 export interface SunsetForecastStackProps extends StackProps {
   readonly myDomainName: string;
   readonly frontendOrigin?: string;
   readonly bedrockModelId?: string;
   readonly bedrockRegion?: string;
+  readonly bedrockHedgeRegion?: string;
+  readonly bedrockHedgeModelId?: string;
   readonly weatherApiKey?: string;
   readonly defaultLat?: string;
   readonly defaultLon?: string;
   readonly cdnHost?: string;
+  readonly telemetrySampleRate?: string;
 }
 
 export class SunsetForecastStack extends Stack {
@@ -51,6 +59,14 @@ export class SunsetForecastStack extends Stack {
     });
     hostedZone.applyRemovalPolicy(RemovalPolicy.RETAIN);
 
+    // Last result of each certificate resource, so Updates that change nothing answer without ACM calls.
+    const certificateStateTable = new dynamodb.Table(this, "CertificateStateTable", {
+      partitionKey: { name: "key", type: dynamodb.AttributeType.STRING },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      timeToLiveAttribute: "expiresAt",
+      removalPolicy: RemovalPolicy.DESTROY
+    });
+
     const certificateRequestorFn = new lambda.Function(this, "SiteCertificateCertificateRequestorFunction", {
       runtime: lambda.Runtime.PYTHON_3_12,
       architecture: lambda.Architecture.X86_64,
@@ -62,11 +78,14 @@ export class SunsetForecastStack extends Stack {
       environment: {
         SKIP_WAIT: "0",
         ACM_REGION: "us-east-1",
-        MAX_WAIT_SECONDS: "900"
+        MAX_WAIT_SECONDS: "1800",
+        HANDOFF_ENABLED: "1",
+        CERTIFICATE_STATE_TABLE: certificateStateTable.tableName
       }
     });
 
     certificateRequestorFn.grantInvoke(new iam.ServicePrincipal("cloudformation.amazonaws.com"));
+    certificateStateTable.grantReadWriteData(certificateRequestorFn);
     certificateRequestorFn.addToRolePolicy(
       new iam.PolicyStatement({
         actions: ["route53:ChangeResourceRecordSets"],
@@ -91,6 +110,17 @@ export class SunsetForecastStack extends Stack {
         resources: ["*"]
       })
     );
+    // Long validations continue in a fresh invocation of the same function. Kept out of the
+    // function's default policy so the role does not depend on the function it belongs to.
+    const certificateHandOffPolicy = new iam.Policy(this, "SiteCertificateHandOffPolicy", {
+      statements: [
+        new iam.PolicyStatement({
+          actions: ["lambda:InvokeFunction"],
+          resources: [certificateRequestorFn.functionArn]
+        })
+      ]
+    });
+    certificateRequestorFn.role?.attachInlinePolicy(certificateHandOffPolicy);
 
     const siteCertificateCustomResource = new CustomResource(this, "SiteCertificateCertificateRequestorResource", {
       serviceToken: certificateRequestorFn.functionArn,
@@ -102,6 +132,7 @@ export class SunsetForecastStack extends Stack {
         StackName: Stack.of(this).stackName
       }
     });
+    siteCertificateCustomResource.node.addDependency(certificateHandOffPolicy);
     const siteCertificateArn = siteCertificateCustomResource.getAttString("CertificateArn");
 
     const imageBucket = new s3.Bucket(this, "CardImagesBucket", {
@@ -110,7 +141,15 @@ export class SunsetForecastStack extends Stack {
       enforceSSL: true,
       versioned: true,
       removalPolicy: RemovalPolicy.RETAIN,
-      autoDeleteObjects: false
+      autoDeleteObjects: false,
+      lifecycleRules: [
+        {
+          id: "ExpireBedrockImageCache",
+          prefix: "cache/bedrock/",
+          expiration: Duration.days(30),
+          noncurrentVersionExpiration: Duration.days(1)
+        }
+      ]
     });
 
     const pillowLayer = new lambda.LayerVersion(this, "PillowLayer", {
@@ -132,23 +171,52 @@ export class SunsetForecastStack extends Stack {
       })
     });
 
+    const sharedPythonLayer = new lambda.LayerVersion(this, "SharedPythonLayer", {
+      description: "Modules shared by the Python services (sunset ephemeris and table)",
+      compatibleRuntimes: [lambda.Runtime.PYTHON_3_12],
+      code: lambda.Code.fromAsset(path.join(__dirname, "../../../services/lambda/shared"))
+    });
+
+    const generateCardCode = lambda.Code.fromAsset(path.join(__dirname, "../../../services/lambda/generate-card"), {
+      bundling: {
+        image: lambda.Runtime.PYTHON_3_12.bundlingImage,
+        command: [
+          "bash",
+          "-c",
+          [
+            "if [ -f requirements.txt ]; then pip install -r requirements.txt -t /asset-output; fi",
+            "cp -R . /asset-output"
+          ].join(" && ")
+        ]
+      }
+    });
+
+    const cardJobTable = new dynamodb.Table(this, "CardJobTable", {
+      partitionKey: { name: "jobId", type: dynamodb.AttributeType.STRING },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      timeToLiveAttribute: "expiresAt",
+      removalPolicy: RemovalPolicy.DESTROY
+    });
+    // Token buckets and render leases shared by every generate-card container.
+    const admissionTable = new dynamodb.Table(this, "AdmissionTable", {
+      partitionKey: { name: "key", type: dynamodb.AttributeType.STRING },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      timeToLiveAttribute: "expiresAt",
+      removalPolicy: RemovalPolicy.DESTROY
+    });
+    const cardJobDeadLetterQueue = new sqs.Queue(this, "CardJobDeadLetterQueue", {
+      retentionPeriod: Duration.days(4)
+    });
+    const cardJobQueue = new sqs.Queue(this, "CardJobQueue", {
+      visibilityTimeout: Duration.minutes(12),
+      deadLetterQueue: { queue: cardJobDeadLetterQueue, maxReceiveCount: 3 }
+    });
+
     const generateCardFn = new lambda.Function(this, "GenerateCard", {
       runtime: lambda.Runtime.PYTHON_3_12,
       architecture: lambda.Architecture.X86_64,
       handler: "lambda_function.lambda_handler",
-      code: lambda.Code.fromAsset(path.join(__dirname, "../../../services/lambda/generate-card"), {
-        bundling: {
-          image: lambda.Runtime.PYTHON_3_12.bundlingImage,
-          command: [
-            "bash",
-            "-c",
-            [
-              "if [ -f requirements.txt ]; then pip install -r requirements.txt -t /asset-output; fi",
-              "cp -R . /asset-output"
-            ].join(" && ")
-          ]
-        }
-      }),
+      code: generateCardCode,
       timeout: Duration.seconds(30),
       memorySize: 2048,
       tracing: lambda.Tracing.ACTIVE,
@@ -156,59 +224,182 @@ export class SunsetForecastStack extends Stack {
       environment: {
         MODEL_ID: props.bedrockModelId ?? "amazon.titan-image-generator-v1",
         BEDROCK_REGION: props.bedrockRegion ?? "us-east-1",
+        BEDROCK_HEDGE_REGION: props.bedrockHedgeRegion ?? "",
+        BEDROCK_HEDGE_MODEL_ID: props.bedrockHedgeModelId ?? "",
         OUTPUT_BUCKET: imageBucket.bucketName,
         CODE_VERSION: "2025-11-07-02",
-        CDN_HOST: props.cdnHost ?? `https://${apexDomain}`
+        CDN_HOST: props.cdnHost ?? `https://${apexDomain}`,
+        JOB_QUEUE_URL: cardJobQueue.queueUrl,
+        JOB_TABLE: cardJobTable.tableName,
+        ADMISSION_TABLE: admissionTable.tableName,
+        TELEMETRY_SAMPLE_RATE: props.telemetrySampleRate ?? "1"
       },
-      layers: [pillowLayer]
+      layers: [pillowLayer, sharedPythonLayer]
     });
 
-    imageBucket.grantReadWrite(generateCardFn);
-    generateCardFn.addToRolePolicy(
-      new iam.PolicyStatement({
-        actions: ["bedrock:InvokeModel", "bedrock:InvokeModelWithResponseStream"],
-        resources: ["*"]
-      })
-    );
-    generateCardFn.addToRolePolicy(
-      new iam.PolicyStatement({
-        actions: [
-          "ssm:GetParameter",
-          "ssm:GetParameters",
-          "ssm:GetParametersByPath",
-          "secretsmanager:GetSecretValue",
-          "secretsmanager:DescribeSecret",
-          "kms:Decrypt"
-        ],
-        resources: ["*"]
+    const generateCardWorkerFn = new lambda.Function(this, "GenerateCardWorker", {
+      runtime: lambda.Runtime.PYTHON_3_12,
+      architecture: lambda.Architecture.X86_64,
+      handler: "lambda_function.worker_handler",
+      code: generateCardCode,
+      timeout: Duration.minutes(2),
+      memorySize: 2048,
+      tracing: lambda.Tracing.ACTIVE,
+      logRetention: logs.RetentionDays.ONE_MONTH,
+      environment: {
+        MODEL_ID: props.bedrockModelId ?? "amazon.titan-image-generator-v1",
+        BEDROCK_REGION: props.bedrockRegion ?? "us-east-1",
+        BEDROCK_HEDGE_REGION: props.bedrockHedgeRegion ?? "",
+        BEDROCK_HEDGE_MODEL_ID: props.bedrockHedgeModelId ?? "",
+        OUTPUT_BUCKET: imageBucket.bucketName,
+        CODE_VERSION: "2025-11-07-02",
+        CDN_HOST: props.cdnHost ?? `https://${apexDomain}`,
+        JOB_QUEUE_URL: cardJobQueue.queueUrl,
+        JOB_TABLE: cardJobTable.tableName,
+        ADMISSION_TABLE: admissionTable.tableName,
+        TELEMETRY_SAMPLE_RATE: props.telemetrySampleRate ?? "1"
+      },
+      layers: [pillowLayer, sharedPythonLayer]
+    });
+    generateCardWorkerFn.addEventSource(
+      new lambdaEventSources.SqsEventSource(cardJobQueue, {
+        batchSize: 1,
+        reportBatchItemFailures: true
       })
     );
 
+    cardJobQueue.grantSendMessages(generateCardFn);
+    cardJobTable.grantReadWriteData(generateCardFn);
+    cardJobTable.grantReadWriteData(generateCardWorkerFn);
+
+    for (const fn of [generateCardFn, generateCardWorkerFn]) {
+      imageBucket.grantReadWrite(fn);
+      admissionTable.grantReadWriteData(fn);
+      fn.addToRolePolicy(
+        new iam.PolicyStatement({
+          actions: ["bedrock:InvokeModel", "bedrock:InvokeModelWithResponseStream"],
+          resources: ["*"]
+        })
+      );
+      fn.addToRolePolicy(
+        new iam.PolicyStatement({
+          actions: [
+            "ssm:GetParameter",
+            "ssm:GetParameters",
+            "ssm:GetParametersByPath",
+            "secretsmanager:GetSecretValue",
+            "secretsmanager:DescribeSecret",
+            "kms:Decrypt"
+          ],
+          resources: ["*"]
+        })
+      );
+    }
+
+    const scoreTilesBucket = new s3.Bucket(this, "ScoreTilesBucket", {
+      blockPublicAccess: s3.BlockPublicAccess.BLOCK_ALL,
+      encryption: s3.BucketEncryption.S3_MANAGED,
+      enforceSSL: true,
+      removalPolicy: RemovalPolicy.DESTROY,
+      autoDeleteObjects: true
+    });
+    const scoreTileUri = `s3://${scoreTilesBucket.bucketName}/tiles/shimane-tottori.bin`;
+
+    const sunsetScoreCode = lambda.Code.fromAsset(path.join(__dirname, "../../../services/lambda/sunset-score"), {
+      bundling: {
+        image: lambda.Runtime.PYTHON_3_12.bundlingImage,
+        command: [
+          "bash",
+          "-c",
+          [
+            "if [ -f requirements.txt ]; then pip install -r requirements.txt -t /asset-output; fi",
+            "cp -R . /asset-output"
+          ].join(" && ")
+        ]
+      }
+    });
+
     const sunsetIndexFn = new lambda.Function(this, "SunsetIndexFunction", {
       runtime: lambda.Runtime.PYTHON_3_12,
       architecture: lambda.Architecture.X86_64,
       handler: "lambda_function.lambda_handler",
-      code: lambda.Code.fromAsset(path.join(__dirname, "../../../services/lambda/sunset-score"), {
-        bundling: {
-          image: lambda.Runtime.PYTHON_3_12.bundlingImage,
-          command: [
-            "bash",
-            "-c",
-            [
-              "if [ -f requirements.txt ]; then pip install -r requirements.txt -t /asset-output; fi",
-              "cp -R . /asset-output"
-            ].join(" && ")
-          ]
-        }
-      }),
+      code: sunsetScoreCode,
       timeout: Duration.seconds(20),
       memorySize: 512,
       logRetention: logs.RetentionDays.ONE_MONTH,
       environment: {
         OPENWEATHER_API: props.weatherApiKey ?? "",
         LAT: props.defaultLat ?? "35.468",
-        LON: props.defaultLon ?? "133.050"
-      }
+        LON: props.defaultLon ?? "133.050",
+        SCORE_TILE_URI: scoreTileUri,
+        TELEMETRY_SAMPLE_RATE: props.telemetrySampleRate ?? "1"
+      },
+      layers: [sharedPythonLayer]
+    });
+    scoreTilesBucket.grantRead(sunsetIndexFn);
+
+    const scoreTileJobFn = new lambda.Function(this, "ScoreTileJobFunction", {
+      runtime: lambda.Runtime.PYTHON_3_12,
+      architecture: lambda.Architecture.X86_64,
+      handler: "tile_job.handler",
+      code: sunsetScoreCode,
+      // 91 points x 2 calls at TILE_CALLS_PER_MINUTE=30 take about 6 minutes.
+      timeout: Duration.minutes(10),
+      memorySize: 512,
+      logRetention: logs.RetentionDays.ONE_MONTH,
+      environment: {
+        OPENWEATHER_API: props.weatherApiKey ?? "",
+        SCORE_TILE_URI: scoreTileUri
+      },
+      layers: [sharedPythonLayer]
+    });
+    scoreTilesBucket.grantReadWrite(scoreTileJobFn);
+
+    new events.Rule(this, "ScoreTileSchedule", {
+      description: "Precompute the regional sunset score tile",
+      schedule: events.Schedule.rate(Duration.hours(1)),
+      targets: [new targets.LambdaFunction(scoreTileJobFn)]
+    });
+
+    // Renders today's popular cards before sunset; the handler itself checks the window around sunset.
+    const cardPregenFn = new lambda.Function(this, "CardPregenFunction", {
+      runtime: lambda.Runtime.PYTHON_3_12,
+      architecture: lambda.Architecture.X86_64,
+      handler: "pregen.handler",
+      code: generateCardCode,
+      timeout: Duration.minutes(5),
+      memorySize: 2048,
+      tracing: lambda.Tracing.ACTIVE,
+      logRetention: logs.RetentionDays.ONE_MONTH,
+      environment: {
+        MODEL_ID: props.bedrockModelId ?? "amazon.titan-image-generator-v1",
+        BEDROCK_REGION: props.bedrockRegion ?? "us-east-1",
+        BEDROCK_HEDGE_REGION: props.bedrockHedgeRegion ?? "",
+        BEDROCK_HEDGE_MODEL_ID: props.bedrockHedgeModelId ?? "",
+        OUTPUT_BUCKET: imageBucket.bucketName,
+        CODE_VERSION: "2025-11-07-02",
+        CDN_HOST: props.cdnHost ?? `https://${apexDomain}`,
+        ADMISSION_TABLE: admissionTable.tableName,
+        SUNSET_SCORE_FUNCTION: sunsetIndexFn.functionName,
+        TELEMETRY_SAMPLE_RATE: props.telemetrySampleRate ?? "1"
+      },
+      layers: [pillowLayer, sharedPythonLayer]
+    });
+    imageBucket.grantReadWrite(cardPregenFn);
+    admissionTable.grantReadWriteData(cardPregenFn);
+    sunsetIndexFn.grantInvoke(cardPregenFn);
+    cardPregenFn.addToRolePolicy(
+      new iam.PolicyStatement({
+        actions: ["bedrock:InvokeModel"],
+        resources: ["*"]
+      })
+    );
+
+    new events.Rule(this, "CardPregenSchedule", {
+      description: "Pre-render today's popular sunset cards",
+      // 14:00-19:50 JST, which covers the render window before sunset all year round.
+      schedule: events.Schedule.cron({ minute: "0/10", hour: "5-10" }),
+      targets: [new targets.LambdaFunction(cardPregenFn)]
     });
 
     const api = new apigateway.RestApi(this, "SunsetApi", {
@@ -237,11 +428,15 @@ export class SunsetForecastStack extends Stack {
     const apiV1 = api.root.addResource("v1");
     const sunsetIndexResource = apiV1.addResource("sunset-index");
     sunsetIndexResource.addMethod("GET", new apigateway.LambdaIntegration(sunsetIndexFn));
+    sunsetIndexResource.addMethod("POST", new apigateway.LambdaIntegration(sunsetIndexFn));
     this.addCorsOptions(sunsetIndexResource);
 
     const generateCardResource = apiV1.addResource("generate-card");
     generateCardResource.addMethod("POST", new apigateway.LambdaIntegration(generateCardFn));
     this.addCorsOptions(generateCardResource);
+    const cardJobResource = generateCardResource.addResource("jobs").addResource("{jobId}");
+    cardJobResource.addMethod("GET", new apigateway.LambdaIntegration(generateCardFn));
+    this.addCorsOptions(cardJobResource);
 
     const oac = new cloudfront.CfnOriginAccessControl(this, "ImagesOAC", {
       originAccessControlConfig: {
@@ -332,6 +527,8 @@ export class SunsetForecastStack extends Stack {
     );
 
     generateCardFn.addEnvironment("CLOUDFRONT_DOMAIN", distribution.attrDomainName);
+    generateCardWorkerFn.addEnvironment("CLOUDFRONT_DOMAIN", distribution.attrDomainName);
+    cardPregenFn.addEnvironment("CLOUDFRONT_DOMAIN", distribution.attrDomainName);
 
     const cloudFrontAliasTarget: route53.IAliasRecordTarget = {
       bind: (): route53.AliasRecordTargetConfig => ({
@@ -358,6 +555,7 @@ export class SunsetForecastStack extends Stack {
 
     new CfnOutput(this, "ApiUrl", { value: `${api.url}v1` });
     new CfnOutput(this, "ImagesBucketName", { value: imageBucket.bucketName });
+    new CfnOutput(this, "ScoreTilesBucketName", { value: scoreTilesBucket.bucketName });
     new CfnOutput(this, "CloudFrontDomain", { value: distribution.attrDomainName });
     new CfnOutput(this, "CloudFrontDistributionId", { value: distribution.attrId });
     new CfnOutput(this, "HostedZoneId", { value: hostedZone.hostedZoneId });
@@ -0,0 +1,237 @@
+"""Admission control for generate-card: per-client token buckets and a global cap on concurrent renders.
+
+Each client (API key if present, else source IP) has a bucket of RATE_LIMIT_BURST tokens refilled at
+RATE_LIMIT_PER_MINUTE; a card costs one token per variant. Admitted renders also take one of
+BEDROCK_MAX_CONCURRENCY leases, sized to the Bedrock quota (roughly TPS x seconds per generation), so
+excess load is refused in milliseconds with 429 instead of queuing inside Bedrock's throttling.
+
+State lives in a store with one atomic ``transact(key, fn)``: in memory (single container), a local
+directory (tests, local runs) or DynamoDB (shared by every container), chosen as in jobs.py.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import coldstart
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "5"))
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "6"))
+BEDROCK_MAX_CONCURRENCY = int(os.getenv("BEDROCK_MAX_CONCURRENCY", "4"))
+# Leases normally end on release; the TTL only reclaims slots from invocations that died mid-render.
+LEASE_TTL_SECONDS = float(os.getenv("ADMISSION_LEASE_TTL_SECONDS", "120"))
+BUSY_RETRY_AFTER_SECONDS = float(os.getenv("ADMISSION_BUSY_RETRY_AFTER_SECONDS", "3"))
+JOB_SLOT_WAIT_SECONDS = float(os.getenv("ADMISSION_JOB_WAIT_SECONDS", "20"))
+STATE_TTL_SECONDS = 24 * 3600
+SLOTS_KEY = "slots:bedrock"
+
+Transaction = Callable[[Dict[str, Any]], Tuple[Dict[str, Any], Any]]
+
+
+class Rejected(Exception):
+    """Request refused before any Bedrock work; ``retry_after`` is seconds until it would be admitted."""
+
+    def __init__(self, reason: str, retry_after: float) -> None:
+        super().__init__(f"{reason}: retry after {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def client_key(event: Dict[str, Any]) -> str:
+    """Rate-limit key: the API key API Gateway validated, else the source IP it saw.
+
+    Request headers are never trusted while either is present; a client could send a fresh
+    ``x-api-key`` or ``X-Forwarded-For`` on each request and get a full bucket every time.
+    """
+    identity = (event.get("requestContext") or {}).get("identity") or {}
+    api_key = identity.get("apiKey")
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    source_ip = identity.get("sourceIp")
+    headers = {str(key).lower(): value for key, value in (event.get("headers") or {}).items()}
+    # Only direct invocations without an API Gateway request context get here.
+    if not source_ip and headers.get("x-forwarded-for"):
+        source_ip = headers["x-forwarded-for"].split(",")[0].strip()
+    return f"ip:{source_ip or 'unknown'}"
+
+
+def take_tokens(
+    state: Dict[str, Any], capacity: float, per_second: float, cost: float, now: float
+) -> Tuple[Dict[str, Any], float]:
+    """Refill then take ``cost`` tokens; returns (new state, seconds to wait, 0 when taken). Negative cost refunds."""
+    tokens = min(capacity, state.get("tokens", capacity) + (now - state.get("at", now)) * per_second)
+    if tokens >= cost:
+        return {"tokens": min(capacity, tokens - cost), "at": now}, 0.0
+    wait = (cost - tokens) / per_second if per_second > 0 else STATE_TTL_SECONDS
+    return {"tokens": tokens, "at": now}, wait
+
+
+def take_lease(
+    state: Dict[str, Any], limit: int, ttl: float, lease_id: str, now: float
+) -> Tuple[Dict[str, Any], bool]:
+    leases = {key: expires for key, expires in (state.get("leases") or {}).items() if expires > now}
+    if len(leases) >= limit:
+        return {"leases": leases}, False
+    leases[lease_id] = now + ttl
+    return {"leases": leases}, True
+
+
+def drop_lease(state: Dict[str, Any], lease_id: str, now: float) -> Tuple[Dict[str, Any], None]:
+    leases = {key: expires for key, expires in (state.get("leases") or {}).items() if expires > now and key != lease_id}
+    return {"leases": leases}, None
+
+
+class MemoryStateStore:
+    """Per-container state; enough for one process, or as the fallback when no shared store is configured."""
+
+    def __init__(self, max_keys: int = 10000) -> None:
+        self.max_keys = max_keys
+        self._states: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def transact(self, key: str, func: Transaction) -> Any:
+        with self._lock:
+            state, result = func(self._states.get(key) or {})
+            self._states[key] = state
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_keys:
+                self._states.popitem(last=False)
+            return result
+
+
+class LocalStateStore:
+    """Directory-backed stand-in for DynamoStateStore; flock makes each transaction atomic across processes."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def transact(self, key: str, func: Transaction) -> Any:
+        path = os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + ".json")
+        with open(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), "r+", encoding="utf-8") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            raw = handle.read()
+            state, result = func(json.loads(raw) if raw else {})
+            handle.seek(0)
+            handle.truncate()
+            json.dump(state, handle)
+            return result
+
+
+class DynamoStateStore:
+    """State items keyed on ``key`` with optimistic versioning; ``expiresAt`` is the table's TTL attribute."""
+
+    def __init__(self, dynamodb_client: Any, table: str, max_retries: int = 8) -> None:
+        self.dynamodb = dynamodb_client
+        self.table = table
+        self.max_retries = max_retries
+
+    def transact(self, key: str, func: Transaction) -> Any:
+        for attempt in range(self.max_retries):
+            response = self.dynamodb.get_item(TableName=self.table, Key={"key": {"S": key}}, ConsistentRead=True)
+            item = response.get("Item")
+            version = int(item["version"]["N"]) if item else 0
+            state, result = func(json.loads(item["state"]["S"]) if item else {})
+            try:
+                self.dynamodb.put_item(
+                    TableName=self.table,
+                    Item={
+                        "key": {"S": key},
+                        "version": {"N": str(version + 1)},
+                        "state": {"S": json.dumps(state)},
+                        "expiresAt": {"N": str(int(time.time()) + STATE_TTL_SECONDS)},
+                    },
+                    ConditionExpression="attribute_not_exists(#k) OR version = :version",
+                    ExpressionAttributeNames={"#k": "key"},
+                    ExpressionAttributeValues={":version": {"N": str(version)}},
+                )
+                return result
+            except self.dynamodb.exceptions.ConditionalCheckFailedException:
+                time.sleep(random.uniform(0, 0.005 * 2 ** attempt))
+        raise RuntimeError(f"Admission state for {key} is too contended")
+
+
+class AdmissionControl:
+    def __init__(
+        self,
+        store: Any,
+        burst: float = RATE_LIMIT_BURST,
+        per_minute: float = RATE_LIMIT_PER_MINUTE,
+        max_concurrency: int = BEDROCK_MAX_CONCURRENCY,
+        lease_ttl: float = LEASE_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.store = store
+        self.burst = burst
+        self.per_second = per_minute / 60
+        self.max_concurrency = max_concurrency
+        self.lease_ttl = lease_ttl
+        self.clock = clock
+
+    def charge(self, client: str, cost: float = 1) -> None:
+        """Take ``cost`` tokens from the client's bucket or raise Rejected."""
+        wait = self.store.transact(
+            f"bucket:{client}",
+            lambda state: take_tokens(state, self.burst, self.per_second, cost, self.clock()),
+        )
+        if wait > 0:
+            raise Rejected("rate_limited", wait)
+
+    def refund(self, client: str, cost: float = 1) -> None:
+        self.store.transact(
+            f"bucket:{client}",
+            lambda state: take_tokens(state, self.burst, self.per_second, -cost, self.clock()),
+        )
+
+    @contextmanager
+    def render_slot(
+        self,
+        client: Optional[str] = None,
+        cost: float = 1,
+        wait_seconds: float = 0.0,
+        limit: Optional[int] = None,
+    ) -> Iterator[None]:
+        """Hold one of the global render leases, waiting up to ``wait_seconds`` for one to free up.
+
+        A ``limit`` below max_concurrency makes the caller low priority: it only takes a lease while
+        fewer than ``limit`` are held, leaving the rest for others. When none is available the
+        client's charge is refunded and Rejected is raised.
+        """
+        limit = self.max_concurrency if limit is None else min(limit, self.max_concurrency)
+        lease_id = uuid.uuid4().hex
+        give_up_at = time.monotonic() + wait_seconds
+        while not self.store.transact(
+            SLOTS_KEY, lambda state: take_lease(state, limit, self.lease_ttl, lease_id, self.clock())
+        ):
+            if time.monotonic() >= give_up_at:
+                if client is not None:
+                    self.refund(client, cost)
+                raise Rejected("at_capacity", BUSY_RETRY_AFTER_SECONDS)
+            time.sleep(min(0.25, max(0.0, give_up_at - time.monotonic())))
+        try:
+            yield
+        finally:
+            self.store.transact(SLOTS_KEY, lambda state: drop_lease(state, lease_id, self.clock()))
+
+
+def build_admission_control() -> Optional[AdmissionControl]:
+    """From the environment: DynamoDB when ADMISSION_TABLE is set, a directory for ADMISSION_LOCAL_DIR, else memory."""
+    if not ADMISSION_ENABLED:
+        return None
+    local_dir = (os.getenv("ADMISSION_LOCAL_DIR") or "").strip()
+    table = (os.getenv("ADMISSION_TABLE") or "").strip()
+    if local_dir:
+        store: Any = LocalStateStore(local_dir)
+    elif table:
+        store = DynamoStateStore(coldstart.LazyClient("dynamodb"), table)
+    else:
+        store = MemoryStateStore()
+    return AdmissionControl(store)
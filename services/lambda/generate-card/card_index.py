@@ -0,0 +1,140 @@
+"""Lookup index of pre-rendered cards, written by pregen.py and read by the live handler.
+
+One JSON object per card date maps a card key (everything that changes the rendered card) to the
+response payload of its render. Live lookups reuse an in-process copy of the day's index for
+PREGEN_INDEX_TTL_SECONDS, so a request normally costs a dictionary lookup.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+LOGGER = logging.getLogger(__name__)
+
+INDEX_PREFIX = os.getenv("PREGEN_INDEX_PREFIX", "pregen/index/")
+INDEX_TTL_SECONDS = float(os.getenv("PREGEN_INDEX_TTL_SECONDS", "60"))
+
+
+def card_key(card: Any, model_id: str) -> str:
+    """Key of a card request; the sunset time is left out because the renderer derives it from the date."""
+    canonical = json.dumps(
+        {
+            "modelId": model_id,
+            "location": card.location,
+            "date": card.date,
+            "style": card.style,
+            "textSize": card.text_size,
+            "conditions": card.conditions,
+            "score": card.score,
+            "prompt": card.prompt,
+            "variants": card.variants,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class S3IndexStore:
+    def __init__(self, s3_client: Any, bucket: str, prefix: str = INDEX_PREFIX) -> None:
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def get(self, day: str) -> Optional[Dict[str, Any]]:
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=f"{self.prefix}{day}.json")
+        except ClientError as err:
+            if err.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return None
+            raise
+        return json.loads(response["Body"].read())
+
+    def put(self, day: str, entries: Dict[str, Any]) -> None:
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=f"{self.prefix}{day}.json",
+            Body=json.dumps(entries, ensure_ascii=False).encode("utf-8"),
+            ContentType="application/json",
+        )
+
+
+class LocalIndexStore:
+    """Directory-backed stand-in for S3IndexStore, for tests and local runs."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, day: str) -> str:
+        return os.path.join(self.directory, f"{day}.json")
+
+    def get(self, day: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(day), encoding="utf-8") as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return None
+
+    def put(self, day: str, entries: Dict[str, Any]) -> None:
+        tmp_path = self._path(day) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(entries, handle, ensure_ascii=False)
+        os.replace(tmp_path, self._path(day))
+
+
+class CardIndex:
+    """Day indexes cached in process for ``ttl`` seconds; only the scheduled job registers entries."""
+
+    def __init__(
+        self, store: Any, ttl: float = INDEX_TTL_SECONDS, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.store = store
+        self.ttl = ttl
+        self.clock = clock
+        self._days: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, day: str, key: str) -> Optional[Dict[str, Any]]:
+        """The pre-rendered payload for ``key``, or None; a failing store is treated as a miss."""
+        with self._lock:
+            cached = self._days.get(day)
+        if cached is None or self.clock() - cached[0] >= self.ttl:
+            try:
+                entries = self.store.get(day) or {}
+            except Exception as exc:  # pylint: disable=broad-except
+                # The index must never turn a servable request into an error.
+                LOGGER.warning(json.dumps({"event": "card_index.error", "op": "get", "error": str(exc)}))
+                entries = cached[1] if cached else {}
+            cached = (self.clock(), entries)
+            with self._lock:
+                # Live requests only ask for today, so yesterday's index can go.
+                self._days = {day: cached}
+        return cached[1].get(key)
+
+    def entries(self, day: str) -> Dict[str, Any]:
+        """The stored index for ``day``, bypassing the cache."""
+        return self.store.get(day) or {}
+
+    def register(self, day: str, key: str, payload: Dict[str, Any]) -> None:
+        entries = {**self.entries(day), key: payload}
+        self.store.put(day, entries)
+        with self._lock:
+            self._days[day] = (self.clock(), entries)
+
+
+def build_card_index(s3_client: Any, bucket: Optional[str]) -> Optional[CardIndex]:
+    if os.getenv("PREGEN_INDEX_ENABLED", "1") != "1":
+        return None
+    local_dir = (os.getenv("PREGEN_INDEX_DIR") or "").strip()
+    if local_dir:
+        return CardIndex(LocalIndexStore(local_dir))
+    if bucket:
+        return CardIndex(S3IndexStore(s3_client, bucket))
+    return None
@@ -0,0 +1,124 @@
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterable, Optional, Tuple
+
+# Pillow is imported where text is drawn, not at module import, so paths that never render skip it.
+if TYPE_CHECKING:
+    from PIL import Image, ImageFont
+
+    Font = ImageFont.FreeTypeFont | ImageFont.ImageFont
+
+FONT_CANDIDATES = (
+    "/opt/fonts/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+)
+TEXT_LAYER_CACHE_BYTES = int(os.getenv("TEXT_LAYER_CACHE_BYTES", str(8 * 1024 * 1024)))
+
+
+@lru_cache(maxsize=1)
+def font_path() -> Optional[str]:
+    """First usable font file; probed once per container."""
+    from PIL import ImageFont  # pylint: disable=import-outside-toplevel
+
+    for candidate in FONT_CANDIDATES:
+        if os.path.exists(candidate):
+            try:
+                ImageFont.truetype(candidate, 12)
+                return candidate
+            except OSError:
+                continue
+    return None
+
+
+@lru_cache(maxsize=32)
+def load_font(size: int, path: Optional[str] = None) -> "Font":
+    """Parsed font face, keyed by (size, path) and kept for the life of the container."""
+    from PIL import ImageFont  # pylint: disable=import-outside-toplevel
+
+    path = path or font_path()
+    if path:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            pass
+    return ImageFont.load_default()
+
+
+def preload(sizes: Iterable[int]) -> None:
+    for size in sizes:
+        load_font(size)
+
+
+class TextLayerCache:
+    """LRU cache of rasterized text masks, bounded by total mask bytes.
+
+    Stamping a cached mask with Image.paste is pixel-identical to ImageDraw.text on the same target.
+    """
+
+    def __init__(self, max_bytes: int = TEXT_LAYER_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, Tuple[Image.Image, int, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def draw_text(
+        self,
+        image: "Image.Image",
+        xy: Tuple[float, float],
+        text: str,
+        font: "Font",
+        fill: Tuple[int, ...],
+        anchor: Optional[str] = None,
+    ) -> None:
+        from PIL import ImageDraw, ImageFont  # pylint: disable=import-outside-toplevel
+
+        if not isinstance(font, ImageFont.FreeTypeFont):
+            ImageDraw.Draw(image).text(xy, text, font=font, fill=fill, anchor=anchor)
+            return
+
+        x, y = xy
+        frac_x, frac_y = round(x - int(x), 3), round(y - int(y), 3)
+        key = (text, font.path, font.size, anchor, frac_x, frac_y)
+        mask, pad_x, pad_y = self._mask(key, text, font, anchor, frac_x, frac_y)
+        left, top = int(x) - pad_x, int(y) - pad_y
+        image.paste(fill, (left, top, left + mask.width, top + mask.height), mask)
+
+    def _mask(
+        self,
+        key: tuple,
+        text: str,
+        font: "ImageFont.FreeTypeFont",
+        anchor: Optional[str],
+        frac_x: float,
+        frac_y: float,
+    ) -> "Tuple[Image.Image, int, int]":
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        from PIL import Image, ImageDraw  # pylint: disable=import-outside-toplevel
+
+        left, top, right, bottom = font.getbbox(text, anchor=anchor)
+        pad_x, pad_y = max(0, -left) + 1, max(0, -top) + 1
+        mask = Image.new("L", (pad_x + max(right, 0) + 2, pad_y + max(bottom, 0) + 2))
+        ImageDraw.Draw(mask).text((frac_x + pad_x, frac_y + pad_y), text, font=font, fill=255, anchor=anchor)
+        entry = (mask, pad_x, pad_y)
+
+        size = mask.width * mask.height
+        with self._lock:
+            self.misses += 1
+            if size <= self.max_bytes and key not in self._entries:
+                self._entries[key] = entry
+                self.current_bytes += size
+                while self.current_bytes > self.max_bytes:
+                    _key, (evicted, _px, _py) = self._entries.popitem(last=False)
+                    self.current_bytes -= evicted.width * evicted.height
+        return entry
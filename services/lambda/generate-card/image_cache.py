@@ -0,0 +1,227 @@
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+LOGGER = logging.getLogger(__name__)
+
+CACHE_PREFIX = os.getenv("IMAGE_CACHE_PREFIX", "cache/bedrock/")
+LEASE_SECONDS = float(os.getenv("IMAGE_CACHE_LEASE_SECONDS", "25"))
+LEASE_POLL_SECONDS = float(os.getenv("IMAGE_CACHE_POLL_SECONDS", "0.5"))
+LEASE_WAIT_SECONDS = float(os.getenv("IMAGE_CACHE_WAIT_SECONDS", "20"))
+# Time a waiter keeps back for its own Bedrock call in case the lease holder never writes the entry.
+INVOKE_RESERVE_SECONDS = float(os.getenv("IMAGE_CACHE_INVOKE_RESERVE_SECONDS", "10"))
+
+_FRAME = struct.Struct(">I")
+
+
+def cache_key(titan_payload: Dict[str, Any], model_id: str) -> str:
+    """Content address of a generation: sha256 over the model id and canonical payload JSON."""
+    canonical = json.dumps(
+        {"modelId": model_id, "payload": titan_payload},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def lease_wait_seconds(remaining: float) -> float:
+    """How long to wait on another container's lease when ``remaining`` seconds are left for the request."""
+    return max(0.0, min(LEASE_WAIT_SECONDS, remaining - INVOKE_RESERVE_SECONDS))
+
+
+def pack_images(images: List[bytes]) -> bytes:
+    """One cache blob for a multi-image generation: length-prefixed frames."""
+    return b"".join(_FRAME.pack(len(image)) + image for image in images)
+
+
+def unpack_images(blob: bytes) -> List[bytes]:
+    view = memoryview(blob)
+    images = []
+    offset = 0
+    while offset < len(view):
+        (size,) = _FRAME.unpack_from(view, offset)
+        offset += _FRAME.size
+        images.append(bytes(view[offset:offset + size]))
+        offset += size
+    return images
+
+
+class S3ImageStore:
+    def __init__(self, s3_client: Any, bucket: str, prefix: str = CACHE_PREFIX) -> None:
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _key(self, key: str, suffix: str = ".bin") -> str:
+        return f"{self.prefix}{key[:2]}/{key}{suffix}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as err:
+            if err.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return None
+            raise
+        return response["Body"].read()
+
+    def put(self, key: str, image_bytes: bytes) -> None:
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=self._key(key),
+            Body=image_bytes,
+            ContentType="application/octet-stream",
+        )
+
+    def acquire_lease(self, key: str) -> bool:
+        """Create the in-flight marker; False if another invocation already holds a live one."""
+        lease_key = self._key(key, ".lease")
+        try:
+            self.s3.put_object(Bucket=self.bucket, Key=lease_key, Body=b"", IfNoneMatch="*")
+            return True
+        except ClientError as err:
+            if err.response["Error"]["Code"] not in ("PreconditionFailed", "412", "ConditionalRequestConflict"):
+                raise
+        head = self.s3.head_object(Bucket=self.bucket, Key=lease_key)
+        if time.time() - head["LastModified"].timestamp() > LEASE_SECONDS:
+            self.s3.put_object(Bucket=self.bucket, Key=lease_key, Body=b"")
+            return True
+        return False
+
+    def release_lease(self, key: str) -> None:
+        self.s3.delete_object(Bucket=self.bucket, Key=self._key(key, ".lease"))
+
+
+class LocalImageStore:
+    """Directory-backed stand-in for S3ImageStore, for tests and local runs."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str, suffix: str = ".bin") -> str:
+        return os.path.join(self.directory, f"{key}{suffix}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as handle:
+                return handle.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, image_bytes: bytes) -> None:
+        tmp_path = self._path(key, ".tmp")
+        with open(tmp_path, "wb") as handle:
+            handle.write(image_bytes)
+        os.replace(tmp_path, self._path(key))
+
+    def acquire_lease(self, key: str) -> bool:
+        lease_path = self._path(key, ".lease")
+        try:
+            os.close(os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            if time.time() - os.path.getmtime(lease_path) > LEASE_SECONDS:
+                os.utime(lease_path)
+                return True
+            return False
+
+    def release_lease(self, key: str) -> None:
+        try:
+            os.remove(self._path(key, ".lease"))
+        except FileNotFoundError:
+            pass
+
+
+class ImageCache:
+    """Content-addressed cache that coalesces identical generations in and across containers."""
+
+    def __init__(self, store: Any) -> None:
+        self.store = store
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def get_or_generate(
+        self, key: str, generate: Callable[[], bytes], wait_seconds: float = LEASE_WAIT_SECONDS
+    ) -> bytes:
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            return future.result()
+
+        try:
+            result = self._load_or_generate(key, generate, wait_seconds)
+            future.set_result(result)
+            return result
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _load_or_generate(self, key: str, generate: Callable[[], bytes], wait_seconds: float) -> bytes:
+        cached = self._safe_get(key)
+        if cached is not None:
+            LOGGER.info(json.dumps({"event": "image_cache.hit", "key": key}))
+            return cached
+
+        leased = self._safe_call(self.store.acquire_lease, key, default=True)
+        if not leased:
+            cached = self._wait_for(key, wait_seconds)
+            if cached is not None:
+                LOGGER.info(json.dumps({"event": "image_cache.coalesced", "key": key}))
+                return cached
+
+        LOGGER.info(json.dumps({"event": "image_cache.miss", "key": key}))
+        try:
+            image_bytes = generate()
+            self._safe_call(self.store.put, key, image_bytes)
+            return image_bytes
+        finally:
+            if leased:
+                self._safe_call(self.store.release_lease, key)
+
+    def _wait_for(self, key: str, wait_seconds: float) -> Optional[bytes]:
+        deadline = time.monotonic() + wait_seconds
+        while time.monotonic() < deadline:
+            time.sleep(LEASE_POLL_SECONDS)
+            cached = self._safe_get(key)
+            if cached is not None:
+                return cached
+        return None
+
+    def _safe_get(self, key: str) -> Optional[bytes]:
+        return self._safe_call(self.store.get, key, default=None)
+
+    @staticmethod
+    def _safe_call(func: Callable[..., Any], *args: Any, default: Any = None) -> Any:
+        # The cache must never turn a servable request into an error.
+        try:
+            return func(*args)
+        except Exception as exc:  # pylint: disable=broad-except
+            LOGGER.warning(json.dumps({"event": "image_cache.error", "op": func.__name__, "error": str(exc)}))
+            return default
+
+
+def build_image_cache(s3_client: Any, bucket: Optional[str]) -> Optional[ImageCache]:
+    if os.getenv("IMAGE_CACHE_ENABLED", "1") != "1":
+        return None
+    local_dir = (os.getenv("IMAGE_CACHE_DIR") or "").strip()
+    if local_dir:
+        return ImageCache(LocalImageStore(local_dir))
+    if bucket:
+        return ImageCache(S3ImageStore(s3_client, bucket))
+    return None
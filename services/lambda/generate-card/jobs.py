@@ -0,0 +1,212 @@
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import coldstart
+
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", str(24 * 3600)))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Failed attempts come back after this backoff instead of the queue's 12-minute visibility timeout.
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "60"))
+
+QUEUED = "queued"
+RUNNING = "running"
+RETRYING = "retrying"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL = frozenset({SUCCEEDED, FAILED})
+
+# Progress reported while RUNNING, in pipeline order.
+STAGES = ("generating", "rendering", "uploading")
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def new_record(job_id: str, card: Dict[str, Any], summary: Dict[str, Any]) -> Dict[str, Any]:
+    now = int(time.time())
+    return {
+        "jobId": job_id,
+        "status": QUEUED,
+        "stage": None,
+        "attempts": 0,
+        "card": card,
+        "request": summary,
+        "createdAt": now,
+        "updatedAt": now,
+        "expiresAt": now + JOB_TTL_SECONDS,
+    }
+
+
+def public_view(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields returned by the status endpoint; the stored card payload stays internal."""
+    view = {key: record.get(key) for key in ("jobId", "status", "stage", "attempts", "request", "createdAt", "updatedAt")}
+    if record.get("result"):
+        view.update(record["result"])
+    if record.get("error"):
+        view["error"] = record["error"]
+    return view
+
+
+class DynamoJobStore:
+    """Job records in a DynamoDB table keyed on ``jobId`` with ``expiresAt`` as the TTL attribute."""
+
+    def __init__(self, dynamodb_client: Any, table: str) -> None:
+        self.dynamodb = dynamodb_client
+        self.table = table
+
+    def create(self, record: Dict[str, Any]) -> None:
+        self.dynamodb.put_item(
+            TableName=self.table,
+            Item=self._item(record),
+            ConditionExpression="attribute_not_exists(jobId)",
+        )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        response = self.dynamodb.get_item(TableName=self.table, Key={"jobId": {"S": job_id}}, ConsistentRead=True)
+        item = response.get("Item")
+        if not item:
+            return None
+        return json.loads(item["record"]["S"])
+
+    def update(self, job_id: str, **fields: Any) -> Dict[str, Any]:
+        # Only the worker writes after creation, so read-modify-write is sufficient.
+        record = self.get(job_id) or {"jobId": job_id}
+        record.update(fields, updatedAt=int(time.time()))
+        self.dynamodb.put_item(TableName=self.table, Item=self._item(record))
+        return record
+
+    @staticmethod
+    def _item(record: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "jobId": {"S": record["jobId"]},
+            "status": {"S": record.get("status") or QUEUED},
+            "expiresAt": {"N": str(record.get("expiresAt") or int(time.time()) + JOB_TTL_SECONDS)},
+            "record": {"S": json.dumps(record, ensure_ascii=False)},
+        }
+
+
+class SqsJobQueue:
+    def __init__(self, sqs_client: Any, queue_url: str) -> None:
+        self.sqs = sqs_client
+        self.queue_url = queue_url
+
+    def send(self, message: Dict[str, Any]) -> None:
+        self.sqs.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(message, ensure_ascii=False))
+
+    def retry_later(self, receipt_handle: str, delay_seconds: float) -> None:
+        """Make a message reported as failed visible again after ``delay_seconds``."""
+        self.sqs.change_message_visibility(
+            QueueUrl=self.queue_url, ReceiptHandle=receipt_handle, VisibilityTimeout=int(round(delay_seconds))
+        )
+
+
+class LocalJobStore:
+    """Directory-backed stand-in for DynamoJobStore, for tests and local runs."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def create(self, record: Dict[str, Any]) -> None:
+        self._write(record)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(job_id), encoding="utf-8") as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return None
+
+    def update(self, job_id: str, **fields: Any) -> Dict[str, Any]:
+        record = self.get(job_id) or {"jobId": job_id}
+        record.update(fields, updatedAt=int(time.time()))
+        self._write(record)
+        return record
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        tmp_path = self._path(record["jobId"]) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(record, handle, ensure_ascii=False)
+        os.replace(tmp_path, self._path(record["jobId"]))
+
+
+class LocalJobQueue:
+    """Spool-directory stand-in for SqsJobQueue; ``receive`` returns an SQS-shaped event for worker_handler."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, message: Dict[str, Any]) -> None:
+        message_id = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        tmp_path = os.path.join(self.directory, f"{message_id}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(message, handle, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(self.directory, f"{message_id}.msg"))
+
+    def retry_later(self, receipt_handle: str, delay_seconds: float) -> None:
+        """Spooled messages are consumed on receive, so a local failure is not redelivered."""
+
+    def receive(self, max_messages: int = 10) -> Dict[str, Any]:
+        records = []
+        for name in sorted(os.listdir(self.directory)):
+            if len(records) >= max_messages:
+                break
+            if not name.endswith(".msg"):
+                continue
+            claimed = os.path.join(self.directory, name[:-4] + ".claimed")
+            try:
+                os.rename(os.path.join(self.directory, name), claimed)
+            except FileNotFoundError:
+                continue  # another local worker claimed it
+            with open(claimed, encoding="utf-8") as handle:
+                body = handle.read()
+            os.remove(claimed)
+            records.append(
+                {
+                    "messageId": name[:-4],
+                    "receiptHandle": name[:-4],
+                    "body": body,
+                    "eventSource": "aws:sqs",
+                    "attributes": {"ApproximateReceiveCount": "1"},
+                }
+            )
+        return {"Records": records}
+
+
+def sqs_messages(event: Dict[str, Any]) -> List[Tuple[str, str, Dict[str, Any], int]]:
+    """(messageId, receiptHandle, body, receive count) for each SQS record in a Lambda event."""
+    messages = []
+    for record in event.get("Records") or []:
+        receive_count = int((record.get("attributes") or {}).get("ApproximateReceiveCount", "1"))
+        messages.append(
+            (record["messageId"], record.get("receiptHandle", ""), json.loads(record["body"]), receive_count)
+        )
+    return messages
+
+
+def retry_delay(receive_count: int) -> float:
+    """Seconds before attempt ``receive_count + 1``: doubling from JOB_RETRY_BASE_SECONDS up to the cap."""
+    return min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * 2 ** max(0, receive_count - 1))
+
+
+def build_job_backends() -> Tuple[Optional[Any], Optional[Any]]:
+    """(queue, store) from the environment; (None, None) leaves async mode disabled."""
+    local_dir = (os.getenv("JOB_LOCAL_DIR") or "").strip()
+    if local_dir:
+        return LocalJobQueue(os.path.join(local_dir, "queue")), LocalJobStore(os.path.join(local_dir, "jobs"))
+
+    queue_url = (os.getenv("JOB_QUEUE_URL") or "").strip()
+    table = (os.getenv("JOB_TABLE") or "").strip()
+    if not queue_url or not table:
+        return None, None
+
+    return SqsJobQueue(coldstart.LazyClient("sqs"), queue_url), DynamoJobStore(coldstart.LazyClient("dynamodb"), table)
@@ -1,26 +1,50 @@
 import base64
+import binascii
 import json
 import logging
 import os
 import re
 import uuid
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass
 from datetime import date, datetime
+from functools import lru_cache, partial
 from io import BytesIO
-from typing import Any, Dict, Optional
+from typing import TYPE_CHECKING, Any, Callable, ContextManager, Dict, List, Optional
 
-import boto3
-from astral import LocationInfo
-from astral.sun import sun
 from botocore.exceptions import BotoCoreError, ClientError
-from PIL import Image, ImageDraw, ImageFont
 from zoneinfo import ZoneInfo
 
+import admission
+import coldstart
+import fonts
+import jobs
+import renditions
+import resilience
+import telemetry
+from card_index import build_card_index, card_key
+from image_cache import build_image_cache, cache_key, lease_wait_seconds, pack_images, unpack_images
+
+# Pillow is imported by the compose and encode paths (or by prewarm), not at module import.
+if TYPE_CHECKING:
+    from PIL import Image
+
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.INFO)
 
+SERVICE_NAME = "generate-card"
 MODEL_ID = os.getenv("MODEL_ID", "amazon.titan-image-generator-v1")
 BEDROCK_REGION = os.getenv("BEDROCK_REGION", "us-east-1")
+# API Gateway gives up at 29 s; leave time for overlay, encode and upload after Bedrock answers.
+BEDROCK_DEADLINE_SECONDS = float(os.getenv("BEDROCK_DEADLINE_SECONDS", "22"))
+BEDROCK_JOB_DEADLINE_SECONDS = float(os.getenv("BEDROCK_JOB_DEADLINE_SECONDS", "90"))
+RENDER_RESERVE_SECONDS = float(os.getenv("RENDER_RESERVE_SECONDS", "6"))
+BEDROCK_READ_TIMEOUT = float(os.getenv("BEDROCK_READ_TIMEOUT", "25"))
+# Optional hedge: a second region and/or model tried when the primary is slow or its breaker is open.
+BEDROCK_HEDGE_REGION = (os.getenv("BEDROCK_HEDGE_REGION") or "").strip()
+BEDROCK_HEDGE_MODEL_ID = (os.getenv("BEDROCK_HEDGE_MODEL_ID") or "").strip()
+BEDROCK_HEDGE_AFTER_SECONDS = float(os.getenv("BEDROCK_HEDGE_AFTER_SECONDS", "12"))
 OUTPUT_BUCKET = os.getenv("OUTPUT_BUCKET")
 CLOUDFRONT_DOMAIN = (os.getenv("CLOUDFRONT_DOMAIN") or "").strip()
 CDN_HOST = (os.getenv("CDN_HOST") or "").strip()
@@ -28,6 +52,12 @@ CODE_VERSION = os.getenv("CODE_VERSION", "2025-11-07-02")
 JST = ZoneInfo("Asia/Tokyo")
 FIXED_LAT = 35.4690
 FIXED_LON = 133.0505
+GRADIENT_COLOR = (13, 16, 35)
+# Titan accepts at most five images per invocation.
+MAX_VARIANTS = min(5, int(os.getenv("MAX_VARIANTS", "5")))
+VARIANT_WORKERS = int(os.getenv("VARIANT_WORKERS", "4"))
+_IMAGES_FIELD = re.compile(rb'"images"\s*:\s*\[')
+_JSON_WHITESPACE = b" \t\r\n"
 
 CORS_HEADERS = {
     "Access-Control-Allow-Origin": "https://matsuesunsetai.com",
@@ -39,14 +69,32 @@ CORS_HEADERS = {
 if not OUTPUT_BUCKET:
     LOGGER.error(json.dumps({"message": "Missing OUTPUT_BUCKET env", "codeVersion": CODE_VERSION}))
 
-bedrock = boto3.client("bedrock-runtime", region_name=BEDROCK_REGION)
-s3 = boto3.client("s3")
+# Built on first use: boto3, botocore.config and the service models are not loaded on paths that never call AWS.
+bedrock = coldstart.LazyClient(
+    "bedrock-runtime", partial(resilience.client_config, BEDROCK_READ_TIMEOUT), region_name=BEDROCK_REGION
+)
+s3 = coldstart.LazyClient("s3")
+bedrock_invoker = resilience.build_invoker(
+    resilience.Target("primary", bedrock, MODEL_ID),
+    BEDROCK_REGION,
+    BEDROCK_HEDGE_REGION,
+    BEDROCK_HEDGE_MODEL_ID,
+    BEDROCK_HEDGE_AFTER_SECONDS,
+    BEDROCK_READ_TIMEOUT,
+)
+image_cache = build_image_cache(s3, OUTPUT_BUCKET)
+card_index = build_card_index(s3, OUTPUT_BUCKET)
+text_layers = fonts.TextLayerCache()
+job_queue, job_store = jobs.build_job_backends()
+admission_control = admission.build_admission_control()
+_VARIANT_EXECUTOR = ThreadPoolExecutor(max_workers=VARIANT_WORKERS)
+_UPLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=8)
 
 
 def compute_sunset_jst(target_date: date) -> datetime:
-    loc = LocationInfo(latitude=FIXED_LAT, longitude=FIXED_LON)
-    timings = sun(loc.observer, date=target_date, tzinfo=JST)
-    return timings["sunset"]
+    import ephemeris  # pylint: disable=import-outside-toplevel
+
+    return ephemeris.sunset_datetime(target_date, FIXED_LAT, FIXED_LON, JST)
 
 
 class ValidationError(Exception):
@@ -63,6 +111,7 @@ class CardRequest:
     sunset_time: str
     conditions: str
     prompt: Optional[str]
+    variants: int = 1
 
     def summary(self) -> Dict[str, str]:
         return {
@@ -71,6 +120,7 @@ class CardRequest:
             "style": self.style,
             "textSize": self.text_size,
             "score": self.score,
+            "variants": self.variants,
         }
 
 
@@ -85,49 +135,280 @@ def _style_prompt(style: str) -> str:
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     request_id = getattr(context, "aws_request_id", str(uuid.uuid4()))
 
+    if coldstart.is_prewarm_event(event):
+        return coldstart.run_prewarm(prewarm)
     if event.get("httpMethod") == "OPTIONS":
         return _options_response()
+    if event.get("httpMethod") == "GET":
+        return _job_status_response(event, request_id)
 
-    try:
-        card_request = _parse_payload(event)
-        target_date = datetime.now(JST).date()
-        sunset = compute_sunset_jst(target_date)
-        sunset_str = sunset.strftime("%H:%M")
-        card_request.sunset_time = sunset_str
-        _log_info("request.received", request_id, payload=card_request.summary())
+    trace = telemetry.start(SERVICE_NAME, request_id, operation="sync")
+    deadline = resilience.Deadline.for_invocation(context, BEDROCK_DEADLINE_SECONDS, RENDER_RESERVE_SECONDS)
+    response = _handle_card_post(event, request_id, trace, deadline)
+    trace.emit(statusCode=response["statusCode"])
+    return response
 
-        raw_image = _generate_image_from_bedrock(card_request)
-        card_image = _overlay_text(raw_image, card_request)
-        object_key = _put_image_to_s3(card_image, card_request)
 
-        s3_url = f"https://{OUTPUT_BUCKET}.s3.amazonaws.com/{object_key}"
-        image_url = _image_url(object_key, s3_url)
-        response_payload = {
-            "imageUrl": image_url,
-            "requestId": request_id,
-            "s3Url": s3_url,
-            "objectKey": object_key,
-            "codeVersion": CODE_VERSION,
-            "sunsetJst": sunset.strftime("%Y-%m-%d %H:%M %Z"),
-        }
-        if CLOUDFRONT_DOMAIN:
-            response_payload["cloudFrontUrl"] = f"https://{CLOUDFRONT_DOMAIN.rstrip('/')}/{object_key}"
+def _handle_card_post(
+    event: Dict[str, Any],
+    request_id: str,
+    trace: telemetry.Trace,
+    deadline: resilience.Deadline,
+) -> Dict[str, Any]:
+    try:
+        with telemetry.span("parse"):
+            card_request = _parse_payload(event)
+        # Cards rendered ahead of time cost no Bedrock call, so they skip admission control.
+        pregenerated = None if _wants_async(event) else _pregenerated_card(card_request)
+        if pregenerated is not None:
+            trace.operation = "pregen"
+            _log_info("request.pregenerated", request_id, objectKey=pregenerated["objectKey"])
+            return _cors_response(200, request_id, {**pregenerated, "requestId": request_id})
+        client = admission.client_key(event)
+        if admission_control is not None:
+            with telemetry.span("admission"):
+                admission_control.charge(client, card_request.variants)
+        if _wants_async(event):
+            if job_queue is not None:
+                trace.operation = "submit"
+                return _submit_job(card_request, request_id)
+            _log_warning("job.async_unavailable", request_id)
 
+        _log_info("request.received", request_id, payload=card_request.summary())
+        with _render_slot(client, card_request.variants):
+            response_payload = _render_card(card_request, request_id, deadline=deadline)
         _log_info(
             "request.completed",
             request_id,
             bucket=OUTPUT_BUCKET,
-            objectKey=object_key,
+            objectKey=response_payload["objectKey"],
         )
         return _cors_response(200, request_id, response_payload)
     except ValidationError as exc:
         _log_warning("request.validation_failed", request_id, error=str(exc))
         return _error_response(400, "ValidationError", str(exc), request_id)
+    except admission.Rejected as exc:
+        _log_warning("request.rejected", request_id, reason=exc.reason, retryAfter=round(exc.retry_after, 1))
+        return _error_response(
+            429,
+            "TooManyRequests",
+            "Too many card requests, please retry later",
+            request_id,
+            headers=_retry_after_headers(exc.retry_after),
+        )
+    except resilience.BedrockUnavailable as exc:
+        _log_warning("request.bedrock_unavailable", request_id, error=str(exc), retryAfter=exc.retry_after)
+        return _error_response(
+            503,
+            "ServiceUnavailable",
+            "Image generation is busy, please retry shortly",
+            request_id,
+            headers=_retry_after_headers(exc.retry_after),
+        )
     except Exception as exc:  # pylint: disable=broad-except
         _log_exception("request.failed", request_id, exc)
         return _error_response(500, "InternalError", "Image generation failed", request_id)
 
 
+def worker_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """SQS consumer for async jobs; failed messages are returned for redelivery until JOB_MAX_ATTEMPTS."""
+    failures = []
+    for message_id, receipt_handle, message, receive_count in jobs.sqs_messages(event):
+        deadline = resilience.Deadline.for_invocation(context, BEDROCK_JOB_DEADLINE_SECONDS, RENDER_RESERVE_SECONDS)
+        if not _run_job(message["jobId"], receive_count, deadline):
+            _schedule_retry(message["jobId"], receipt_handle, receive_count)
+            failures.append({"itemIdentifier": message_id})
+    return {"batchItemFailures": failures}
+
+
+def _schedule_retry(job_id: str, receipt_handle: str, receive_count: int) -> None:
+    """Shorten the failed message's visibility timeout so the retry is not held back for the full 12 minutes."""
+    if job_queue is None:
+        return
+    delay = jobs.retry_delay(receive_count)
+    try:
+        job_queue.retry_later(receipt_handle, delay)
+    except Exception as exc:  # pylint: disable=broad-except
+        # The message still comes back, just after the queue's full visibility timeout.
+        _log_exception("job.retry_schedule_failed", job_id, exc)
+        return
+    _log_info("job.retry_scheduled", job_id, attempt=receive_count, delaySeconds=delay)
+
+
+def _render_card(
+    card_request: CardRequest,
+    request_id: str,
+    on_stage: Optional[Callable[[str], None]] = None,
+    deadline: Optional[resilience.Deadline] = None,
+) -> Dict[str, Any]:
+    """Bedrock → overlay → S3 for one card; shared by the synchronous path and the job worker."""
+    report = on_stage or (lambda _stage: None)
+    target_date = datetime.now(JST).date()
+    sunset = compute_sunset_jst(target_date)
+    card_request.sunset_time = sunset.strftime("%H:%M")
+
+    report("generating")
+    raw_images = _generate_images_from_bedrock(card_request, deadline)
+    report("rendering")
+    timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    if len(raw_images) == 1:
+        variants = [_finish_variant(raw_images[0], card_request, timestamp, None, report)]
+    else:
+        # Overlay, JPEG encode (GIL released) and S3 put (I/O) overlap across variants.
+        futures = [
+            _VARIANT_EXECUTOR.submit(
+                telemetry.bind(_finish_variant), raw_image, card_request, timestamp, index + 1, None
+            )
+            for index, raw_image in enumerate(raw_images)
+        ]
+        variants = [future.result() for future in futures]
+
+    response_payload = {
+        **{key: value for key, value in variants[0].items() if key != "index"},
+        "requestId": request_id,
+        "codeVersion": CODE_VERSION,
+        "sunsetJst": sunset.strftime("%Y-%m-%d %H:%M %Z"),
+    }
+    if len(variants) > 1:
+        response_payload["variants"] = variants
+    return response_payload
+
+
+def _finish_variant(
+    raw_image: bytes,
+    card_request: CardRequest,
+    timestamp: str,
+    index: Optional[int],
+    report: Optional[Callable[[str], None]],
+) -> Dict[str, Any]:
+    with telemetry.span("overlay"):
+        frame = _compose_card(raw_image, card_request)
+    with telemetry.span("encode"):
+        encoded = renditions.encode_all(frame)
+    if report is not None:
+        report("uploading")
+    uploads = list(
+        _UPLOAD_EXECUTOR.map(
+            telemetry.bind(lambda item: _put_image_to_s3(item[2], card_request, timestamp, index, item[0])),
+            encoded,
+        )
+    )
+
+    entries = []
+    for (rendition, (width, height), body), object_key in zip(encoded, uploads):
+        s3_url = f"https://{OUTPUT_BUCKET}.s3.amazonaws.com/{object_key}"
+        entries.append(
+            {
+                "name": rendition.name,
+                "contentType": rendition.content_type,
+                "width": width,
+                "height": height,
+                "bytes": len(body),
+                "imageUrl": _image_url(object_key, s3_url),
+                "s3Url": s3_url,
+                "objectKey": object_key,
+            }
+        )
+
+    full = entries[0]
+    variant = {
+        "index": index or 1,
+        "imageUrl": full["imageUrl"],
+        "s3Url": full["s3Url"],
+        "objectKey": full["objectKey"],
+        "renditions": {entry["name"]: entry for entry in entries},
+        "srcset": renditions.srcset(entries),
+    }
+    if CLOUDFRONT_DOMAIN:
+        variant["cloudFrontUrl"] = f"https://{CLOUDFRONT_DOMAIN.rstrip('/')}/{full['objectKey']}"
+    return variant
+
+
+def _pregenerated_card(card_request: CardRequest) -> Optional[Dict[str, Any]]:
+    """Today's card for exactly this request, if pregen.py already rendered it."""
+    if card_index is None or card_request.date != datetime.now(JST).date().isoformat():
+        return None
+    with telemetry.span("pregen"):
+        return card_index.lookup(card_request.date, card_key(card_request, MODEL_ID))
+
+
+def _render_slot(
+    client: Optional[str], cost: float, wait_seconds: float = 0.0, limit: Optional[int] = None
+) -> ContextManager[None]:
+    if admission_control is None:
+        return nullcontext()
+    return admission_control.render_slot(client, cost, wait_seconds, limit)
+
+
+def _wants_async(event: Dict[str, Any]) -> bool:
+    query = event.get("queryStringParameters") or {}
+    headers = {key.lower(): value for key, value in (event.get("headers") or {}).items()}
+    return query.get("mode") == "async" or "respond-async" in (headers.get("prefer") or "")
+
+
+def _submit_job(card_request: CardRequest, request_id: str) -> Dict[str, Any]:
+    job_id = jobs.new_job_id()
+    job_store.create(jobs.new_record(job_id, asdict(card_request), card_request.summary()))
+    try:
+        job_queue.send({"jobId": job_id})
+    except Exception:
+        job_store.update(job_id, status=jobs.FAILED, error="Job could not be queued")
+        raise
+    _log_info("job.submitted", request_id, jobId=job_id, payload=card_request.summary())
+    return _cors_response(
+        202,
+        request_id,
+        {"jobId": job_id, "status": jobs.QUEUED, "statusUrl": f"/v1/generate-card/jobs/{job_id}"},
+    )
+
+
+def _job_status_response(event: Dict[str, Any], request_id: str) -> Dict[str, Any]:
+    params = (event.get("pathParameters") or {}) | (event.get("queryStringParameters") or {})
+    job_id = str(params.get("jobId") or "").strip()
+    valid = job_store is not None and re.fullmatch(r"[0-9a-f]{32}", job_id)
+    record = job_store.get(job_id) if valid else None
+    if record is None:
+        return _error_response(404, "NotFound", "Unknown job", request_id)
+    return _cors_response(200, request_id, jobs.public_view(record))
+
+
+def _run_job(job_id: str, receive_count: int, deadline: Optional[resilience.Deadline] = None) -> bool:
+    """Process one job; False asks SQS to redeliver it."""
+    record = job_store.get(job_id)
+    if record is None:
+        _log_warning("job.missing", job_id)
+        return True
+    if record.get("status") in jobs.TERMINAL:
+        return True
+
+    card_request = CardRequest(**record["card"])
+    job_store.update(job_id, status=jobs.RUNNING, stage=None, attempts=receive_count)
+    _log_info("job.started", job_id, attempt=receive_count, payload=card_request.summary())
+    trace = telemetry.start(SERVICE_NAME, job_id, operation="job")
+    try:
+        # Jobs were charged to the client at submit; here they only wait their turn for a render slot.
+        with _render_slot(None, 0, admission.JOB_SLOT_WAIT_SECONDS):
+            result = _render_card(
+                card_request,
+                job_id,
+                on_stage=lambda stage: job_store.update(job_id, stage=stage),
+                deadline=deadline,
+            )
+    except Exception as exc:  # pylint: disable=broad-except
+        trace.emit(succeeded=False, attempt=receive_count)
+        _log_exception("job.failed", job_id, exc)
+        if receive_count < jobs.JOB_MAX_ATTEMPTS:
+            job_store.update(job_id, status=jobs.RETRYING, error=exc.__class__.__name__)
+            return False
+        job_store.update(job_id, status=jobs.FAILED, error="Image generation failed")
+        return True
+
+    trace.emit(succeeded=True, attempt=receive_count)
+    job_store.update(job_id, status=jobs.SUCCEEDED, stage=None, error=None, result=result)
+    _log_info("job.completed", job_id, objectKey=result["objectKey"])
+    return True
+
+
 def _parse_payload(event: Dict[str, Any]) -> CardRequest:
     body = event.get("body")
     if event.get("isBase64Encoded"):
@@ -152,9 +433,15 @@ def _parse_payload(event: Dict[str, Any]) -> CardRequest:
     score = str(payload.get("score") or "80").strip()
     sunset_time = str(payload.get("sunsetTime") or payload.get("time") or "18:45").strip()
     prompt = payload.get("prompt")
+    try:
+        variants = int(payload.get("variants") or 1)
+    except (TypeError, ValueError) as exc:
+        raise ValidationError("variants must be an integer") from exc
 
     if not location:
         raise ValidationError("location is required")
+    if not 1 <= variants <= MAX_VARIANTS:
+        raise ValidationError(f"variants must be between 1 and {MAX_VARIANTS}")
 
     return CardRequest(
         location=location,
@@ -165,10 +452,11 @@ def _parse_payload(event: Dict[str, Any]) -> CardRequest:
         score=score,
         sunset_time=sunset_time,
         prompt=prompt,
+        variants=variants,
     )
 
 
-def _generate_image_from_bedrock(card: CardRequest) -> bytes:
+def _build_titan_payload(card: CardRequest) -> Dict[str, Any]:
     base_prompt = (
         "award-winning landscape photography, cinematic sunset over calm water, "
         "rich gradients, volumetric golden light, crisp focus, no watermark. "
@@ -179,129 +467,246 @@ def _generate_image_from_bedrock(card: CardRequest) -> bytes:
     if card.prompt:
         base_prompt = f"{base_prompt} {card.prompt}"
 
-    titan_payload = {
+    return {
         "taskType": "TEXT_IMAGE",
         "textToImageParams": {"text": base_prompt},
         "imageGenerationConfig": {
-            "numberOfImages": 1,
+            "numberOfImages": card.variants,
             "height": 1024,
             "width": 1024,
             "cfgScale": 8,
             "quality": "standard",
         },
     }
-    _log_info("bedrock.invoke", str(uuid.uuid4()), modelId=MODEL_ID)
 
+
+def _generate_image_from_bedrock(card: CardRequest) -> bytes:
+    return _generate_images_from_bedrock(card)[0]
+
+
+def _generate_images_from_bedrock(card: CardRequest, deadline: Optional[resilience.Deadline] = None) -> List[bytes]:
+    titan_payload = _build_titan_payload(card)
+    if image_cache is None:
+        return _invoke_bedrock(titan_payload, deadline)
+    key = cache_key(titan_payload, MODEL_ID)
+    deadline = deadline or resilience.Deadline(BEDROCK_DEADLINE_SECONDS)
+    # Waiting on another container's lease must leave time for our own call if it never delivers.
+    wait_seconds = lease_wait_seconds(deadline.remaining())
+    if card.variants == 1:
+        # Single images stay stored as raw bytes, matching entries written before variants existed.
+        return [image_cache.get_or_generate(key, lambda: _invoke_bedrock(titan_payload, deadline)[0], wait_seconds)]
+    return unpack_images(
+        image_cache.get_or_generate(key, lambda: pack_images(_invoke_bedrock(titan_payload, deadline)), wait_seconds)
+    )
+
+
+def _invoke_bedrock(titan_payload: Dict[str, Any], deadline: Optional[resilience.Deadline] = None) -> List[bytes]:
+    invocation_id = str(uuid.uuid4())
+    _log_info("bedrock.invoke", invocation_id, modelId=MODEL_ID)
+
+    attempts: List[str] = []
     try:
-        response = bedrock.invoke_model(
-            modelId=MODEL_ID,
-            contentType="application/json",
-            accept="application/json",
-            body=json.dumps(titan_payload).encode("utf-8"),
-        )
-        payload = response["body"].read()
+        with telemetry.span("invoke"):
+            payload = bedrock_invoker.invoke(
+                json.dumps(titan_payload).encode("utf-8"),
+                deadline or resilience.Deadline(BEDROCK_DEADLINE_SECONDS),
+                attempts,
+            )
     except (BotoCoreError, ClientError) as exc:
         raise RuntimeError(f"Bedrock invoke failed: {exc}") from exc
+    finally:
+        if len(attempts) > 1:
+            _log_warning("bedrock.retried", invocation_id, attempts=attempts)
 
-    try:
-        parsed = json.loads(payload.decode("utf-8"))
-    except Exception:
-        try:
-            return base64.b64decode(payload)
-        except Exception as decode_error:  # pylint: disable=broad-except
-            raise RuntimeError(f"Bedrock response decode failed: {decode_error}") from decode_error
+    with telemetry.span("decode"):
+        return _decode_images(payload)
 
-    image_b64 = _extract_image_base64(parsed)
-    if not image_b64:
-        raise RuntimeError("No image data returned from Bedrock")
 
-    if isinstance(image_b64, str) and image_b64.startswith("data:image"):
-        image_b64 = image_b64.split(",", 1)[-1]
+def _decode_images(payload: bytes) -> List[bytes]:
+    # Titan's body is one large base64 string per image: decode straight from views of the raw
+    # response instead of materializing it as a Python str through json.loads.
+    encoded_images: List[Any] = _scan_images_base64(payload) or []
+    if not encoded_images:
+        try:
+            parsed = json.loads(payload)
+        except Exception:
+            try:
+                return [base64.b64decode(payload)]
+            except Exception as decode_error:  # pylint: disable=broad-except
+                raise RuntimeError(f"Bedrock response decode failed: {decode_error}") from decode_error
+        encoded_images = _extract_images_base64(parsed)
+    if not encoded_images:
+        raise RuntimeError("No image data returned from Bedrock")
 
-    try:
-        return base64.b64decode(image_b64)
-    except Exception as exc:  # pylint: disable=broad-except
-        raise RuntimeError(f"Unable to decode image: {exc}") from exc
+    images = []
+    for image_b64 in encoded_images:
+        if isinstance(image_b64, str) and image_b64.startswith("data:image"):
+            image_b64 = image_b64.split(",", 1)[-1]
+        try:
+            images.append(binascii.a2b_base64(image_b64))
+        except Exception as exc:  # pylint: disable=broad-except
+            raise RuntimeError(f"Unable to decode image: {exc}") from exc
+    return images
+
+
+def _scan_images_base64(raw: bytes) -> Optional[List[memoryview]]:
+    """Zero-copy views of the strings in the first ``"images": [...]`` array of a JSON body.
+
+    Returns None for anything but a plain array of unescaped strings, so callers fall back to json.
+    """
+    match = _IMAGES_FIELD.search(raw)
+    if match is None:
+        return None
+    view = memoryview(raw)
+    images = []
+    position = match.end()
+    while True:
+        while position < len(raw) and raw[position] in _JSON_WHITESPACE:
+            position += 1
+        if raw[position:position + 1] == b"]" and not images:
+            return None
+        if raw[position:position + 1] != b'"':
+            return None
+        end = raw.find(b'"', position + 1)
+        if end == -1 or raw.find(b"\\", position + 1, end) != -1:
+            return None
+        start = position + 1
+        comma = raw.find(b",", start, end) if raw.startswith(b"data:", start) else -1
+        if comma != -1:
+            start = comma + 1
+        images.append(view[start:end])
+
+        position = end + 1
+        while position < len(raw) and raw[position] in _JSON_WHITESPACE:
+            position += 1
+        token = raw[position:position + 1]
+        if token == b"]":
+            return images
+        if token != b",":
+            return None
+        position += 1
 
 
 def _extract_image_base64(payload: Dict[str, Any]) -> Optional[str]:
+    images = _extract_images_base64(payload)
+    return images[0] if images else None
+
+
+def _extract_images_base64(payload: Dict[str, Any]) -> List[str]:
     images = payload.get("images")
     if isinstance(images, list) and images:
-        first = images[0]
-        if isinstance(first, str):
-            return first
-        if isinstance(first, dict):
-            return first.get("b64") or first.get("image")
+        encoded = []
+        for item in images:
+            if isinstance(item, dict):
+                item = item.get("b64") or item.get("image")
+            if isinstance(item, str) and item:
+                encoded.append(item)
+        return encoded
     output = payload.get("output")
     if isinstance(output, dict):
         nested = output.get("images")
         if isinstance(nested, list) and nested:
-            return nested[0]
-    return payload.get("image")
+            return [item for item in nested if isinstance(item, str) and item]
+    image = payload.get("image")
+    return [image] if image else []
+
+
+@lru_cache(maxsize=8)
+def _gradient_band(width: int, height: int) -> "Image.Image":
+    """Bottom 40% overlay, built in one pass; identical to drawing one line per row."""
+    from PIL import Image  # pylint: disable=import-outside-toplevel
+
+    gradient_height = int(height * 0.4)
+    alpha = bytes(
+        int(220 * (distance / gradient_height)) if distance < gradient_height else 0
+        for distance in range(gradient_height, 0, -1)
+    )
+    band = Image.new("RGBA", (width, gradient_height), GRADIENT_COLOR + (0,))
+    band.putalpha(Image.frombytes("L", (1, gradient_height), alpha).resize((width, gradient_height)))
+    return band
 
 
 def _overlay_text(image_bytes: bytes, card: CardRequest) -> bytes:
-    with Image.open(BytesIO(image_bytes)).convert("RGBA") as base:
-        width, height = base.size
-        overlay = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(overlay)
-
-        gradient_height = int(height * 0.4)
-        for y in range(gradient_height):
-            alpha = int(220 * (y / gradient_height))
-            draw.line([(0, height - y), (width, height - y)], fill=(13, 16, 35, alpha))
-
-        size_multiplier = 1.2 if card.text_size == "lg" else 1.0
-        font_large = _load_font(int(width * 0.08 * size_multiplier))
-        font_medium = _load_font(int(width * 0.045 * size_multiplier))
-        font_small = _load_font(int(width * 0.035 * size_multiplier))
-
-        padding = int(width * 0.06)
-        draw.text(
-            (padding, height - gradient_height + padding),
-            f"Sunset Score {card.score}",
-            font=font_large,
-            fill=(255, 255, 255, 240),
-        )
-        draw.text(
-            (padding, height - gradient_height + padding + font_large.size + 12),
-            f"{card.date} | 日の入り {card.sunset_time}",
-            font=font_medium,
-            fill=(255, 223, 186, 235),
-        )
-        draw.text(
-            (padding, height - padding * 0.4),
-            f"{card.location} — {card.conditions}",
-            font=font_small,
-            fill=(255, 200, 137, 235),
-        )
-        draw.text(
-            (width - 40, height - 40),
-            f"Sunset {card.sunset_time} JST",
-            font=font_small,
-            anchor="rd",
-            fill=(255, 255, 255, 230),
-        )
+    return renditions.encode(_compose_card(image_bytes, card), renditions.FULL_JPEG)
+
+
+def _compose_card(image_bytes: bytes, card: CardRequest) -> "Image.Image":
+    from PIL import Image  # pylint: disable=import-outside-toplevel
+
+    # BytesIO over bytes shares the buffer, and an RGB decode is used as the frame without a converted copy.
+    source = Image.open(BytesIO(image_bytes))
+    source.load()
+    base = source if source.mode == "RGB" else source.convert("RGB")
+    width, height = base.size
+    gradient_height = int(height * 0.4)
+
+    # Only the gradient band is composited; coordinates below are relative to its top edge.
+    overlay = _gradient_band(width, height).copy()
+
+    size_multiplier = 1.2 if card.text_size == "lg" else 1.0
+    font_large = _load_font(int(width * 0.08 * size_multiplier))
+    font_medium = _load_font(int(width * 0.045 * size_multiplier))
+    font_small = _load_font(int(width * 0.035 * size_multiplier))
+
+    padding = int(width * 0.06)
+    text_layers.draw_text(
+        overlay,
+        (padding, padding),
+        f"Sunset Score {card.score}",
+        font=font_large,
+        fill=(255, 255, 255, 240),
+    )
+    text_layers.draw_text(
+        overlay,
+        (padding, padding + font_large.size + 12),
+        f"{card.date} | 日の入り {card.sunset_time}",
+        font=font_medium,
+        fill=(255, 223, 186, 235),
+    )
+    text_layers.draw_text(
+        overlay,
+        (padding, gradient_height - padding * 0.4),
+        f"{card.location} — {card.conditions}",
+        font=font_small,
+        fill=(255, 200, 137, 235),
+    )
+    text_layers.draw_text(
+        overlay,
+        (width - 40, gradient_height - 40),
+        f"Sunset {card.sunset_time} JST",
+        font=font_small,
+        anchor="rd",
+        fill=(255, 255, 255, 230),
+    )
 
-        composed = Image.alpha_composite(base, overlay)
-        buffer = BytesIO()
-        composed.convert("RGB").save(buffer, format="JPEG", quality=92, optimize=True)
-        buffer.seek(0)
-        return buffer.read()
+    box = (0, height - gradient_height, width, height)
+    band = Image.alpha_composite(base.crop(box).convert("RGBA"), overlay)
+    base.paste(band.convert("RGB"), box)
+    return base
 
 
-def _put_image_to_s3(image_bytes: bytes, card: CardRequest) -> str:
-    timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+def _put_image_to_s3(
+    image_bytes: bytes,
+    card: CardRequest,
+    timestamp: Optional[str] = None,
+    index: Optional[int] = None,
+    rendition: renditions.Rendition = renditions.FULL_JPEG,
+) -> str:
+    timestamp = timestamp or datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
     location_slug = re.sub(r"[^a-z0-9]+", "-", card.location.lower()).strip("-") or "location"
-    object_key = f"generated/{card.date}/{location_slug}-{timestamp}.jpg"
-
-    s3.put_object(
-        Bucket=OUTPUT_BUCKET,
-        Key=object_key,
-        Body=image_bytes,
-        ContentType="image/jpeg",
-        CacheControl="public, max-age=31536000",
-    )
+    suffix = f"-{index}" if index else ""
+    if rendition.width:
+        suffix = f"{suffix}-{rendition.width}w"
+    object_key = f"generated/{card.date}/{location_slug}-{timestamp}{suffix}.{rendition.extension}"
+
+    with telemetry.span("upload"):
+        s3.put_object(
+            Bucket=OUTPUT_BUCKET,
+            Key=object_key,
+            Body=image_bytes,
+            ContentType=rendition.content_type,
+            CacheControl="public, max-age=31536000",
+        )
     return object_key
 
 
@@ -313,19 +718,8 @@ def _image_url(object_key: str, fallback: str) -> str:
     return fallback
 
 
-def _load_font(size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
-    font_candidates = [
-        "/opt/fonts/NotoSansCJK-Regular.ttc",
-        "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-    ]
-    for font_path in font_candidates:
-        if os.path.exists(font_path):
-            try:
-                return ImageFont.truetype(font_path, size)
-            except OSError:
-                continue
-    return ImageFont.load_default()
+def _load_font(size: int) -> "fonts.Font":
+    return fonts.load_font(size)
 
 
 def _options_response() -> Dict[str, Any]:
@@ -336,24 +730,30 @@ def _options_response() -> Dict[str, Any]:
     }
 
 
+def _retry_after_headers(retry_after: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, round(retry_after))), "Access-Control-Expose-Headers": "Retry-After"}
+
+
 def _error_response(
     status_code: int,
     error_type: str,
     message: str,
     request_id: str,
+    headers: Optional[Dict[str, str]] = None,
 ) -> Dict[str, Any]:
     payload = {
         "errorType": error_type,
         "message": message,
         "requestId": request_id,
     }
-    return _cors_response(status_code, request_id, payload)
+    return _cors_response(status_code, request_id, payload, headers)
 
 
 def _cors_response(
     status_code: int,
     request_id: str,
     body: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
 ) -> Dict[str, Any]:
     response_body = body or {}
     if status_code < 400:
@@ -361,7 +761,7 @@ def _cors_response(
 
     return {
         "statusCode": status_code,
-        "headers": CORS_HEADERS | {"Content-Type": "application/json"},
+        "headers": CORS_HEADERS | {"Content-Type": "application/json"} | (headers or {}),
         "body": json.dumps(response_body, ensure_ascii=False),
     }
 
@@ -386,3 +786,24 @@ def _log_exception(event: str, request_id: str, exc: Exception) -> None:
             ensure_ascii=False,
         )
     )
+
+
+def prewarm() -> None:
+    """Do the first request's one-off work ahead of time: imports, fonts, masks, codecs and TLS to AWS."""
+    from PIL import Image  # pylint: disable=import-outside-toplevel
+
+    compute_sunset_jst(datetime.now(JST).date())
+    blank = BytesIO()
+    Image.new("RGB", (1024, 1024), GRADIENT_COLOR).save(blank, format="PNG")
+    for text_size in ("md", "lg"):
+        card = CardRequest(
+            location="prewarm", date="", style="gradient", text_size=text_size,
+            score="", sunset_time="", conditions="", prompt=None,
+        )
+        renditions.encode_all(_compose_card(blank.getvalue(), card))
+    if OUTPUT_BUCKET:
+        coldstart.open_connection(s3, "head_bucket", Bucket=OUTPUT_BUCKET)
+    coldstart.open_connection(bedrock, "list_async_invokes", maxResults=1)
+
+
+coldstart.register_prewarm(prewarm)
@@ -0,0 +1,236 @@
+"""Scheduled pre-generation of today's popular cards before the pre-sunset rush.
+
+An EventBridge rule invokes ``handler`` every few minutes through the afternoon. A run renders only
+inside the window from PREGEN_START_MINUTES to PREGEN_STOP_MINUTES before today's sunset
+(compute_sunset_jst), and only when the sunset-score model rates the evening at PREGEN_MIN_SCORE or
+more. It asks sunset-score for the same score and weather the web page puts on a card. Then it
+renders the PREGEN_MAX_CARDS most popular location / style / text-size combinations through the
+live pipeline (Bedrock, overlay, renditions, S3) and registers each in the card index. Live requests
+for the same card are then answered from the index. Combinations already indexed are skipped, so
+later runs only render cards whose score or weather has changed since.
+
+``{"dryRun": true}`` (or PREGEN_DRY_RUN=1) renders nothing. It reports the plan and an estimate of
+the Bedrock calls taken out of the peak hour, from each combination's share of PREGEN_PEAK_REQUESTS.
+"""
+import json
+import logging
+import math
+import os
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+import admission
+import coldstart
+import lambda_function
+import resilience
+import telemetry
+from card_index import card_key
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+PREGEN_START_MINUTES = float(os.getenv("PREGEN_START_MINUTES", "120"))
+PREGEN_STOP_MINUTES = float(os.getenv("PREGEN_STOP_MINUTES", "45"))
+PREGEN_MIN_SCORE = float(os.getenv("PREGEN_MIN_SCORE", "0"))
+PREGEN_MAX_CARDS = int(os.getenv("PREGEN_MAX_CARDS", "8"))
+# Card requests expected in the hour before sunset; only used for the dry-run estimate.
+PREGEN_PEAK_REQUESTS = float(os.getenv("PREGEN_PEAK_REQUESTS", "100"))
+PREGEN_DRY_RUN = os.getenv("PREGEN_DRY_RUN", "0") == "1"
+# JSON list of {"location", "style", "textSize", "share", optional "lat"/"lon"}, inline or in a file.
+PREGEN_POPULAR = (os.getenv("PREGEN_POPULAR") or "").strip()
+PREGEN_POPULAR_PATH = (os.getenv("PREGEN_POPULAR_PATH") or "").strip()
+# Where today's score comes from: the sunset-score function (preferred) or its HTTP endpoint.
+SUNSET_SCORE_FUNCTION = (os.getenv("SUNSET_SCORE_FUNCTION") or "").strip()
+SUNSET_SCORE_URL = (os.getenv("SUNSET_SCORE_URL") or "").strip()
+SCORE_TIMEOUT_SECONDS = float(os.getenv("PREGEN_SCORE_TIMEOUT_SECONDS", "10"))
+# Render slots (of BEDROCK_MAX_CONCURRENCY) a run leaves free for live requests; it only renders while they are.
+PREGEN_SPARE_SLOTS = int(os.getenv("PREGEN_SPARE_SLOTS", "2"))
+
+# The web page's only spot, with its share of card requests per style and text size.
+DEFAULT_LOCATION = "嫁ヶ島ビュー（35.4690, 133.0505）"
+DEFAULT_POPULAR = [
+    {"location": DEFAULT_LOCATION, "style": "gradient", "textSize": "md", "share": 0.55},
+    {"location": DEFAULT_LOCATION, "style": "simple", "textSize": "md", "share": 0.2},
+    {"location": DEFAULT_LOCATION, "style": "gradient", "textSize": "lg", "share": 0.15},
+    {"location": DEFAULT_LOCATION, "style": "simple", "textSize": "lg", "share": 0.1},
+]
+# What the web page sends as conditions when sunset-score has no weather description.
+FALLBACK_CONDITIONS = "データ取得中"
+
+lambda_client = coldstart.LazyClient("lambda")
+
+
+def load_popular() -> List[Dict[str, Any]]:
+    """The configured combinations, most requested first."""
+    if PREGEN_POPULAR:
+        popular = json.loads(PREGEN_POPULAR)
+    elif PREGEN_POPULAR_PATH:
+        with open(PREGEN_POPULAR_PATH, encoding="utf-8") as handle:
+            popular = json.load(handle)
+    else:
+        popular = DEFAULT_POPULAR
+    return sorted(popular, key=lambda entry: -float(entry.get("share", 0)))
+
+
+def schedule(now: datetime) -> Dict[str, Any]:
+    """Today's sunset and render window, and whether ``now`` falls inside it."""
+    sunset = lambda_function.compute_sunset_jst(now.date())
+    start = sunset - timedelta(minutes=PREGEN_START_MINUTES)
+    stop = sunset - timedelta(minutes=PREGEN_STOP_MINUTES)
+    return {
+        "date": now.date().isoformat(),
+        "sunset": sunset.strftime("%H:%M"),
+        "windowStart": start.strftime("%H:%M"),
+        "windowStop": stop.strftime("%H:%M"),
+        "due": start <= now <= stop,
+    }
+
+
+def fetch_score(lat: float, lon: float) -> Dict[str, Any]:
+    """The sunset-score payload for ``lat``/``lon``, as the web page receives it."""
+    query = {"lat": str(lat), "lon": str(lon)}
+    if SUNSET_SCORE_FUNCTION:
+        response = lambda_client.invoke(
+            FunctionName=SUNSET_SCORE_FUNCTION,
+            Payload=json.dumps({"httpMethod": "GET", "queryStringParameters": query}).encode("utf-8"),
+        )
+        result = json.loads(response["Payload"].read())
+        if result.get("statusCode") != 200:
+            raise RuntimeError(f"sunset-score answered {result.get('statusCode')}: {result.get('body')}")
+        return json.loads(result["body"])
+    if SUNSET_SCORE_URL:
+        url = f"{SUNSET_SCORE_URL}?{urllib.parse.urlencode(query)}"
+        with urllib.request.urlopen(url, timeout=SCORE_TIMEOUT_SECONDS) as response:
+            return json.loads(response.read())
+    raise RuntimeError("Neither SUNSET_SCORE_FUNCTION nor SUNSET_SCORE_URL is configured")
+
+
+def card_fields(score_payload: Dict[str, Any]) -> Tuple[str, str]:
+    """(score, conditions) exactly as the web page fills them in from a sunset-score response."""
+    # Math.round rounds halves up, unlike Python's round.
+    score = min(100, max(0, math.floor(float(score_payload.get("score") or 0) + 0.5)))
+    conditions = (score_payload.get("metrics") or {}).get("weather") or FALLBACK_CONDITIONS
+    return str(score), conditions
+
+
+def plan(now: datetime, popular: List[Dict[str, Any]], force: bool = False) -> Dict[str, Any]:
+    """The cards this run should have in the index, with those already there marked."""
+    result = schedule(now)
+    if not (result["due"] or force):
+        result["skipped"] = "outside the render window"
+        return result
+
+    scores: Dict[Tuple[float, float], Tuple[str, str]] = {}
+    cards = []
+    for entry in popular[:PREGEN_MAX_CARDS]:
+        point = (
+            float(entry.get("lat", lambda_function.FIXED_LAT)),
+            float(entry.get("lon", lambda_function.FIXED_LON)),
+        )
+        if point not in scores:
+            scores[point] = card_fields(fetch_score(*point))
+        score, conditions = scores[point]
+        card = lambda_function.CardRequest(
+            location=entry["location"],
+            date=result["date"],
+            style=entry.get("style", "gradient"),
+            text_size=entry.get("textSize", "md"),
+            score=score,
+            sunset_time="",
+            conditions=conditions,
+            prompt=None,
+        )
+        key = card_key(card, lambda_function.MODEL_ID)
+        cards.append({"card": card, "share": float(entry.get("share", 0)), "key": key})
+
+    best = max((int(score) for score, _conditions in scores.values()), default=0)
+    if best < PREGEN_MIN_SCORE and not force:
+        result["skipped"] = f"score {best} below PREGEN_MIN_SCORE"
+        return result
+    indexed = lambda_function.card_index.entries(result["date"]) if lambda_function.card_index else {}
+    for card in cards:
+        card["indexed"] = card["key"] in indexed
+    result["cards"] = cards
+    return result
+
+
+def estimate(cards: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Peak-hour Bedrock calls the index takes away, against the calls the run spends now.
+
+    Without the image cache every matching live request invokes Bedrock. With it only the first
+    request for a card does, which happens with probability 1 - exp(-expected requests).
+    """
+    to_render = [card for card in cards if not card["indexed"]]
+    expected = [PREGEN_PEAK_REQUESTS * card["share"] for card in cards]
+    if lambda_function.image_cache is None:
+        avoided = sum(expected)
+    else:
+        avoided = sum(1 - math.exp(-requests) for requests in expected)
+    return {
+        "cards": len(cards),
+        "alreadyIndexed": len(cards) - len(to_render),
+        "bedrockCallsNow": len(to_render),
+        "expectedRequestsServedFromIndex": round(sum(expected), 1),
+        "expectedPeakBedrockCallsSaved": round(avoided, 1),
+    }
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    event = event or {}
+    request_id = getattr(context, "aws_request_id", "pregen")
+    dry_run = bool(event.get("dryRun", PREGEN_DRY_RUN))
+    now = datetime.fromisoformat(event["at"]) if event.get("at") else datetime.now(lambda_function.JST)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=lambda_function.JST)
+
+    result = plan(now, load_popular(), force=bool(event.get("force")))
+    cards = result.pop("cards", None)
+    if cards is None:
+        LOGGER.info(json.dumps({"event": "pregen.skipped", **result}, ensure_ascii=False))
+        return result
+    result["estimate"] = estimate(cards)
+    result["dryRun"] = dry_run
+    result["cards"] = [{**card["card"].summary(), "indexed": card["indexed"]} for card in cards]
+    if dry_run or lambda_function.card_index is None:
+        LOGGER.info(json.dumps({"event": "pregen.plan", **result}, ensure_ascii=False))
+        return result
+
+    slot_limit = admission.BEDROCK_MAX_CONCURRENCY - PREGEN_SPARE_SLOTS
+    if lambda_function.admission_control is not None and slot_limit < 1:
+        # Clamping to one slot would let a run take a slot that PREGEN_SPARE_SLOTS keeps for live requests.
+        result["skipped"] = (
+            f"BEDROCK_MAX_CONCURRENCY {admission.BEDROCK_MAX_CONCURRENCY} leaves no slot "
+            f"beyond PREGEN_SPARE_SLOTS {PREGEN_SPARE_SLOTS}"
+        )
+        LOGGER.info(json.dumps({"event": "pregen.skipped", **result}, ensure_ascii=False))
+        return result
+    rendered = failed = 0
+    for card in cards:
+        if card["indexed"]:
+            continue
+        trace = telemetry.start(lambda_function.SERVICE_NAME, request_id, operation="pregen")
+        deadline = resilience.Deadline.for_invocation(
+            context, lambda_function.BEDROCK_JOB_DEADLINE_SECONDS, lambda_function.RENDER_RESERVE_SECONDS
+        )
+        try:
+            # Low priority: takes a slot only while PREGEN_SPARE_SLOTS are free. Live requests can still get
+            # 429 while it holds its one slot if they need every slot, but a run never fills the pool.
+            with lambda_function._render_slot(None, 0, admission.JOB_SLOT_WAIT_SECONDS, slot_limit):
+                payload = lambda_function._render_card(card["card"], request_id, deadline=deadline)
+            payload.pop("requestId", None)
+            lambda_function.card_index.register(result["date"], card["key"], {**payload, "pregenerated": True})
+            rendered += 1
+            trace.emit(succeeded=True)
+        except Exception as exc:  # pylint: disable=broad-except
+            failed += 1
+            trace.emit(succeeded=False)
+            LOGGER.warning(
+                json.dumps(
+                    {"event": "pregen.failed", "card": card["card"].summary(), "error": str(exc)}, ensure_ascii=False
+                )
+            )
+    result.update(rendered=rendered, failed=failed)
+    LOGGER.info(json.dumps({"event": "pregen.completed", **result}, ensure_ascii=False))
+    return result
@@ -0,0 +1,107 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from io import BytesIO
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+# Pillow is imported where frames are encoded, so importing the handler does not load it.
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+@dataclass(frozen=True)
+class Rendition:
+    name: str
+    format: str
+    content_type: str
+    extension: str
+    width: Optional[int]  # None keeps the composited frame size
+    quality: int
+    options: Tuple[Tuple[str, Any], ...] = ()
+
+
+THUMB_WIDTH = int(os.getenv("RENDITION_THUMB_WIDTH", "320"))
+MEDIUM_WIDTH = int(os.getenv("RENDITION_MEDIUM_WIDTH", "640"))
+
+FULL_JPEG = Rendition("full", "JPEG", "image/jpeg", "jpg", None, 92, (("optimize", True),))
+RENDITIONS = (
+    FULL_JPEG,
+    Rendition(
+        "thumb", "JPEG", "image/jpeg", "jpg", THUMB_WIDTH,
+        int(os.getenv("RENDITION_THUMB_QUALITY", "80")), (("optimize", True), ("progressive", True)),
+    ),
+    Rendition(
+        "webp", "WEBP", "image/webp", "webp", MEDIUM_WIDTH,
+        int(os.getenv("RENDITION_WEBP_QUALITY", "80")), (("method", 4),),
+    ),
+    Rendition(
+        "avif", "AVIF", "image/avif", "avif", MEDIUM_WIDTH,
+        int(os.getenv("RENDITION_AVIF_QUALITY", "55")), (("speed", 8),),
+    ),
+)
+
+
+@lru_cache(maxsize=None)
+def supported(image_format: str) -> bool:
+    """Whether this Pillow build can encode the format (AVIF needs Pillow 11.2+ built with libavif)."""
+    from PIL import Image, features  # pylint: disable=import-outside-toplevel
+
+    codec = {"WEBP": "webp", "AVIF": "avif"}.get(image_format)
+    if codec is not None:
+        try:
+            if not features.check(codec):
+                return False
+        except ValueError:
+            return False
+    Image.init()
+    return image_format in Image.SAVE
+
+
+def active_renditions() -> List[Rendition]:
+    enabled = {
+        name.strip()
+        for name in os.getenv("RENDITIONS", ",".join(rendition.name for rendition in RENDITIONS)).split(",")
+    }
+    return [
+        rendition
+        for rendition in RENDITIONS
+        if (rendition is FULL_JPEG or rendition.name in enabled) and supported(rendition.format)
+    ]
+
+
+def encode(frame: "Image.Image", rendition: Rendition) -> bytes:
+    buffer = BytesIO()
+    frame.save(buffer, format=rendition.format, quality=rendition.quality, **dict(rendition.options))
+    return buffer.getvalue()
+
+
+def encode_all(
+    frame: "Image.Image",
+    renditions: Optional[List[Rendition]] = None,
+) -> List[Tuple[Rendition, Tuple[int, int], bytes]]:
+    """Encode every rendition from one composited RGB frame, resizing once per distinct width."""
+    from PIL import Image  # pylint: disable=import-outside-toplevel
+
+    resized: Dict[Optional[int], Image.Image] = {None: frame}
+    outputs = []
+    for rendition in renditions if renditions is not None else active_renditions():
+        width = rendition.width if rendition.width and rendition.width < frame.width else None
+        if width not in resized:
+            height = max(1, round(frame.height * width / frame.width))
+            resized[width] = frame.resize((width, height), Image.LANCZOS, reducing_gap=2.0)
+        image = resized[width]
+        outputs.append((rendition, image.size, encode(image, rendition)))
+    return outputs
+
+
+def srcset(entries: List[Dict[str, Any]]) -> Dict[str, str]:
+    """``srcset`` strings keyed by content type, narrowest candidate first."""
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in entries:
+        grouped.setdefault(entry["contentType"], []).append(entry)
+    return {
+        content_type: ", ".join(
+            f"{entry['imageUrl']} {entry['width']}w" for entry in sorted(items, key=lambda item: item["width"])
+        )
+        for content_type, items in grouped.items()
+    }
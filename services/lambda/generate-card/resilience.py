@@ -0,0 +1,273 @@
+"""Retry, deadline, circuit breaker and hedging around Bedrock ``invoke_model``.
+
+Every attempt runs on a small thread pool so the caller can stop waiting at the deadline even while
+a call is still in flight. Throttles, 5xx and timeouts are retried with full-jitter exponential
+backoff while the deadline leaves room for another attempt; each target (primary, optional hedge)
+has its own breaker, so a model that keeps failing is skipped instead of waited on. Breaker state
+lives in the container, which is enough to stop one warm Lambda from hammering a failing model.
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Any, Callable, List, Optional
+
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, ReadTimeoutError
+
+import coldstart
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("BEDROCK_MAX_ATTEMPTS", "4"))
+RETRY_BASE_SECONDS = float(os.getenv("BEDROCK_RETRY_BASE_SECONDS", "0.5"))
+RETRY_CAP_SECONDS = float(os.getenv("BEDROCK_RETRY_CAP_SECONDS", "4"))
+# An attempt is only started if at least this much of the deadline is left (Titan rarely answers faster).
+MIN_ATTEMPT_SECONDS = float(os.getenv("BEDROCK_MIN_ATTEMPT_SECONDS", "3"))
+BREAKER_FAILURES = int(os.getenv("BEDROCK_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("BEDROCK_BREAKER_COOLDOWN_SECONDS", "30"))
+
+RETRYABLE_CODES = frozenset(
+    {
+        "ThrottlingException",
+        "TooManyRequestsException",
+        "ServiceUnavailableException",
+        "ServiceQuotaExceededException",
+        "InternalServerException",
+        "ModelNotReadyException",
+        "ModelTimeoutException",
+    }
+)
+
+
+class BedrockUnavailable(RuntimeError):
+    """Bedrock could not produce a response in time; ``retry_after`` is a hint in seconds for the client."""
+
+    def __init__(self, message: str, retry_after: float = 5.0) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Deadline:
+    def __init__(self, budget_seconds: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.clock = clock
+        self.expires_at = clock() + budget_seconds
+
+    @classmethod
+    def for_invocation(cls, context: Any, budget_seconds: float, reserve_seconds: float) -> "Deadline":
+        """``budget_seconds``, cut short so ``reserve_seconds`` of the Lambda's remaining time stays for the rest."""
+        remaining_ms = getattr(context, "get_remaining_time_in_millis", None)
+        if remaining_ms is not None:
+            budget_seconds = min(budget_seconds, remaining_ms() / 1000 - reserve_seconds)
+        return cls(max(0.0, budget_seconds))
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self.clock())
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, ClientError):
+        error = exc.response.get("Error", {})
+        status = exc.response.get("ResponseMetadata", {}).get("HTTPStatusCode") or 0
+        return error.get("Code") in RETRYABLE_CODES or status >= 500 or status == 429
+    return isinstance(exc, (ReadTimeoutError, BotoConnectionError, TimeoutError))
+
+
+class CircuitBreaker:
+    """Opens after ``failures`` consecutive retryable failures; after ``cooldown`` one probe is let through."""
+
+    def __init__(
+        self,
+        failures: int = BREAKER_FAILURES,
+        cooldown: float = BREAKER_COOLDOWN_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failures = failures
+        self.cooldown = cooldown
+        self.clock = clock
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if self.clock() - self._opened_at >= self.cooldown else "open"
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.cooldown - (self.clock() - self._opened_at))
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self.clock() - self._opened_at < self.cooldown or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive += 1
+            if self._probing or self._consecutive >= self.failures:
+                self._opened_at = self.clock()
+            self._probing = False
+
+
+class Target:
+    """One place to send the request: a bedrock-runtime client, a model id and that pair's breaker."""
+
+    def __init__(self, name: str, client: Any, model_id: str, breaker: Optional[CircuitBreaker] = None) -> None:
+        self.name = name
+        self.client = client
+        self.model_id = model_id
+        self.breaker = breaker or CircuitBreaker()
+
+    def invoke(self, body: bytes) -> bytes:
+        response = self.client.invoke_model(
+            modelId=self.model_id,
+            contentType="application/json",
+            accept="application/json",
+            body=body,
+        )
+        return response["body"].read()
+
+
+class BedrockInvoker:
+    def __init__(
+        self,
+        primary: Target,
+        hedge: Optional[Target] = None,
+        hedge_after: Optional[float] = None,
+        max_attempts: int = RETRY_MAX_ATTEMPTS,
+        base_delay: float = RETRY_BASE_SECONDS,
+        max_delay: float = RETRY_CAP_SECONDS,
+        min_attempt: float = MIN_ATTEMPT_SECONDS,
+        sleep: Callable[[float], None] = time.sleep,
+        rng: Optional[random.Random] = None,
+        workers: int = 8,
+    ) -> None:
+        self.primary = primary
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.min_attempt = min_attempt
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bedrock")
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, min(cap, base * 2**attempt))."""
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def invoke(self, body: bytes, deadline: Deadline, attempts: Optional[List[str]] = None) -> bytes:
+        """Raw response body, or BedrockUnavailable once retries, breakers or the deadline rule out success.
+
+        ``attempts`` (if given) collects the target name of every call made, hedges included.
+        """
+        attempts = [] if attempts is None else attempts
+        last_error: Optional[BaseException] = None
+        for attempt in range(self.max_attempts):
+            if attempt:
+                delay = self.backoff(attempt)
+                if deadline.remaining() - delay < self.min_attempt:
+                    break
+                self.sleep(delay)
+            elif deadline.remaining() <= 0:
+                break
+            try:
+                return self._attempt(body, deadline, attempts)
+            except BedrockUnavailable:
+                raise
+            except Exception as exc:  # pylint: disable=broad-except
+                if not is_retryable(exc):
+                    raise
+                last_error = exc
+        raise BedrockUnavailable(
+            f"Bedrock unavailable after {len(attempts)} attempt(s): {last_error or 'deadline exhausted'}"
+        )
+
+    def _attempt(self, body: bytes, deadline: Deadline, attempts: List[str]) -> bytes:
+        targets = [target for target in (self.primary, self.hedge) if target is not None]
+        first = next((target for target in targets if target.breaker.allow()), None)
+        if first is None:
+            retry_after = min(target.breaker.retry_after() for target in targets)
+            raise BedrockUnavailable("Bedrock circuit open", retry_after=max(1.0, retry_after))
+
+        pending = {self._submit(first, body, attempts): first}
+        hedged = first is not self.primary or self.hedge is None or self.hedge_after is None
+        error: Optional[BaseException] = None
+        while pending:
+            timeout = deadline.remaining()
+            if not hedged:
+                timeout = min(timeout, self.hedge_after)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if hedged or deadline.remaining() <= 0:
+                    break
+                hedged = True
+                if self.hedge.breaker.allow():
+                    pending[self._submit(self.hedge, body, attempts)] = self.hedge
+                continue
+            for future in done:
+                target = pending.pop(future)
+                try:
+                    payload = future.result()
+                except Exception as exc:  # pylint: disable=broad-except
+                    if is_retryable(exc):
+                        target.breaker.record_failure()
+                    else:
+                        target.breaker.record_success()
+                    error = exc
+                    continue
+                target.breaker.record_success()
+                return payload
+        if pending:
+            # Still running at the deadline: count it against the breaker and let it finish unobserved.
+            for target in pending.values():
+                target.breaker.record_failure()
+            raise TimeoutError(f"Bedrock did not answer within the deadline ({', '.join(attempts)})")
+        raise error  # type: ignore[misc]
+
+    def _submit(self, target: Target, body: bytes, attempts: List[str]) -> "Future[bytes]":
+        attempts.append(target.name)
+        return self._executor.submit(target.invoke, body)
+
+
+def client_config(read_timeout: float) -> Any:
+    """botocore config for clients used through BedrockInvoker: no SDK retries, bounded read timeout."""
+    from botocore.config import Config  # pylint: disable=import-outside-toplevel
+
+    return Config(read_timeout=read_timeout, connect_timeout=3, retries={"max_attempts": 1, "mode": "standard"})
+
+
+def build_invoker(
+    primary: Target,
+    region: str,
+    hedge_region: str,
+    hedge_model_id: str,
+    hedge_after: float,
+    read_timeout: float,
+) -> BedrockInvoker:
+    """Invoker for ``primary``, hedging to another region and/or model when either is configured."""
+    if not hedge_region and not hedge_model_id:
+        return BedrockInvoker(primary)
+
+    client = primary.client
+    if hedge_region and hedge_region != region:
+        client = coldstart.LazyClient("bedrock-runtime", partial(client_config, read_timeout), region_name=hedge_region)
+    hedge = Target("hedge", client, hedge_model_id or primary.model_id)
+    return BedrockInvoker(primary, hedge=hedge, hedge_after=hedge_after)
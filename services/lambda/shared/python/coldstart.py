@@ -0,0 +1,105 @@
+"""Lazy AWS clients and an init-phase pre-warm hook shared by the Python Lambdas.
+
+Clients are built on first use, so code paths that never touch AWS (CORS preflight, tile-served
+scores, job status reads) skip importing boto3 and loading service models. Handlers that want the
+first request to be warm register a hook with ``register_prewarm``; it runs during init only where
+init is not on a request's critical path (provisioned concurrency, SnapStart, or PREWARM_ON_INIT=1).
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+INITIALIZATION_TYPE = os.getenv("AWS_LAMBDA_INITIALIZATION_TYPE", "on-demand")
+PREWARM_ON_INIT = os.getenv("PREWARM_ON_INIT", "0") == "1"
+
+
+class LazyClient:
+    """boto3 client proxy; boto3 is imported and the client created on first attribute access.
+
+    ``config_factory`` builds the botocore ``Config`` at the same point, so callers that need one do
+    not import botocore at module import either.
+    """
+
+    def __init__(
+        self, service_name: str, config_factory: Optional[Callable[[], Any]] = None, **client_kwargs: Any
+    ) -> None:
+        self._service_name = service_name
+        self._config_factory = config_factory
+        self._client_kwargs = client_kwargs
+        self._client: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._client is not None
+
+    def get(self) -> Any:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3  # pylint: disable=import-outside-toplevel
+
+                    kwargs = dict(self._client_kwargs)
+                    if self._config_factory is not None:
+                        kwargs["config"] = self._config_factory()
+                    self._client = boto3.client(self._service_name, **kwargs)
+        return self._client
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+
+def open_connection(client: Any, operation: str, **params: Any) -> None:
+    """One cheap call so a TLS connection sits in the client's pool; any API error (even AccessDenied) is fine."""
+    try:
+        getattr(client, operation)(**params)
+    except Exception as exc:  # pylint: disable=broad-except
+        LOGGER.debug("Pre-warm call %s ended with %s", operation, exc)
+
+
+def run_prewarm(hook: Callable[[], None]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    summary: Dict[str, Any] = {"event": "prewarm", "initializationType": INITIALIZATION_TYPE}
+    try:
+        hook()
+        summary["ok"] = True
+    except Exception as exc:  # pylint: disable=broad-except
+        # Pre-warming is an optimisation; the first request redoes whatever failed here.
+        summary.update(ok=False, error=str(exc))
+    summary["elapsedMs"] = round((time.perf_counter() - started) * 1000, 1)
+    LOGGER.info(json.dumps(summary))
+    return summary
+
+
+def register_prewarm(hook: Callable[[], None]) -> None:
+    """Run ``hook`` at init where that is free: provisioned concurrency, SnapStart, or PREWARM_ON_INIT=1.
+
+    Under SnapStart it runs before the snapshot and again after restore, since pooled sockets do not
+    survive a restore (the second run only reconnects; everything else is already cached).
+    """
+    if INITIALIZATION_TYPE == "snap-start":
+        try:
+            from snapshot_restore_py import (  # pylint: disable=import-outside-toplevel
+                register_after_restore,
+                register_before_snapshot,
+            )
+        except ImportError:
+            run_prewarm(hook)
+            return
+        register_before_snapshot(run_prewarm, hook)
+        register_after_restore(run_prewarm, hook)
+        return
+    if INITIALIZATION_TYPE == "provisioned-concurrency" or PREWARM_ON_INIT:
+        run_prewarm(hook)
+
+
+def is_prewarm_event(event: Any) -> bool:
+    """Scheduled warmers invoke handlers with ``{"prewarm": true}``."""
+    return isinstance(event, dict) and event.get("prewarm") is True
@@ -0,0 +1,183 @@
+"""Vectorized sunset ephemeris shared by generate-card and sunset-score.
+
+Implements the NOAA solar equations used by astral's ``time_of_transit`` (two-pass refinement,
+apparent solar radius plus refraction) over NumPy arrays of dates and coordinates, and ships a
+precomputed table for the standard viewpoints in ``sunset_table.npz``.
+"""
+import argparse
+import os
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from math import radians, tan
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sunset_table.npz")
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+SUN_APPARENT_RADIUS = 32.0 / (60.0 * 2.0)
+
+# Viewpoints around Lake Shinji and the Izumo coast that the table covers.
+STANDARD_VIEWPOINTS: Dict[str, Tuple[float, float]] = {
+    "yomegashima": (35.4690, 133.0505),
+    "sunset-park": (35.4594, 133.0431),
+    "matsue-default": (35.4680, 133.0480),
+    "inasa-beach": (35.3930, 132.6830),
+    "hinomisaki": (35.4330, 132.6300),
+}
+TABLE_FIRST_YEAR = 2024
+TABLE_LAST_YEAR = 2032
+
+
+def _refraction_at_zenith(zenith: float) -> float:
+    elevation = 90 - zenith
+    if elevation >= 85.0:
+        return 0.0
+    te = tan(radians(elevation))
+    if elevation > 5.0:
+        correction = 58.1 / te - 0.07 / te**3 + 0.000086 / te**5
+    elif elevation > -0.575:
+        correction = 1735.0 + elevation * (-518.2 + elevation * (103.4 + elevation * (-12.79 + elevation * 0.711)))
+    else:
+        correction = -20.774 / te
+    return correction / 3600.0
+
+
+SUNSET_ZENITH = 90.0 + SUN_APPARENT_RADIUS + _refraction_at_zenith(90.0 + SUN_APPARENT_RADIUS)
+
+
+def _transit_minutes(days: np.ndarray, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Minutes after 00:00 UTC of each day (days since 1970-01-01) when the sun sets; NaN if it never does."""
+    lat = np.clip(lat, -89.8, 89.8)
+    lat_rad = np.radians(lat)
+    cos_zenith = np.cos(np.radians(SUNSET_ZENITH))
+    julian_day = days + UNIX_EPOCH_JULIAN_DAY
+    adjustment = np.zeros(np.broadcast(days, lat, lon).shape)
+    time_utc = adjustment
+
+    for _ in range(2):
+        jc = (julian_day + adjustment - 2451545.0) / 36525.0
+        l0 = (280.46646 + jc * (36000.76983 + 0.0003032 * jc)) % 360.0
+        m = 357.52911 + jc * (35999.05029 - 0.0001537 * jc)
+        e = 0.016708634 - jc * (0.000042037 + 0.0000001267 * jc)
+        m_rad = np.radians(m)
+        center = (
+            np.sin(m_rad) * (1.914602 - jc * (0.004817 + 0.000014 * jc))
+            + np.sin(2 * m_rad) * (0.019993 - 0.000101 * jc)
+            + np.sin(3 * m_rad) * 0.000289
+        )
+        omega = np.radians(125.04 - 1934.136 * jc)
+        apparent_long = l0 + center - 0.00569 - 0.00478 * np.sin(omega)
+        seconds = 21.448 - jc * (46.815 + jc * (0.00059 - jc * 0.001813))
+        obliquity = 23.0 + (26.0 + seconds / 60.0) / 60.0 + 0.00256 * np.cos(omega)
+        declination = np.arcsin(np.sin(np.radians(obliquity)) * np.sin(np.radians(apparent_long)))
+
+        y = np.tan(np.radians(obliquity) / 2.0) ** 2
+        l0_rad = np.radians(l0)
+        eq_time = 4.0 * np.degrees(
+            y * np.sin(2 * l0_rad)
+            - 2.0 * e * np.sin(m_rad)
+            + 4.0 * e * y * np.sin(m_rad) * np.cos(2 * l0_rad)
+            - 0.5 * y * y * np.sin(4 * l0_rad)
+            - 1.25 * e * e * np.sin(2 * m_rad)
+        )
+
+        h = (cos_zenith - np.sin(lat_rad) * np.sin(declination)) / (np.cos(lat_rad) * np.cos(declination))
+        hour_angle = np.arccos(np.where(np.abs(h) <= 1.0, h, np.nan))
+        offset = (-lon + np.degrees(hour_angle)) * 4.0 - eq_time
+        offset = np.where(offset < -720.0, offset + 1440.0, offset)
+        time_utc = 720.0 + offset
+        adjustment = time_utc / 1440.0
+
+    return time_utc
+
+
+def sunset_unix(days, lat, lon, utc_offset_seconds=0) -> np.ndarray:
+    """Unix timestamps of sunset for local calendar days (days since 1970-01-01), broadcasting inputs.
+
+    Like astral.sun.sunset, a result that lands on a different local day is recomputed from the
+    neighbouring UTC day.
+    """
+    days = np.asarray(days, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    offset_minutes = np.asarray(utc_offset_seconds, dtype=np.float64) / 60.0
+
+    minutes = _transit_minutes(days, lat, lon)
+    local_day = np.floor((days * 1440.0 + minutes + offset_minutes) / 1440.0)
+    shift = days - local_day
+    if np.any(shift[np.isfinite(shift)] != 0):
+        retry = _transit_minutes(days + shift, lat, lon)
+        minutes = np.where(shift != 0, retry + shift * 1440.0, minutes)
+    return (days * 86400.0 + minutes * 60.0).round()
+
+
+def _day_number(value: date) -> int:
+    return (value - date(1970, 1, 1)).days
+
+
+@lru_cache(maxsize=1)
+def _table() -> Optional[Dict[str, np.ndarray]]:
+    if not os.path.exists(TABLE_PATH):
+        return None
+    with np.load(TABLE_PATH) as data:
+        return {name: data[name] for name in data.files}
+
+
+def _table_lookup(day: int, lat: float, lon: float) -> Optional[int]:
+    table = _table()
+    if table is None:
+        return None
+    matches = np.flatnonzero((np.abs(table["lats"] - lat) < 5e-5) & (np.abs(table["lons"] - lon) < 5e-5))
+    index = day - int(table["first_day"])
+    if matches.size == 0 or not 0 <= index < table["seconds"].shape[1]:
+        return None
+    return day * 86400 + int(table["seconds"][matches[0], index])
+
+
+@lru_cache(maxsize=4096)
+def sunset_timestamp(local_date: date, lat: float, lon: float, utc_offset_seconds: int = 0) -> Optional[int]:
+    """Sunset for one local date: the precomputed table for standard viewpoints, otherwise computed and memoized."""
+    day = _day_number(local_date)
+    if utc_offset_seconds == 9 * 3600:
+        cached = _table_lookup(day, lat, lon)
+        if cached is not None:
+            return cached
+    value = float(sunset_unix(day, lat, lon, utc_offset_seconds))
+    return None if np.isnan(value) else int(value)
+
+
+def sunset_datetime(local_date: date, lat: float, lon: float, tzinfo) -> datetime:
+    offset = tzinfo.utcoffset(datetime(local_date.year, local_date.month, local_date.day, 12))
+    timestamp = sunset_timestamp(local_date, lat, lon, int(offset.total_seconds()) if offset else 0)
+    if timestamp is None:
+        raise ValueError(f"The sun does not set at ({lat}, {lon}) on {local_date}")
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).astimezone(tzinfo)
+
+
+def build_table(path: str = TABLE_PATH, first_year: int = TABLE_FIRST_YEAR, last_year: int = TABLE_LAST_YEAR) -> int:
+    """Write the standard-viewpoint table (JST calendar days, seconds after 00:00 UTC as int32)."""
+    first_day = _day_number(date(first_year, 1, 1))
+    days = np.arange(first_day, _day_number(date(last_year + 1, 1, 1)), dtype=np.float64)
+    lats = np.array([coords[0] for coords in STANDARD_VIEWPOINTS.values()])
+    lons = np.array([coords[1] for coords in STANDARD_VIEWPOINTS.values()])
+    stamps = sunset_unix(days[None, :], lats[:, None], lons[:, None], 9 * 3600)
+    seconds = (stamps - days[None, :] * 86400.0).astype(np.int32)
+    np.savez_compressed(
+        path,
+        names=np.array(list(STANDARD_VIEWPOINTS)),
+        lats=lats,
+        lons=lons,
+        first_day=np.int64(first_day),
+        seconds=seconds,
+    )
+    return os.path.getsize(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the precomputed sunset table")
+    parser.add_argument("--first-year", type=int, default=TABLE_FIRST_YEAR)
+    parser.add_argument("--last-year", type=int, default=TABLE_LAST_YEAR)
+    args = parser.parse_args()
+    size = build_table(first_year=args.first_year, last_year=args.last_year)
+    print(f"Wrote {TABLE_PATH} ({size} bytes)")
@@ -0,0 +1,138 @@
+"""Per-request stage timings written as CloudWatch Embedded Metric Format (EMF) log lines.
+
+A handler calls ``start`` once per request, wraps stages in ``span("name")`` and calls ``emit`` when
+the response is ready; CloudWatch turns the single JSON line into one millisecond metric per stage
+(dimensions Service and Operation) with no PutMetricData calls. Spans that run several times in a
+request (uploads, upstream fetches) keep every duration, so the metric statistics stay per call.
+Unsampled requests (TELEMETRY_SAMPLE_RATE) cost one context-variable read per span.
+"""
+import contextvars
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+NAMESPACE = os.getenv("METRICS_NAMESPACE", "SunsetMatsue")
+SAMPLE_RATE = float(os.getenv("TELEMETRY_SAMPLE_RATE", "1"))
+
+_CURRENT: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("telemetry_trace", default=None)
+
+
+def _write_stdout(record: Dict[str, Any]) -> None:
+    # stdout, not logging: the Lambda log formatter's prefix would stop CloudWatch parsing the JSON.
+    sys.stdout.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+
+_SINK: Callable[[Dict[str, Any]], None] = _write_stdout
+
+
+def set_sink(sink: Callable[[Dict[str, Any]], None]) -> None:
+    """Redirect emitted records (tests and the load-test harness collect them instead of printing)."""
+    global _SINK  # pylint: disable=global-statement
+    _SINK = sink
+
+
+class Trace:
+    __slots__ = ("service", "operation", "request_id", "sampled", "started", "spans")
+
+    def __init__(self, service: str, operation: str, request_id: str, sampled: bool) -> None:
+        self.service = service
+        self.operation = operation
+        self.request_id = request_id
+        self.sampled = sampled
+        self.started = time.perf_counter_ns()
+        self.spans: Dict[str, List[float]] = {}
+
+    def record(self, name: str, elapsed_ns: int) -> None:
+        # list.append is atomic under the GIL, and setdefault on a str key is too.
+        self.spans.setdefault(name, []).append(round(elapsed_ns / 1e6, 3))
+
+    def emit(self, **properties: Any) -> Optional[Dict[str, Any]]:
+        """Write the EMF record (if sampled) and detach the trace from the current context."""
+        if _CURRENT.get() is self:
+            _CURRENT.set(None)
+        if not self.sampled:
+            return None
+        spans = {name: values if len(values) > 1 else values[0] for name, values in self.spans.items()}
+        spans["total"] = round((time.perf_counter_ns() - self.started) / 1e6, 3)
+        record = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": NAMESPACE,
+                        "Dimensions": [["Service", "Operation"]],
+                        "Metrics": [{"Name": name, "Unit": "Milliseconds"} for name in spans],
+                    }
+                ],
+            },
+            "Service": self.service,
+            "Operation": self.operation,
+            "requestId": self.request_id,
+            **properties,
+            **spans,
+        }
+        _SINK(record)
+        return record
+
+
+class _Span:
+    __slots__ = ("trace", "name", "started")
+
+    def __init__(self, trace: Trace, name: str) -> None:
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.trace.record(self.name, time.perf_counter_ns() - self.started)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        return None
+
+
+_NOOP = _NoopSpan()
+
+
+def start(service: str, request_id: str, operation: str = "request", sample_rate: Optional[float] = None) -> Trace:
+    """Begin timing a request; later ``span`` calls in this context record into it."""
+    rate = SAMPLE_RATE if sample_rate is None else sample_rate
+    trace = Trace(service, operation, request_id, rate >= 1 or random.random() < rate)
+    _CURRENT.set(trace)
+    return trace
+
+
+def span(name: str) -> Any:
+    """Context manager timing one stage of the current request; a no-op when there is none."""
+    trace = _CURRENT.get()
+    if trace is None or not trace.sampled:
+        return _NOOP
+    return _Span(trace, name)
+
+
+def bind(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Carry the current trace into ``func`` when it runs on a thread pool."""
+    trace = _CURRENT.get()
+    if trace is None or not trace.sampled:
+        return func
+
+    def bound(*args: Any, **kwargs: Any) -> Any:
+        token = _CURRENT.set(trace)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _CURRENT.reset(token)
+
+    return bound
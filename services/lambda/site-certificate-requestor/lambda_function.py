@@ -1,19 +1,47 @@
 import hashlib
 import json
 import logging
+import math
 import os
+import random
+import threading
 import time
 import urllib.error
 import urllib.request
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
-import boto3
 from botocore.exceptions import ClientError
 
 
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.INFO)
 
+LOOKUP_CONCURRENCY = int(os.environ.get("CERTIFICATE_LOOKUP_CONCURRENCY", "8"))
+DESCRIBE_CACHE_SECONDS = float(os.environ.get("CERTIFICATE_DESCRIBE_CACHE_SECONDS", "5"))
+# Preferred order when several existing certificates match.
+REUSABLE_STATUSES = ("ISSUED", "PENDING_VALIDATION", "INACTIVE")
+POLL_INITIAL_SECONDS = float(os.environ.get("POLL_INITIAL_SECONDS", "2"))
+POLL_BACKOFF = float(os.environ.get("POLL_BACKOFF", "1.5"))
+POLL_MAX_SECONDS = float(os.environ.get("POLL_MAX_SECONDS", "20"))
+POLL_JITTER = float(os.environ.get("POLL_JITTER", "0.2"))
+VALIDATION_WAIT_SECONDS = float(os.environ.get("VALIDATION_WAIT_SECONDS", "400"))
+# Left at the end of an invocation to respond to CloudFormation or hand off.
+INVOCATION_RESERVE_SECONDS = float(os.environ.get("INVOCATION_RESERVE_SECONDS", "15"))
+HANDOFF_ENABLED = os.environ.get("HANDOFF_ENABLED", "0") == "1"
+MAX_HANDOFFS = int(os.environ.get("MAX_HANDOFFS", "6"))
+# Certificates of one batch resolved and waited on at the same time.
+BATCH_CONCURRENCY = int(os.environ.get("CERTIFICATE_BATCH_CONCURRENCY", "10"))
+# Where the last successful result of each resource is kept: a local directory stands in for the table.
+STATE_DIR = (os.environ.get("CERTIFICATE_STATE_DIR") or "").strip()
+STATE_TABLE = (os.environ.get("CERTIFICATE_STATE_TABLE") or "").strip()
+# After this long an unchanged Update re-checks ACM instead of trusting the stored result.
+STATE_MAX_AGE_SECONDS = float(os.environ.get("CERTIFICATE_STATE_MAX_AGE_SECONDS", str(30 * 86400)))
+# change_resource_record_sets request limits.
+MAX_BATCH_RECORDS = 1000
+MAX_BATCH_VALUE_CHARS = 32000
+
 
 def _send_response(
     event: Dict,
@@ -57,84 +85,264 @@ def _send_response(
         LOGGER.error("Network error when responding to CloudFormation: %s", err)
 
 
+@lru_cache(maxsize=None)
+def _client(service: str, region: Optional[str] = None):
+    """Clients are reused by warm invocations; boto3 itself loads on first use, so Delete events skip it."""
+    import boto3  # pylint: disable=import-outside-toplevel
+
+    return boto3.client(service, region_name=region) if region else boto3.client(service)
+
+
 def _normalize_zone_id(zone_id: str) -> str:
     return zone_id.replace("/hostedzone/", "") if zone_id else zone_id
 
 
-def _certificate_matches(certificate: Dict, domain: str, sans: List[str]) -> bool:
+def _key_algorithm(value: Optional[str]) -> Optional[str]:
+    """describe_certificate reports e.g. "RSA-2048" where list/request use "RSA_2048"."""
+    return value.replace("-", "_") if value else value
+
+
+def _certificate_matches(
+    certificate: Dict,
+    domain: str,
+    sans: List[str],
+    key_algorithm: Optional[str] = None
+) -> bool:
     cert_domain = certificate.get("DomainName")
     cert_sans = sorted(
         name for name in certificate.get("SubjectAlternativeNames", []) if name != cert_domain
     )
-    return cert_domain == domain and cert_sans == sorted(sans)
+    if key_algorithm and _key_algorithm(certificate.get("KeyAlgorithm")) != key_algorithm:
+        return False
+    return cert_domain == domain and cert_sans == sorted(set(sans) - {domain})
+
+
+def _summary_may_match(
+    summary: Dict,
+    domain: str,
+    wanted_sans: Set[str],
+    key_algorithm: Optional[str]
+) -> bool:
+    """Rule a certificate out from its list_certificates summary alone, before paying for a describe."""
+    if summary.get("DomainName") != domain:
+        return False
+    # Imported and private certificates cannot be DNS-validated by this resource.
+    if summary.get("Type", "AMAZON_ISSUED") != "AMAZON_ISSUED":
+        return False
+    if key_algorithm and summary.get("KeyAlgorithm") and _key_algorithm(summary["KeyAlgorithm"]) != key_algorithm:
+        return False
+    listed = summary.get("SubjectAlternativeNameSummaries")
+    if listed is None:
+        return True
+    listed_sans = set(listed) - {domain}
+    if summary.get("HasAdditionalSubjectAlternativeNames"):
+        # The summary is truncated: it can still rule out a name we do not want, but not a missing one.
+        return listed_sans <= wanted_sans
+    return listed_sans == wanted_sans
+
+
+class CertificateLookup:
+    """ACM reads for one invocation: each describe is cached for ``max_age`` seconds, so the lookup, the
+    validation-record fetch and the first issuance check share one call per certificate.
+    ``concurrency`` bounds the pool _find_existing_certificate describes candidates on.
+    """
+
+    def __init__(
+        self,
+        acm,
+        concurrency: int = LOOKUP_CONCURRENCY,
+        max_age: float = DESCRIBE_CACHE_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.acm = acm
+        self.concurrency = concurrency
+        self.max_age = max_age
+        self.clock = clock
+        self.describe_calls = 0
+        self._cache: Dict[str, Tuple[float, Dict]] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, arn: str, max_age: Optional[float] = None) -> Dict:
+        """The certificate, reusing a describe younger than ``max_age`` (default: the lookup's; 0 forces a call)."""
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            cached = self._cache.get(arn)
+        if cached and self.clock() - cached[0] < max_age:
+            return cached[1]
+        certificate = self.acm.describe_certificate(CertificateArn=arn)["Certificate"]
+        with self._lock:
+            self._cache[arn] = (self.clock(), certificate)
+            self.describe_calls += 1
+        return certificate
 
 
 def _find_existing_certificate(
-    acm,
+    certificates: CertificateLookup,
     domain: str,
-    sans: List[str]
+    sans: List[str],
+    key_algorithm: Optional[str] = None
 ) -> Optional[Dict]:
-    paginator = acm.get_paginator("list_certificates")
-    sans_set = set(sans)
+    """An existing certificate for exactly ``domain`` + ``sans``, preferring ISSUED, then list order.
+
+    Summaries rule out most certificates without a describe. The rest are described concurrently in
+    preference order and the first confirmed match wins; an ISSUED summary that already shows every
+    name is checked straight away, and when it matches the remaining list pages are not fetched.
+    """
+    wanted_sans = set(sans) - {domain}
+    kwargs: Dict = {"CertificateStatuses": list(REUSABLE_STATUSES)}
+    if key_algorithm:
+        kwargs["Includes"] = {"keyTypes": [key_algorithm]}
+
+    def confirmed(certificate: Dict) -> bool:
+        return certificate.get("Status") in REUSABLE_STATUSES and _certificate_matches(
+            certificate, domain, sans, key_algorithm
+        )
 
-    for page in paginator.paginate(
-        CertificateStatuses=["ISSUED", "PENDING_VALIDATION", "INACTIVE"]
-    ):
+    listed = 0
+    candidates: List[Dict] = []
+    for page in certificates.acm.get_paginator("list_certificates").paginate(**kwargs):
         for summary in page.get("CertificateSummaryList", []):
-            if summary.get("DomainName") != domain:
+            listed += 1
+            if not _summary_may_match(summary, domain, wanted_sans, key_algorithm):
                 continue
-            arn = summary["CertificateArn"]
-            description = acm.describe_certificate(CertificateArn=arn)["Certificate"]
-            cert_sans = set(
-                name
-                for name in description.get("SubjectAlternativeNames", [])
-                if name != description.get("DomainName")
-            )
-            if cert_sans == sans_set:
-                return description
-    return None
-
+            if (
+                summary.get("Status") == "ISSUED"
+                and "SubjectAlternativeNameSummaries" in summary
+                and not summary.get("HasAdditionalSubjectAlternativeNames")
+                and not any(candidate.get("Status") == "ISSUED" for candidate in candidates)
+            ):
+                certificate = certificates.describe(summary["CertificateArn"])
+                if confirmed(certificate):
+                    LOGGER.info("Listed %s certificates; reusing ISSUED %s", listed, summary["CertificateArn"])
+                    return certificate
+                continue
+            candidates.append(summary)
 
-def _ensure_validation_records(
-    acm,
-    route53,
-    certificate_arn: str,
-    hosted_zone_id: str,
-    max_attempts: int = 40,
-    delay_seconds: int = 10
-) -> List[Dict]:
-    """Fetch and UPSERT the DNS validation CNAMEs for the certificate."""
-    normalized_zone_id = _normalize_zone_id(hosted_zone_id)
-    for attempt in range(1, max_attempts + 1):
-        certificate = acm.describe_certificate(CertificateArn=certificate_arn)["Certificate"]
-        dvos = certificate.get("DomainValidationOptions", [])
-        records = [
-            dvo.get("ResourceRecord")
-            for dvo in dvos
+    candidates.sort(key=lambda summary: REUSABLE_STATUSES.index(summary.get("Status", "INACTIVE")))
+    LOGGER.info("Listed %s certificates, %s candidates for %s", listed, len(candidates), domain)
+    with ThreadPoolExecutor(max_workers=certificates.concurrency, thread_name_prefix="acm-describe") as pool:
+        futures = [pool.submit(certificates.describe, summary["CertificateArn"]) for summary in candidates]
+        try:
+            matches = (future.result() for future in futures)
+            return next((certificate for certificate in matches if confirmed(certificate)), None)
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+class HandOff(Exception):
+    """The wait has to continue in a new invocation because this one is close to its timeout."""
+
+    def __init__(self, message: str, certificate_arns: Optional[List[str]] = None) -> None:
+        super().__init__(message)
+        self.certificate_arns = list(certificate_arns or [])
+
+
+class Poller:
+    """Polls with jittered exponential backoff inside a wait budget.
+
+    Checks start ``initial`` seconds apart and back off by ``backoff`` up to ``max_delay``, each delay
+    cut by up to ``jitter``. The budget is ``wait_seconds`` from ``started_at`` (carried across
+    hand-offs) and, given a Lambda ``context``, its remaining time less ``reserve``. A wait that would
+    outlive the invocation raises HandOff when ``handoff`` is set; running out of budget raises TimeoutError.
+    """
+
+    def __init__(
+        self,
+        wait_seconds: float,
+        context: Any = None,
+        started_at: Optional[float] = None,
+        handoff: bool = False,
+        reserve: float = INVOCATION_RESERVE_SECONDS,
+        initial: float = POLL_INITIAL_SECONDS,
+        backoff: float = POLL_BACKOFF,
+        max_delay: float = POLL_MAX_SECONDS,
+        jitter: float = POLL_JITTER,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+        rng: Optional[random.Random] = None
+    ) -> None:
+        self.context = context
+        self.handoff = handoff
+        self.reserve = reserve
+        self.initial = initial
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.started_at = clock() if started_at is None else started_at
+        self.expires_at = self.started_at + wait_seconds
+
+    def invocation_remaining(self) -> float:
+        remaining_ms = getattr(self.context, "get_remaining_time_in_millis", None)
+        return math.inf if remaining_ms is None else remaining_ms() / 1000 - self.reserve
+
+    def delay(self, attempt: int) -> float:
+        return min(self.max_delay, self.initial * self.backoff ** attempt) * (1 - self.jitter * self.rng.random())
+
+    def wait_for(self, check: Callable[[int], Any], what: str, limit: Optional[float] = None) -> Any:
+        """Call ``check(attempt)`` until it returns something other than None, sleeping between calls."""
+        expires_at = self.expires_at if limit is None else min(self.expires_at, self.clock() + limit)
+        attempt = 0
+        while True:
+            result = check(attempt)
+            if result is not None:
+                return result
+            delay = min(self.delay(attempt), expires_at - self.clock())
+            if delay <= 0:
+                raise TimeoutError(f"Timed out after {self.clock() - self.started_at:.0f}s waiting for {what}")
+            if delay > self.invocation_remaining():
+                if self.handoff:
+                    raise HandOff(f"Invocation ending while waiting for {what}")
+                delay = self.invocation_remaining()
+                if delay <= 0:
+                    raise TimeoutError(f"Lambda timeout approaching while waiting for {what}")
+            attempt += 1
+            LOGGER.info("%s not ready (check %s); next check in %.1fs", what, attempt, delay)
+            self.sleep(delay)
+
+
+def _validation_records(certificates: CertificateLookup, certificate_arn: str, poller: Poller) -> List[Dict]:
+    """The DNS validation CNAMEs of the certificate, waiting for ACM to publish them."""
+
+    def check(attempt: int) -> Optional[List[Dict]]:
+        # The first look may reuse the describe that found or requested the certificate.
+        certificate = certificates.describe(certificate_arn, max_age=None if attempt == 0 else 0)
+        unique_records = {
+            dvo["ResourceRecord"]["Name"]: dvo["ResourceRecord"]
+            for dvo in certificate.get("DomainValidationOptions", [])
             if dvo.get("ResourceRecord") and dvo["ValidationStatus"] in ("PENDING_VALIDATION", "SUCCESS")
-        ]
-        unique_records = {}
-        for record in records:
-            unique_records[record["Name"]] = record
-        if unique_records:
-            _upsert_records(route53, normalized_zone_id, list(unique_records.values()))
-            return list(unique_records.values())
-        LOGGER.info(
-            "DomainValidationOptions not ready (attempt %s/%s); sleeping %ss",
-            attempt,
-            max_attempts,
-            delay_seconds
-        )
-        time.sleep(delay_seconds)
+        }
+        return list(unique_records.values()) or None
 
-    raise TimeoutError(
-        f"Timed out waiting for DomainValidationOptions for certificate {certificate_arn}"
+    return poller.wait_for(
+        check, f"DomainValidationOptions of {certificate_arn}", limit=VALIDATION_WAIT_SECONDS
     )
 
 
-def _upsert_records(route53, zone_id: str, records: List[Dict]) -> None:
+def _record_name(name: str) -> str:
+    name = name.lower()
+    return name if name.endswith(".") else name + "."
+
+
+def _current_records(route53, zone_id: str) -> Dict[Tuple[str, str], Set[str]]:
+    """Values of every record set in the zone, keyed by (name, type); one paginated read per zone."""
+    current: Dict[Tuple[str, str], Set[str]] = {}
+    for page in route53.get_paginator("list_resource_record_sets").paginate(HostedZoneId=zone_id):
+        for record_set in page.get("ResourceRecordSets", []):
+            key = (_record_name(record_set["Name"]), record_set["Type"])
+            current[key] = {_record_name(value["Value"]) for value in record_set.get("ResourceRecords", [])}
+    return current
+
+
+def _record_changes(current: Dict[Tuple[str, str], Set[str]], records: List[Dict]) -> List[Dict]:
+    """UPSERTs for the validation records whose value is missing or different in the zone."""
     changes = []
     for record in records:
+        if current.get((_record_name(record["Name"]), record["Type"])) == {_record_name(record["Value"])}:
+            continue
         change = {
             "Action": "UPSERT",
             "ResourceRecordSet": {
@@ -144,37 +352,74 @@ def _upsert_records(route53, zone_id: str, records: List[Dict]) -> None:
                 "ResourceRecords": [{"Value": record["Value"]}]
             }
         }
+        changes.append(change)
+    return changes
+
+
+def _change_batches(changes: List[Dict]) -> List[List[Dict]]:
+    """Split changes into as few change_resource_record_sets calls as the Route 53 request limits allow.
+
+    A request holds at most MAX_BATCH_RECORDS ResourceRecord elements and MAX_BATCH_VALUE_CHARS
+    characters of Value; an UPSERT counts its records and characters twice.
+    """
+    batches: List[List[Dict]] = []
+    records = chars = 0
+    for change in changes:
+        weight = 2 if change["Action"] == "UPSERT" else 1
+        values = change["ResourceRecordSet"].get("ResourceRecords", [])
+        change_records = weight * len(values)
+        change_chars = weight * sum(len(value["Value"]) for value in values)
+        full = records + change_records > MAX_BATCH_RECORDS or chars + change_chars > MAX_BATCH_VALUE_CHARS
+        if not batches or full:
+            batches.append([])
+            records = chars = 0
+        batches[-1].append(change)
+        records += change_records
+        chars += change_chars
+    return batches
+
+
+def _apply_validation_records(route53, records_by_zone: Dict[str, List[Dict]]) -> int:
+    """Bring each zone's validation records up to date; returns the number of changes sent."""
+    sent = 0
+    for zone_id, records in records_by_zone.items():
+        unique_records = list({(_record_name(record["Name"]), record["Type"]): record for record in records}.values())
+        changes = _record_changes(_current_records(route53, zone_id), unique_records)
         LOGGER.info(
-            "UPSERT hosted zone %s: %s %s %s",
-            zone_id,
-            record["Name"],
-            record["Type"],
-            record["Value"]
+            "Hosted zone %s: %s validation records, %s to change", zone_id, len(unique_records), len(changes)
         )
-        changes.append(change)
-    route53.change_resource_record_sets(
-        HostedZoneId=zone_id,
-        ChangeBatch={"Comment": "Ensure ACM validation records", "Changes": changes}
-    )
+        for batch in _change_batches(changes):
+            for change in batch:
+                record_set = change["ResourceRecordSet"]
+                LOGGER.info(
+                    "UPSERT hosted zone %s: %s %s %s",
+                    zone_id,
+                    record_set["Name"],
+                    record_set["Type"],
+                    record_set["ResourceRecords"][0]["Value"]
+                )
+            route53.change_resource_record_sets(
+                HostedZoneId=zone_id,
+                ChangeBatch={"Comment": "Ensure ACM validation records", "Changes": batch}
+            )
+        sent += len(changes)
+    return sent
 
 
 def _wait_for_issuance(
-    acm,
+    certificates: CertificateLookup,
     certificate_arn: str,
-    timeout_seconds: int,
-    poll_seconds: int = 20
+    poller: Poller
 ) -> Dict:
-    deadline = time.time() + timeout_seconds
-    while time.time() < deadline:
-        certificate = acm.describe_certificate(CertificateArn=certificate_arn)["Certificate"]
+    def check(attempt: int) -> Optional[Dict]:
+        certificate = certificates.describe(certificate_arn, max_age=None if attempt == 0 else 0)
         status = certificate.get("Status")
         LOGGER.info("Certificate %s status: %s", certificate_arn, status)
-        if status == "ISSUED":
-            return certificate
         if status in ("FAILED", "VALIDATION_TIMED_OUT", "REVOKED"):
             raise RuntimeError(f"Certificate {certificate_arn} failed with status {status}")
-        time.sleep(poll_seconds)
-    raise TimeoutError(f"Certificate {certificate_arn} still pending validation after {timeout_seconds}s")
+        return certificate if status == "ISSUED" else None
+
+    return poller.wait_for(check, f"issuance of {certificate_arn}")
 
 
 def _request_certificate(
@@ -182,7 +427,8 @@ def _request_certificate(
     domain: str,
     sans: List[str],
     transparency_preference: Optional[str],
-    request_id: str
+    request_id: str,
+    key_algorithm: Optional[str] = None
 ) -> str:
     token = hashlib.sha256(request_id.encode("utf-8")).hexdigest()[:32]
     kwargs = {
@@ -192,6 +438,8 @@ def _request_certificate(
     }
     if sans:
         kwargs["SubjectAlternativeNames"] = sans
+    if key_algorithm:
+        kwargs["KeyAlgorithm"] = key_algorithm
     if transparency_preference:
         kwargs["Options"] = {"CertificateTransparencyLoggingPreference": transparency_preference}
     response = acm.request_certificate(**kwargs)
@@ -199,53 +447,284 @@ def _request_certificate(
     return response["CertificateArn"]
 
 
-def _ensure_certificate(
-    event: Dict,
-    acm,
-    route53,
-    domain: str,
-    sans: List[str],
-    hosted_zone_id: str,
-    transparency_preference: Optional[str],
-    skip_wait: bool,
-    wait_seconds: int,
-    existing_arn: Optional[str]
-) -> Tuple[str, str]:
+def _certificate_specs(props: Dict) -> List[Dict]:
+    """The certificates to ensure: ``Certificates`` entries in batch mode, else the resource itself.
+
+    Batch entries take HostedZoneId, KeyAlgorithm and CertificateTransparencyLoggingPreference from
+    the resource properties when they do not set their own.
+    """
+    keys = ("HostedZoneId", "KeyAlgorithm", "CertificateTransparencyLoggingPreference")
+    defaults = {key: props[key] for key in keys if props.get(key)}
+    specs = []
+    for entry in props.get("Certificates") or [props]:
+        spec = {**defaults, **{key: value for key, value in entry.items() if value}}
+        if not spec.get("DomainName") or not spec.get("HostedZoneId"):
+            raise ValueError("Each certificate needs a DomainName and a HostedZoneId")
+        spec["SubjectAlternativeNames"] = spec.get("SubjectAlternativeNames") or []
+        specs.append(spec)
+    return specs
+
+
+def _map_concurrently(func: Callable[[Any], Any], items: List[Any]) -> List[Any]:
+    """``func`` over ``items`` on a thread pool, in order. Lets every item finish before re-raising, so a
+    HandOff from one wait is raised only once the others have also waited as long as they could.
+    """
+    if len(items) == 1:
+        return [func(items[0])]
+    workers = max(1, min(BATCH_CONCURRENCY, len(items)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="certificate") as pool:
+        futures = [pool.submit(func, item) for item in items]
+    errors = [future.exception() for future in futures if future.exception() is not None]
+    if errors:
+        # Anything other than a hand-off fails the whole batch.
+        raise next((error for error in errors if not isinstance(error, HandOff)), errors[0])
+    return [future.result() for future in futures]
+
+
+def _resolve_certificate(
+    certificates: CertificateLookup,
+    spec: Dict,
+    existing_arn: Optional[str],
+    request_id: str
+) -> Dict:
+    """The certificate from a previous run if it still matches, else an existing match, else a new request."""
+    domain = spec["DomainName"]
+    sans = spec["SubjectAlternativeNames"]
+    key_algorithm = spec.get("KeyAlgorithm")
     certificate = None
-    response_status = "UNKNOWN"
 
     if existing_arn:
         try:
-            certificate = acm.describe_certificate(CertificateArn=existing_arn)["Certificate"]
+            certificate = certificates.describe(existing_arn)
             LOGGER.info("Found existing certificate %s from PhysicalResourceId", existing_arn)
         except ClientError as err:
             if err.response["Error"]["Code"] != "ResourceNotFoundException":
                 raise
 
-    if certificate and not _certificate_matches(certificate, domain, sans):
+    if certificate and not _certificate_matches(certificate, domain, sans, key_algorithm):
         LOGGER.info("Existing certificate %s does not match desired SANs; requesting new certificate", existing_arn)
         certificate = None
 
     if certificate is None:
-        certificate = _find_existing_certificate(acm, domain, sans)
+        certificate = _find_existing_certificate(certificates, domain, sans, key_algorithm)
         if certificate:
             LOGGER.info("Reusing previously issued certificate %s", certificate["CertificateArn"])
 
     if certificate is None:
-        arn = _request_certificate(acm, domain, sans, transparency_preference, event["RequestId"])
-        certificate = acm.describe_certificate(CertificateArn=arn)["Certificate"]
+        arn = _request_certificate(
+            certificates.acm,
+            domain,
+            sans,
+            spec.get("CertificateTransparencyLoggingPreference"),
+            request_id,
+            key_algorithm
+        )
+        certificate = certificates.describe(arn)
+    return certificate
 
-    certificate_arn = certificate["CertificateArn"]
-    _ensure_validation_records(acm, route53, certificate_arn, hosted_zone_id)
 
-    if skip_wait:
-        LOGGER.info("SKIP_WAIT enabled; returning without waiting for issuance")
-        response_status = certificate.get("Status", "PENDING_VALIDATION")
-        return certificate_arn, response_status
+def _ensure_certificates(
+    event: Dict,
+    certificates: CertificateLookup,
+    route53,
+    specs: List[Dict],
+    skip_wait: bool,
+    poller: Poller,
+    existing_arns: List[Optional[str]]
+) -> List[Tuple[str, str]]:
+    """Ensure every certificate in ``specs``; returns (ARN, status) for each, in order.
+
+    Certificates are resolved and their validation records fetched concurrently. The records of all
+    of them are then written with one read and as few change batches as possible per hosted zone,
+    and the issuance waits run concurrently.
+    """
+    def resolve(index: int) -> Dict:
+        existing_arn = existing_arns[index] if index < len(existing_arns) else None
+        # Batch entries share the event's RequestId; the index keeps their idempotency tokens apart.
+        request_id = event["RequestId"] if len(specs) == 1 else f"{event['RequestId']}/{index}"
+        return _resolve_certificate(certificates, specs[index], existing_arn, request_id)
+
+    resolved = _map_concurrently(resolve, list(range(len(specs))))
+    arns = [certificate["CertificateArn"] for certificate in resolved]
+    try:
+        records = _map_concurrently(lambda arn: _validation_records(certificates, arn, poller), arns)
+        records_by_zone: Dict[str, List[Dict]] = {}
+        for spec, certificate_records in zip(specs, records):
+            records_by_zone.setdefault(_normalize_zone_id(spec["HostedZoneId"]), []).extend(certificate_records)
+        _apply_validation_records(route53, records_by_zone)
+
+        if skip_wait:
+            LOGGER.info("SKIP_WAIT enabled; returning without waiting for issuance")
+            return [(arn, certificate.get("Status", "PENDING_VALIDATION")) for arn, certificate in zip(arns, resolved)]
+
+        issued = _map_concurrently(lambda arn: _wait_for_issuance(certificates, arn, poller), arns)
+    except HandOff as handoff:
+        raise HandOff(str(handoff), arns) from handoff
+    return [(arn, certificate.get("Status", "UNKNOWN")) for arn, certificate in zip(arns, issued)]
+
+
+def _ensure_certificate(
+    event: Dict,
+    certificates: CertificateLookup,
+    route53,
+    domain: str,
+    sans: List[str],
+    hosted_zone_id: str,
+    transparency_preference: Optional[str],
+    skip_wait: bool,
+    poller: Poller,
+    existing_arn: Optional[str],
+    key_algorithm: Optional[str] = None
+) -> Tuple[str, str]:
+    spec = {
+        "DomainName": domain,
+        "SubjectAlternativeNames": sans,
+        "HostedZoneId": hosted_zone_id,
+        "KeyAlgorithm": key_algorithm,
+        "CertificateTransparencyLoggingPreference": transparency_preference
+    }
+    return _ensure_certificates(event, certificates, route53, [spec], skip_wait, poller, [existing_arn])[0]
 
-    issued_certificate = _wait_for_issuance(acm, certificate_arn, wait_seconds)
-    response_status = issued_certificate.get("Status", "UNKNOWN")
-    return certificate_arn, response_status
+
+def _fingerprint(props: Dict, region: str) -> Optional[str]:
+    """Hash of the state the properties ask for; None when they do not describe any certificate."""
+    try:
+        specs = _certificate_specs(props)
+    except (KeyError, TypeError, ValueError):
+        return None
+    desired = [
+        [
+            spec["DomainName"],
+            sorted(set(spec["SubjectAlternativeNames"]) - {spec["DomainName"]}),
+            _normalize_zone_id(spec["HostedZoneId"]),
+            spec.get("CertificateTransparencyLoggingPreference") or "",
+            _key_algorithm(spec.get("KeyAlgorithm")) or ""
+        ]
+        for spec in specs
+    ]
+    canonical = json.dumps({"region": region, "certificates": desired}, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LocalStateStore:
+    """Directory-backed stand-in for DynamoStateStore, for local runs and benchmarks."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + ".json")
+
+    def get(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._path(key), encoding="utf-8") as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, record: Dict) -> None:
+        tmp_path = self._path(key) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(record, handle)
+        os.replace(tmp_path, self._path(key))
+
+
+class DynamoStateStore:
+    """State records in a DynamoDB table keyed on ``key``, with ``expiresAt`` as the TTL attribute."""
+
+    def __init__(self, table: str) -> None:
+        self.table = table
+
+    def get(self, key: str) -> Optional[Dict]:
+        response = _client("dynamodb").get_item(TableName=self.table, Key={"key": {"S": key}}, ConsistentRead=True)
+        item = response.get("Item")
+        return json.loads(item["record"]["S"]) if item else None
+
+    def put(self, key: str, record: Dict) -> None:
+        _client("dynamodb").put_item(
+            TableName=self.table,
+            Item={
+                "key": {"S": key},
+                "record": {"S": json.dumps(record)},
+                "expiresAt": {"N": str(int(record["updatedAt"] + STATE_MAX_AGE_SECONDS))}
+            }
+        )
+
+
+def _build_state_store():
+    if STATE_DIR:
+        return LocalStateStore(STATE_DIR)
+    if STATE_TABLE:
+        return DynamoStateStore(STATE_TABLE)
+    return None
+
+
+state_store = _build_state_store()
+
+
+def _state_key(event: Dict) -> str:
+    return f"{event.get('StackId')}/{event.get('LogicalResourceId')}"
+
+
+def _unchanged_result(event: Dict, fingerprint: Optional[str], region: str) -> Optional[Dict]:
+    """The stored result when an Update changes nothing and every certificate was already ISSUED."""
+    if event.get("RequestType") != "Update" or event.get("HandOff") or state_store is None or fingerprint is None:
+        return None
+    old_props = event.get("OldResourceProperties") or {}
+    old_region = old_props.get("Region") or os.environ.get("ACM_REGION", "us-east-1")
+    if _fingerprint(old_props, old_region) != fingerprint:
+        return None
+    try:
+        record = state_store.get(_state_key(event))
+    except Exception:  # pylint: disable=broad-except
+        LOGGER.warning("Could not read certificate state; running the full update", exc_info=True)
+        return None
+    if (
+        not record
+        or record.get("fingerprint") != fingerprint
+        or record.get("physicalResourceId") != event.get("PhysicalResourceId")
+        or not record.get("issued")
+        or time.time() - record.get("updatedAt", 0) > STATE_MAX_AGE_SECONDS
+    ):
+        return None
+    return record
+
+
+def _record_state(
+    event: Dict,
+    fingerprint: Optional[str],
+    physical_resource_id: str,
+    data: Dict,
+    issued: bool
+) -> None:
+    if state_store is None or fingerprint is None:
+        return
+    record = {
+        "fingerprint": fingerprint,
+        "physicalResourceId": physical_resource_id,
+        "data": data,
+        "issued": issued,
+        "updatedAt": time.time()
+    }
+    try:
+        state_store.put(_state_key(event), record)
+    except Exception:  # pylint: disable=broad-except
+        LOGGER.warning("Could not store certificate state", exc_info=True)
+
+
+def _hand_off(event: Dict, context, certificate_arns: List[str], started_at: float) -> None:
+    """Re-invoke this function asynchronously to keep waiting; that invocation responds to CloudFormation."""
+    count = int((event.get("HandOff") or {}).get("Count", 0)) + 1
+    if count > MAX_HANDOFFS:
+        raise TimeoutError(f"Certificates {', '.join(certificate_arns)} still pending after {MAX_HANDOFFS} hand-offs")
+    payload = {**event, "HandOff": {"CertificateArns": certificate_arns, "StartedAt": started_at, "Count": count}}
+    _client("lambda").invoke(
+        FunctionName=context.invoked_function_arn,
+        InvocationType="Event",
+        Payload=json.dumps(payload).encode("utf-8")
+    )
+    LOGGER.info("Handed off the wait for %s to a new invocation (%s/%s)", certificate_arns, count, MAX_HANDOFFS)
 
 
 def handler(event, context):
@@ -256,42 +735,57 @@ def handler(event, context):
         event.get("LogicalResourceId")
     )
     props = event.get("ResourceProperties") or {}
-    domain = props["DomainName"]
-    sans = props.get("SubjectAlternativeNames") or []
-    hosted_zone_id = props["HostedZoneId"]
     region = props.get("Region") or os.environ.get("ACM_REGION", "us-east-1")
-    transparency_preference = props.get("CertificateTransparencyLoggingPreference")
     skip_wait = os.environ.get("SKIP_WAIT", "0") == "1"
     wait_seconds = int(os.environ.get("MAX_WAIT_SECONDS", "900"))
 
-    acm = boto3.client("acm", region_name=region)
-    route53 = boto3.client("route53")
-
     status = "SUCCESS"
     reason = None
     data: Dict[str, str] = {}
     physical_resource_id = event.get("PhysicalResourceId")
+    handoff = event.get("HandOff") or {}
 
     try:
         request_type = event["RequestType"]
-        if request_type in ("Create", "Update"):
-            certificate_arn, certificate_status = _ensure_certificate(
-                event,
-                acm,
-                route53,
-                domain,
-                sans,
-                hosted_zone_id,
-                transparency_preference,
-                skip_wait,
-                wait_seconds,
-                physical_resource_id
+        fingerprint = _fingerprint(props, region) if request_type in ("Create", "Update") else None
+        unchanged = _unchanged_result(event, fingerprint, region)
+        if unchanged:
+            LOGGER.info("Properties unchanged and certificates already issued; skipping ACM and Route 53")
+            data = unchanged["data"]
+        elif request_type in ("Create", "Update"):
+            specs = _certificate_specs(props)
+            # In batch mode the physical ID lists the certificate ARNs in order.
+            existing_arns = handoff.get("CertificateArns") or (physical_resource_id or "").split(",")
+            poller = Poller(wait_seconds, context, handoff.get("StartedAt"), HANDOFF_ENABLED)
+            try:
+                results = _ensure_certificates(
+                    event,
+                    CertificateLookup(_client("acm", region)),
+                    _client("route53"),
+                    specs,
+                    skip_wait,
+                    poller,
+                    [arn or None for arn in existing_arns]
+                )
+            except HandOff as err:
+                _hand_off(event, context, err.certificate_arns, poller.started_at)
+                return
+            physical_resource_id = ",".join(arn for arn, _status in results)
+            if "Certificates" in props:
+                data = {
+                    "CertificateArns": physical_resource_id,
+                    "CertificateStatuses": ",".join(certificate_status for _arn, certificate_status in results)
+                }
+                for index, (certificate_arn, _status) in enumerate(results):
+                    data[f"CertificateArn{index}"] = certificate_arn
+            else:
+                data = {
+                    "CertificateArn": results[0][0],
+                    "CertificateStatus": results[0][1]
+                }
+            _record_state(
+                event, fingerprint, physical_resource_id, data, all(result[1] == "ISSUED" for result in results)
             )
-            physical_resource_id = certificate_arn
-            data = {
-                "CertificateArn": certificate_arn,
-                "CertificateStatus": certificate_status
-            }
         elif request_type == "Delete":
             LOGGER.info("Delete request received; leaving certificate in place for reuse")
             status = "SUCCESS"
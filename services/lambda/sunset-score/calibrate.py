@@ -0,0 +1,298 @@
+"""Offline backtest and calibration of the score parameters against observed sunset quality.
+
+Loads a dataset of scoring inputs with an observed quality label, scores every row under thousands of
+candidate parameter sets at once (parameters broadcast as (K, 1) arrays through scoring.score_arrays)
+in chunks spread over a process pool, and ranks the candidates by how well their scores order the
+labels. The best set is checked on a held-out slice (the latest rows when the dataset has a ``time``
+column) and written as a versioned score_params.json, which scoring.py loads at import.
+Usage: python services/lambda/sunset-score/calibrate.py DATASET [--candidates 4000] [--rounds 3] [--workers N]
+
+DATASET is a .csv with a header row or an .npz, with columns clouds, humidity, wind, visibility, pm25,
+label (any ordinal scale, higher is a better sunset) and optionally time (unix seconds).
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import scoring
+
+# Calibrated parameters and their search bounds; the *_points values stay fixed.
+SEARCH_SPACE: Dict[str, Tuple[float, float]] = {
+    "cloud_optimum": (15, 85),
+    "cloud_slope": (0.2, 1.5),
+    "humidity_threshold": (30, 90),
+    "humidity_slope": (0.1, 2.0),
+    "wind_threshold": (0, 8),
+    "wind_slope": (1, 15),
+    "visibility_threshold": (2000, 10000),
+    "visibility_scale": (100, 1500),
+    "pm25_threshold": (0, 35),
+    "pm25_slope": (0.5, 5.0),
+}
+METRICS = ("spearman", "pairwise", "top_decile")
+CHUNK_CANDIDATES = 32
+PAIR_SAMPLES = 200_000
+
+Dataset = Dict[str, np.ndarray]
+
+_WORKER_DATA: Optional[Dataset] = None
+
+
+def load_dataset(path: str) -> Dataset:
+    required = (*scoring.TERMS, "label")
+    if path.endswith(".npz"):
+        with np.load(path) as archive:
+            columns = {name: np.asarray(archive[name], dtype=np.float64) for name in archive.files}
+    else:
+        with open(path, newline="", encoding="utf-8") as handle:
+            reader = csv.DictReader(handle)
+            names = [name for name in reader.fieldnames or [] if name in (*required, "time")]
+            values = [[float(row[name]) for name in names] for row in reader]
+        matrix = np.array(values, dtype=np.float64).reshape(-1, len(names))
+        columns = {name: matrix[:, index] for index, name in enumerate(names)}
+    missing = [name for name in required if name not in columns]
+    if missing:
+        raise ValueError(f"Dataset {path} is missing columns: {', '.join(missing)}")
+    keep = np.all([np.isfinite(columns[name]) for name in required], axis=0)
+    return {name: values[keep] for name, values in columns.items()}
+
+
+def split(data: Dataset, holdout: float, seed: int) -> Tuple[Dataset, Dataset]:
+    """Hold out the latest ``holdout`` fraction by time, or a random one when there is no time column."""
+    count = len(data["label"])
+    if "time" in data:
+        order = np.argsort(data["time"], kind="stable")
+    else:
+        order = np.random.default_rng(seed).permutation(count)
+    cut = int(round(count * (1 - holdout)))
+    return {name: values[order[:cut]] for name, values in data.items()}, {
+        name: values[order[cut:]] for name, values in data.items()
+    }
+
+
+def prepare(data: Dataset, seed: int) -> Dataset:
+    """float32 inputs plus everything the metrics reuse across candidates: label ranks and sampled pairs."""
+    label = data["label"].astype(np.float64)
+    rng = np.random.default_rng(seed)
+    first = rng.integers(0, len(label), PAIR_SAMPLES)
+    second = rng.integers(0, len(label), PAIR_SAMPLES)
+    differs = label[first] != label[second]
+    label_rank = _average_ranks(label)
+    return {
+        **{name: data[name].astype(np.float32) for name in scoring.TERMS},
+        "label_rank": (label_rank - label_rank.mean()) / (label_rank.std() or 1.0),
+        "good": label >= np.quantile(label, 0.9),
+        "pair_first": first[differs],
+        "pair_second": second[differs],
+        "pair_sign": np.sign(label[first[differs]] - label[second[differs]]).astype(np.int8),
+    }
+
+
+def _average_ranks(values: np.ndarray) -> np.ndarray:
+    """0-based ranks with ties sharing their average rank (clipped scores tie a lot)."""
+    order = np.argsort(values)
+    ordered = values[order]
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    counts = np.diff(np.r_[starts, len(values)])
+    ranks = np.empty(len(values))
+    ranks[order] = np.repeat(starts + (counts - 1) / 2, counts)
+    return ranks
+
+
+def evaluate(candidates: np.ndarray, data: Dataset) -> np.ndarray:
+    """Metrics (rows in METRICS order, one column per candidate) for a (K, len(SEARCH_SPACE)) matrix."""
+    results = np.empty((len(METRICS), len(candidates)))
+    count = len(data["label_rank"])
+    for start in range(0, len(candidates), CHUNK_CANDIDATES):
+        chunk = candidates[start:start + CHUNK_CANDIDATES].astype(np.float32)
+        params: Dict[str, Any] = {name: np.float32(value) for name, value in scoring.PARAMS.items()}
+        params.update({name: chunk[:, [index]] for index, name in enumerate(SEARCH_SPACE)})
+        score, _terms = scoring.score_arrays(*(data[name] for name in scoring.TERMS), params=params)
+
+        ranks = np.stack([_average_ranks(row) for row in score])
+        # From the scores, not the average ranks: when over 10% of rows tie at 100 no average rank
+        # reaches the cut, whereas the quantile keeps every tied maximum in the top decile.
+        top = score >= np.quantile(score, 0.9, axis=1, keepdims=True)
+        ranks = (ranks - ranks.mean(axis=1, keepdims=True)) / np.maximum(ranks.std(axis=1, keepdims=True), 1e-9)
+        results[0, start:start + len(chunk)] = ranks @ data["label_rank"] / count
+
+        diff = score[:, data["pair_first"]] - score[:, data["pair_second"]]
+        agree = (np.sign(diff) == data["pair_sign"]) + 0.5 * (diff == 0)
+        results[1, start:start + len(chunk)] = agree.mean(axis=1)
+
+        results[2, start:start + len(chunk)] = (top & data["good"]).sum(axis=1) / np.maximum(top.sum(axis=1), 1)
+    return results
+
+
+def _init_worker(data: Dataset) -> None:
+    global _WORKER_DATA  # pylint: disable=global-statement
+    _WORKER_DATA = data
+
+
+def _evaluate_in_worker(candidates: np.ndarray) -> np.ndarray:
+    return evaluate(candidates, _WORKER_DATA)  # type: ignore[arg-type]
+
+
+def sample_candidates(
+    count: int, rng: np.random.Generator, around: Optional[np.ndarray] = None, spread: float = 1.0
+) -> np.ndarray:
+    """Latin hypercube over SEARCH_SPACE, or Gaussian perturbations of the ``around`` rows, clipped to bounds."""
+    low, high = (np.array(bound, dtype=np.float64) for bound in zip(*SEARCH_SPACE.values()))
+    if around is None:
+        strata = np.stack([rng.permutation(count) for _ in SEARCH_SPACE], axis=1)
+        return low + (strata + rng.random((count, len(SEARCH_SPACE)))) / count * (high - low)
+    centres = around[rng.integers(0, len(around), count)]
+    return np.clip(centres + rng.normal(0, spread, centres.shape) * (high - low), low, high)
+
+
+def search(
+    train: Dataset,
+    candidates: int,
+    rounds: int,
+    workers: int,
+    metric: str,
+    seed: int,
+    log: Any = print,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """All evaluated candidates and their train metrics; each round after the first refines around the top 1%."""
+    rng = np.random.default_rng(seed)
+    baseline = np.array([[scoring.PARAMS[name] for name in SEARCH_SPACE]])
+    objective = METRICS.index(metric)
+    per_round = max(1, candidates // rounds)
+    evaluated: List[np.ndarray] = []
+    scores: List[np.ndarray] = []
+
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(train,)) if workers > 1 else None
+    try:
+        for number in range(rounds):
+            if number == 0:
+                batch = np.vstack([baseline, sample_candidates(per_round + candidates % rounds - 1, rng)])
+            else:
+                best = np.concatenate(evaluated)[np.argsort(-np.concatenate(scores, axis=1)[objective])]
+                batch = sample_candidates(per_round, rng, best[: max(4, len(best) // 100)], 0.08 / number)
+            started = time.perf_counter()
+            if pool is None:
+                metrics = evaluate(batch, train)
+            else:
+                parts = np.array_split(batch, workers * 4)
+                metrics = np.concatenate(list(pool.map(_evaluate_in_worker, parts)), axis=1)
+            evaluated.append(batch)
+            scores.append(metrics)
+            best_so_far = np.concatenate(scores, axis=1)[objective].max()
+            log(
+                f"round {number + 1}/{rounds}: {len(batch)} candidates in {time.perf_counter() - started:.1f}s, "
+                f"best train {metric} {best_so_far:.4f}"
+            )
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return np.concatenate(evaluated), np.concatenate(scores, axis=1)
+
+
+def as_params(row: np.ndarray) -> Dict[str, float]:
+    params = dict(scoring.PARAMS)
+    params.update({name: round(float(value), 4) for name, value in zip(SEARCH_SPACE, row)})
+    return params
+
+
+def write_params(path: str, params: Dict[str, float], report: Dict[str, Any]) -> str:
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+    created = datetime.now(timezone.utc)
+    version = f"{created:%Y%m%d}-{digest}"
+    document = {"version": version, "createdAt": created.isoformat(timespec="seconds"), "params": params, **report}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(document, handle, indent=2)
+        handle.write("\n")
+    os.replace(tmp_path, path)
+    return version
+
+
+def _dataset_digest(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("dataset")
+    parser.add_argument("--candidates", type=int, default=4000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--metric", choices=METRICS, default="spearman")
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=scoring.PARAMS_PATH)
+    parser.add_argument("--force", action="store_true", help="write even if the holdout does not improve")
+    parser.add_argument("--dry-run", action="store_true", help="report only, write nothing")
+    args = parser.parse_args(argv)
+
+    data = load_dataset(args.dataset)
+    train, holdout = split(data, args.holdout, args.seed)
+    print(f"{len(data['label']):,} rows: {len(train['label']):,} train, {len(holdout['label']):,} holdout")
+    prepared_train, prepared_holdout = prepare(train, args.seed), prepare(holdout, args.seed + 1)
+
+    started = time.perf_counter()
+    evaluated, train_metrics = search(
+        prepared_train, args.candidates, args.rounds, args.workers, args.metric, args.seed
+    )
+    objective = METRICS.index(args.metric)
+    order = np.argsort(-train_metrics[objective])
+    print(f"evaluated {len(evaluated):,} candidates in {time.perf_counter() - started:.1f}s")
+
+    # Re-check the top train candidates on the holdout and keep the best there, next to the baseline (row 0).
+    shortlist = np.vstack([evaluated[:1], evaluated[order[:20]]])
+    holdout_metrics = evaluate(shortlist, prepared_holdout)
+    best = 1 + int(np.argmax(holdout_metrics[objective, 1:]))
+
+    def metrics_of(column: np.ndarray) -> Dict[str, float]:
+        return {name: round(float(value), 4) for name, value in zip(METRICS, column)}
+
+    baseline, chosen = metrics_of(holdout_metrics[:, 0]), metrics_of(holdout_metrics[:, best])
+    print(f"{'holdout':<12}" + "".join(f"{name:>12}" for name in METRICS))
+    for label, metrics in (("current", baseline), ("calibrated", chosen)):
+        print(f"{label:<12}" + "".join(f"{metrics[name]:>12.4f}" for name in METRICS))
+    params = as_params(shortlist[best])
+    print(json.dumps({name: params[name] for name in SEARCH_SPACE}))
+
+    if args.dry_run:
+        return 0
+    if chosen[args.metric] <= baseline[args.metric] and not args.force:
+        print(f"holdout {args.metric} did not improve on the current parameters; not writing (use --force)")
+        return 1
+    version = write_params(
+        args.output,
+        params,
+        {
+            "metric": args.metric,
+            "metrics": {
+                "holdout": chosen,
+                "baselineHoldout": baseline,
+                "train": metrics_of(train_metrics[:, order[best - 1]]),
+            },
+            "dataset": {
+                "name": os.path.basename(args.dataset),
+                "rows": int(len(data["label"])),
+                "sha256": _dataset_digest(args.dataset),
+            },
+            "search": {"candidates": int(len(evaluated)), "rounds": args.rounds, "seed": args.seed},
+        },
+    )
+    print(f"wrote {args.output} (version {version})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+import ephemeris
+
+DAY_SECONDS = 86400
+SLOT_SECONDS = 3 * 3600
+FIELDS = {
+    "clouds": (("clouds", "all"), 50.0),
+    "humidity": (("main", "humidity"), 60.0),
+    "wind": (("wind", "speed"), 3.5),
+    "visibility": (("visibility",), 10000.0),
+}
+
+
+def _field(slot: Dict[str, Any], path: Tuple[str, ...], default: float) -> float:
+    value: Any = slot
+    for key in path:
+        value = value.get(key) if isinstance(value, dict) else None
+    return float(value) if isinstance(value, (int, float)) else default
+
+
+def sunset_timestamps(forecast: Dict[str, Any]) -> List[int]:
+    """Sunsets covered by the forecast window, computed for the city's coordinates in one vectorized call."""
+    slots = forecast.get("list") or []
+    city = forecast.get("city") or {}
+    if not slots:
+        return []
+    window_start = int(slots[0]["dt"]) - SLOT_SECONDS
+    window_end = int(slots[-1]["dt"])
+    offset = int(city.get("timezone", 0))
+
+    coord = city.get("coord") or {}
+    if "lat" in coord and "lon" in coord:
+        days = np.arange((window_start + offset) // DAY_SECONDS, (window_end + offset) // DAY_SECONDS + 1)
+        stamps = ephemeris.sunset_unix(days, float(coord["lat"]), float(coord["lon"]), offset)
+        return [int(stamp) for stamp in stamps if window_start <= stamp <= window_end]
+
+    first_sunset = city.get("sunset")
+    if not first_sunset:
+        return []
+    sunsets = []
+    sunset = int(first_sunset)
+    while sunset <= window_end:
+        if sunset >= window_start:
+            sunsets.append(sunset)
+        sunset += DAY_SECONDS
+    return sunsets
+
+
+def sunset_conditions(
+    forecast: Dict[str, Any],
+    air_forecast: Dict[str, Any],
+) -> List[Tuple[Dict[str, Any], Any]]:
+    """Interpolate forecast slots to each sunset; returns (weather, pm25) pairs for scoring.
+
+    The weather dicts mimic /data/2.5/weather so _compute_score and _extract_sunset apply unchanged.
+    """
+    sunsets = sunset_timestamps(forecast)
+    if not sunsets:
+        return []
+
+    slots = forecast["list"]
+    slot_times = np.array([int(slot["dt"]) for slot in slots], dtype=np.float64)
+    targets = np.array(sunsets, dtype=np.float64)
+    columns = {
+        name: np.interp(targets, slot_times, [_field(slot, path, default) for slot in slots])
+        for name, (path, default) in FIELDS.items()
+    }
+    nearest = np.abs(slot_times[None, :] - targets[:, None]).argmin(axis=1)
+
+    air_slots = air_forecast.get("list") or []
+    pm25_values: List[Any] = [None] * len(sunsets)
+    if air_slots:
+        air_times = np.array([int(slot["dt"]) for slot in air_slots], dtype=np.float64)
+        readings = [_field(slot, ("components", "pm2_5"), np.nan) for slot in air_slots]
+        interpolated = np.interp(targets, air_times, readings, left=np.nan, right=np.nan)
+        pm25_values = [None if np.isnan(value) else round(float(value), 2) for value in interpolated]
+
+    offset = int((forecast.get("city") or {}).get("timezone", 0))
+    conditions = []
+    for index, sunset in enumerate(sunsets):
+        weather = {
+            "clouds": {"all": round(float(columns["clouds"][index]), 1)},
+            "main": {"humidity": round(float(columns["humidity"][index]), 1)},
+            "wind": {"speed": round(float(columns["wind"][index]), 2)},
+            "visibility": round(float(columns["visibility"][index])),
+            "weather": slots[int(nearest[index])].get("weather") or [{}],
+            "sys": {"sunset": sunset},
+            "timezone": offset,
+        }
+        conditions.append((weather, pm25_values[index]))
+    return conditions
@@ -0,0 +1,258 @@
+"""Append-only, columnar history of computed scores, partitioned into time segments on local disk.
+
+Each segment covers SEGMENT_DAYS of computation time and is a directory holding one raw file per
+column (fixed-width little-endian, see COLUMNS) plus ``index.json``. The index records the committed
+row count and, for every block of BLOCK_ROWS rows, the min/max of time, sunset, lat and lon, so a
+query opens only the segments and blocks whose ranges overlap and scans those with NumPy over
+memory-mapped columns. Appends take a per-segment flock, trim any bytes past the committed row count
+(left by an interrupted append), write the columns and then replace the index, so readers never see a
+partial row.
+"""
+import fcntl
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import scoring
+
+HISTORY_DIR = (os.getenv("SCORE_HISTORY_DIR") or "").strip()
+SEGMENT_DAYS = int(os.getenv("SCORE_HISTORY_SEGMENT_DAYS", "7"))
+BLOCK_ROWS = int(os.getenv("SCORE_HISTORY_BLOCK_ROWS", "16384"))
+
+VERSION = 1
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# time: when the score was computed; sunset: the sunset it is for (both unix seconds).
+# The term columns hold the breakdown weights (points contributed), not the raw inputs.
+COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("time", "<u4"),
+    ("sunset", "<u4"),
+    ("lat", "<f4"),
+    ("lon", "<f4"),
+    ("score", "<f2"),
+    *((name, "<f2") for name in scoring.TERMS),
+    ("kind", "u1"),
+)
+KINDS = ("current", "forecast", "batch", "tile")
+# Per-block bounds kept in the index, in this order.
+BOUNDS = ("time", "sunset", "lat", "lon")
+
+
+def _segment_start(timestamp: int, segment_seconds: int) -> int:
+    return timestamp // segment_seconds * segment_seconds
+
+
+def _block_bounds(columns: Dict[str, np.ndarray]) -> List[float]:
+    bounds: List[float] = []
+    for name in BOUNDS:
+        values = columns[name]
+        bounds.extend((float(values.min()), float(values.max())))
+    return bounds
+
+
+def _merge_bounds(left: List[float], right: List[float]) -> List[float]:
+    return [min(a, b) if index % 2 == 0 else max(a, b) for index, (a, b) in enumerate(zip(left, right))]
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats.astype(np.float64)), np.radians(lons.astype(np.float64))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(1.0, a)))
+
+
+class HistoryStore:
+    def __init__(self, directory: str, segment_days: int = SEGMENT_DAYS, block_rows: int = BLOCK_ROWS) -> None:
+        self.directory = directory
+        self.segment_seconds = segment_days * 86400
+        self.block_rows = block_rows
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, rows: Dict[str, Any]) -> int:
+        """Append equally long columns (every name in COLUMNS; ``kind`` may be a KINDS name); returns rows written."""
+        columns: Dict[str, np.ndarray] = {}
+        for name, dtype in COLUMNS:
+            values = rows[name]
+            if name == "kind" and len(values) and isinstance(values[0], str):
+                values = [KINDS.index(kind) for kind in values]
+            columns[name] = np.asarray(values).astype(dtype, copy=False)
+        count = len(columns["time"])
+        if any(len(values) != count for values in columns.values()):
+            raise ValueError("History columns must all have the same length")
+        if not count:
+            return 0
+
+        starts = _segment_start(columns["time"].astype(np.int64), self.segment_seconds)
+        for start in np.unique(starts):
+            selected = starts == start
+            self._append_segment(int(start), {name: values[selected] for name, values in columns.items()})
+        return count
+
+    def query(
+        self,
+        start: int,
+        end: int,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None,
+        radius_km: Optional[float] = None,
+        by: str = "time",
+        columns: Optional[Sequence[str]] = None,
+    ) -> Dict[str, np.ndarray]:
+        """Rows with ``start <= by < end`` (``by`` is "time" or "sunset"), optionally within ``radius_km``.
+
+        Returns one array per requested column (all of COLUMNS by default), in storage order.
+        """
+        if by not in ("time", "sunset"):
+            raise ValueError(f"Cannot query history by {by!r}")
+        names = list(columns or (name for name, _dtype in COLUMNS))
+        dtypes = dict(COLUMNS)
+        box = None
+        if radius_km is not None and lat is not None and lon is not None:
+            span_lat = radius_km / KM_PER_DEGREE
+            span_lon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+            box = (lat - span_lat, lat + span_lat, lon - span_lon, lon + span_lon)
+
+        parts: Dict[str, List[np.ndarray]] = {name: [] for name in names}
+        for segment_start, path in self._segments():
+            # Only "time" decides the partition; sunsets can fall in later segments (forecasts).
+            if by == "time" and (segment_start >= end or segment_start + self.segment_seconds <= start):
+                continue
+            index = self._read_index(path)
+            if index is None or not index["rows"]:
+                continue
+            mapped = {name: self._column(path, name, index["rows"]) for name in {*names, by, "lat", "lon"}}
+            for first, last in self._candidate_ranges(index, start, end, box, by):
+                view = {name: mapped[name][first:last] for name in (by, "lat", "lon")}
+                mask = (view[by] >= start) & (view[by] < end)
+                if box is not None:
+                    mask &= (view["lat"] >= box[0]) & (view["lat"] <= box[1])
+                    mask &= (view["lon"] >= box[2]) & (view["lon"] <= box[3])
+                    hits = np.flatnonzero(mask)
+                    near = haversine_km(lat, lon, view["lat"][hits], view["lon"][hits]) <= radius_km
+                    hits = hits[near]
+                else:
+                    hits = np.flatnonzero(mask)
+                if not hits.size:
+                    continue
+                for name in names:
+                    parts[name].append(np.asarray(mapped[name][first:last][hits]))
+        return {
+            name: np.concatenate(chunks) if chunks else np.empty(0, dtype=dtypes[name])
+            for name, chunks in parts.items()
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        segments = [(start, self._read_index(path)) for start, path in self._segments()]
+        return {
+            "segments": len(segments),
+            "rows": sum(index["rows"] for _start, index in segments if index),
+            "bytesPerRow": sum(np.dtype(dtype).itemsize for _name, dtype in COLUMNS),
+        }
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith("seg-") and name[4:].isdigit():
+                segments.append((int(name[4:]), os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    def _read_index(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(path, "index.json"), encoding="utf-8") as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return None
+
+    def _column(self, path: str, name: str, rows: int) -> np.ndarray:
+        return np.memmap(os.path.join(path, f"{name}.col"), dtype=dict(COLUMNS)[name], mode="r", shape=(rows,))
+
+    def _candidate_ranges(
+        self,
+        index: Dict[str, Any],
+        start: int,
+        end: int,
+        box: Optional[Tuple[float, float, float, float]],
+        by: str,
+    ) -> List[Tuple[int, int]]:
+        """Contiguous row ranges covering every block whose bounds overlap the query."""
+        offset = 2 * BOUNDS.index(by)
+        ranges: List[Tuple[int, int]] = []
+        for number, bounds in enumerate(index["blocks"]):
+            if bounds[offset] >= end or bounds[offset + 1] < start:
+                continue
+            if box is not None and (
+                bounds[5] < box[0] or bounds[4] > box[1] or bounds[7] < box[2] or bounds[6] > box[3]
+            ):
+                continue
+            first = number * index["blockRows"]
+            last = min(index["rows"], first + index["blockRows"])
+            if ranges and ranges[-1][1] == first:
+                ranges[-1] = (ranges[-1][0], last)
+            else:
+                ranges.append((first, last))
+        return ranges
+
+    def _append_segment(self, start: int, columns: Dict[str, np.ndarray]) -> None:
+        path = os.path.join(self.directory, f"seg-{start}")
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, ".lock"), "a", encoding="utf-8") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            index = self._read_index(path) or {
+                "version": VERSION,
+                "start": start,
+                "rows": 0,
+                "blockRows": self.block_rows,
+                "blocks": [],
+            }
+            committed = index["rows"]
+            for name, dtype in COLUMNS:
+                with open(os.open(os.path.join(path, f"{name}.col"), os.O_RDWR | os.O_CREAT, 0o644), "r+b") as handle:
+                    handle.truncate(committed * np.dtype(dtype).itemsize)
+                    handle.seek(0, os.SEEK_END)
+                    handle.write(columns[name].tobytes())
+
+            block_rows = index["blockRows"]
+            count = len(columns["time"])
+            position = 0
+            while position < count:
+                row = committed + position
+                take = min(count - position, block_rows - row % block_rows)
+                bounds = _block_bounds({name: columns[name][position:position + take] for name in BOUNDS})
+                if row % block_rows:
+                    index["blocks"][-1] = _merge_bounds(index["blocks"][-1], bounds)
+                else:
+                    index["blocks"].append(bounds)
+                position += take
+            index["rows"] = committed + count
+
+            tmp_path = os.path.join(path, "index.json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                json.dump(index, handle, separators=(",", ":"))
+            os.replace(tmp_path, os.path.join(path, "index.json"))
+
+
+def rows_from_payloads(kind: str, entries: Sequence[Tuple[float, float, Dict[str, Any]]], now: int) -> Dict[str, Any]:
+    """Columns for ``append`` from (lat, lon, score payload) triples as built by lambda_function._score_payload."""
+    rows: Dict[str, List[Any]] = {name: [] for name, _dtype in COLUMNS}
+    for lat, lon, payload in entries:
+        breakdown = payload.get("breakdown") or {}
+        rows["time"].append(now)
+        # sunsetTimeIso is local wall-clock time labelled UTC, so it cannot be parsed back to unix seconds.
+        rows["sunset"].append(int(payload["sunsetUnix"]))
+        rows["lat"].append(lat)
+        rows["lon"].append(lon)
+        rows["score"].append(payload["score"])
+        for name in scoring.TERMS:
+            rows[name].append((breakdown.get(name) or {}).get("weight", 0.0))
+        rows["kind"].append(KINDS.index(kind))
+    return rows
+
+
+def build_history_store() -> Optional[HistoryStore]:
+    """A store under SCORE_HISTORY_DIR, or None (history disabled) when it is not set."""
+    if not HISTORY_DIR:
+        return None
+    return HistoryStore(HISTORY_DIR)
@@ -1,17 +1,38 @@
+import base64
 import json
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-import requests
+import coldstart
+import ephemeris
+import forecast
+import history
+import openweather
+import score_cache
+import scoring
+import telemetry
+import tiles
 
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.INFO)
 
+SERVICE_NAME = "sunset-score"
 API_KEY = os.getenv("OPENWEATHER_API")
 LAT = os.getenv("LAT", "35.468")
 LON = os.getenv("LON", "133.048")
+BATCH_MAX_POINTS = int(os.getenv("BATCH_MAX_POINTS", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_REQUEST_BUDGET = float(os.getenv("BATCH_REQUEST_BUDGET", "15"))
+
+history_store = history.build_history_store()
+
+# Each batch worker fans out into the openweather pool, so keep this well under its size.
+_BATCH_EXECUTOR = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="batch")
 
 CORS_HEADERS = {
     "Access-Control-Allow-Origin": "https://matsuesunsetai.com",
@@ -21,7 +42,9 @@ CORS_HEADERS = {
 }
 
 
-def lambda_handler(event: Dict[str, Any], _context: Any) -> Dict[str, Any]:
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    if coldstart.is_prewarm_event(event):
+        return coldstart.run_prewarm(prewarm)
     method = (event or {}).get("httpMethod", "GET")
     if method == "OPTIONS":
         return {
@@ -34,36 +57,204 @@ def lambda_handler(event: Dict[str, Any], _context: Any) -> Dict[str, Any]:
         LOGGER.error("OPENWEATHER_API is not configured")
         return _response(500, {"message": "Weather integration not configured"})
 
-    lat, lon = _extract_coords(event)
+    trace = telemetry.start(SERVICE_NAME, getattr(context, "aws_request_id", ""), operation="current")
+    response = _handle_score_request(event, trace)
+    trace.emit(statusCode=response["statusCode"], scoreModel=scoring.PARAMS_VERSION)
+    return response
+
 
+def _handle_score_request(event: Dict[str, Any], trace: telemetry.Trace) -> Dict[str, Any]:
     try:
-        weather = _fetch_weather(lat, lon)
-        air_quality = _fetch_air_quality(lat, lon)
-        pm25 = air_quality.get("list", [{}])[0].get("components", {}).get("pm2_5")
-        score, breakdown = _compute_score(weather, pm25)
-        sunset_time, sunset_iso = _extract_sunset(weather)
-        weather_desc = (weather.get("weather") or [{}])[0].get("description", "weather data").title()
+        with telemetry.span("parse"):
+            points = _extract_points(event)
+            lat, lon = _extract_coords(event)
+            mode = _extract_mode(event)
+    except ValueError as exc:
+        return _response(400, {"message": str(exc)})
+
+    if points is not None:
+        trace.operation = "batch"
+        try:
+            results = _batch_scores(points)
+        except Exception as exc:  # pylint: disable=broad-except
+            LOGGER.exception("Failed to compute batch sunset index")
+            return _response(500, {"message": f"Score computation failed: {exc}"})
+        return _response(200, {"points": results, "count": len(results), "source": "openweather"})
+
+    if mode == "forecast":
+        trace.operation = "forecast"
+        try:
+            days = _forecast_scores(lat, lon)
+        except Exception as exc:  # pylint: disable=broad-except
+            LOGGER.exception("Failed to compute sunset forecast")
+            return _response(500, {"message": f"Score computation failed: {exc}"})
+        return _response(
+            200,
+            {"mode": "forecast", "days": days, "source": "openweather", "coords": {"lat": lat, "lon": lon}},
+        )
+
+    try:
+        with telemetry.span("tile"):
+            payload = _tile_score(lat, lon)
+        payload = payload or _cached_score(lat, lon)
     except Exception as exc:  # pylint: disable=broad-except
         LOGGER.exception("Failed to compute sunset index")
         return _response(500, {"message": f"Score computation failed: {exc}"})
 
-    return _response(
-        200,
+    return _response(200, {**payload, "coords": {"lat": lat, "lon": lon}})
+
+
+def _tile_score(lat: float, lon: float) -> Optional[Dict[str, Any]]:
+    """Answer from the precomputed regional tile; None means fall back to the live path."""
+    hit = tiles.fresh_sample(lat, lon)
+    if hit is None:
+        return None
+    tile, sample = hit
+    weather = {
+        "clouds": {"all": round(sample["clouds"], 1)},
+        "main": {"humidity": round(sample["humidity"], 1)},
+        "wind": {"speed": round(sample["wind"], 2)},
+        "visibility": round(sample["visibility"]),
+        "sys": {"sunset": tile.base_time + int(round(sample["sunset"] * 60))},
+        "timezone": tile.tz_offset,
+    }
+    condition = int(sample["weather"])
+    if condition:
+        weather["weather"] = [{"id": condition, "description": openweather.DESCRIPTIONS.get(condition, "weather data")}]
+    pm25 = round(sample["pm25"], 2)
+    # Score the interpolated inputs rather than interpolating the score, so the breakdown adds up to it.
+    score, breakdown = _compute_score(weather, pm25)
+    payload = _score_payload(weather, pm25, score, breakdown)
+    payload["source"] = "tile"
+    payload["generatedAt"] = tile.generated_at
+    return payload
+
+
+def _cached_score(lat: float, lon: float) -> Dict[str, Any]:
+    cell = score_cache.cell_id(lat, lon)
+    cached, state = score_cache.SCORE_CACHE.lookup(cell)
+    if state == score_cache.FRESH:
+        return cached
+
+    weather, air_quality, fresh = _fetch_conditions(*score_cache.grid_key(lat, lon))
+    pm25 = _extract_pm25(air_quality)
+    with telemetry.span("scoring"):
+        score, breakdown = _compute_score(weather, pm25)
+    payload = _score_payload(weather, pm25, score, breakdown)
+    if fresh:
+        score_cache.SCORE_CACHE.put(cell, payload)
+    _record_history("current", [(*score_cache.grid_key(lat, lon), payload)])
+    return payload
+
+
+def _forecast_scores(lat: float, lon: float) -> List[Dict[str, Any]]:
+    """Score every sunset in the cached multi-day forecast in one vectorized pass."""
+    cell_lat, cell_lon = score_cache.grid_key(lat, lon)
+    results, _fresh = _fetch_cached(
+        cell_lat,
+        cell_lon,
         {
-            "score": round(score, 1),
-            "sunsetTime": sunset_time,
-            "sunsetTimeIso": sunset_iso,
-            "metrics": {
-                "weather": weather_desc,
-                "clouds": weather.get("clouds", {}).get("all"),
-                "humidity": weather.get("main", {}).get("humidity"),
-                "pm25": pm25,
-            },
-            "breakdown": breakdown,
-            "source": "openweather",
-            "coords": {"lat": lat, "lon": lon},
+            "forecast": (
+                score_cache.FORECAST_CACHE,
+                lambda timeout=None: _fetch_forecast(cell_lat, cell_lon, timeout),
+            ),
+            "air_quality": (
+                score_cache.AIR_QUALITY_FORECAST_CACHE,
+                lambda timeout=None: _fetch_air_quality_forecast(cell_lat, cell_lon, timeout),
+            ),
         },
     )
+    with telemetry.span("scoring"):
+        conditions = forecast.sunset_conditions(results["forecast"], results["air_quality"])
+        scores = scoring.score_many(conditions)
+    days = []
+    for (weather, pm25), (score, breakdown) in zip(conditions, scores):
+        payload = _score_payload(weather, pm25, score, breakdown)
+        days.append({"date": payload["sunsetTimeIso"][:10], **payload})
+    _record_history("forecast", [(cell_lat, cell_lon, day) for day in days])
+    return days
+
+
+def _batch_scores(points: List[Tuple[float, float]]) -> List[Dict[str, Any]]:
+    """Fetch each distinct grid cell with bounded concurrency, then score all cells in one pass."""
+    cells = list(dict.fromkeys(score_cache.grid_key(lat, lon) for lat, lon in points))
+    deadline = openweather.Deadline(BATCH_REQUEST_BUDGET)
+    fetch = telemetry.bind(_fetch_conditions)
+    futures = {cell: _BATCH_EXECUTOR.submit(fetch, *cell) for cell in cells}
+
+    conditions: Dict[Tuple[float, float], Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+    errors: Dict[Tuple[float, float], str] = {}
+    for cell, future in futures.items():
+        try:
+            weather, air_quality, _fresh = future.result(timeout=deadline.remaining())
+            conditions[cell] = (weather, air_quality)
+        except FutureTimeoutError:
+            future.cancel()
+            errors[cell] = "Upstream request budget exhausted"
+        except Exception as exc:  # pylint: disable=broad-except
+            LOGGER.warning("Batch fetch failed for cell %s: %s", cell, exc)
+            errors[cell] = str(exc)
+
+    scored_cells = list(conditions)
+    pm25_values = [_extract_pm25(conditions[cell][1]) for cell in scored_cells]
+    with telemetry.span("scoring"):
+        scores = scoring.score_many(
+            [(conditions[cell][0], pm25) for cell, pm25 in zip(scored_cells, pm25_values)]
+        )
+    payloads = {
+        cell: _score_payload(conditions[cell][0], pm25, score, breakdown)
+        for cell, pm25, (score, breakdown) in zip(scored_cells, pm25_values, scores)
+    }
+    _record_history("batch", [(*cell, payload) for cell, payload in payloads.items()])
+
+    results = []
+    for lat, lon in points:
+        cell = score_cache.grid_key(lat, lon)
+        coords = {"lat": lat, "lon": lon}
+        if cell in payloads:
+            results.append({**payloads[cell], "coords": coords})
+        else:
+            results.append({"coords": coords, "error": errors.get(cell, "unavailable")})
+    return results
+
+
+def _record_history(kind: str, entries: List[Tuple[float, float, Dict[str, Any]]]) -> None:
+    """Append computed scores to the history store; never fails the request."""
+    if history_store is None or not entries:
+        return
+    try:
+        with telemetry.span("history"):
+            history_store.append(history.rows_from_payloads(kind, entries, int(time.time())))
+    except Exception:  # pylint: disable=broad-except
+        LOGGER.warning("Failed to record %d %s score(s) to history", len(entries), kind, exc_info=True)
+
+
+def _extract_pm25(air_quality: Dict[str, Any]) -> Any:
+    return air_quality.get("list", [{}])[0].get("components", {}).get("pm2_5")
+
+
+def _score_payload(
+    weather: Dict[str, Any],
+    pm25: Any,
+    score: float,
+    breakdown: Dict[str, Any],
+) -> Dict[str, Any]:
+    sunset_time, sunset_iso, sunset_unix = _extract_sunset(weather)
+    weather_desc = (weather.get("weather") or [{}])[0].get("description", "weather data").title()
+    return {
+        "score": round(score, 1),
+        "sunsetTime": sunset_time,
+        "sunsetTimeIso": sunset_iso,
+        "sunsetUnix": sunset_unix,
+        "metrics": {
+            "weather": weather_desc,
+            "clouds": weather.get("clouds", {}).get("all"),
+            "humidity": weather.get("main", {}).get("humidity"),
+            "pm25": pm25,
+        },
+        "breakdown": breakdown,
+        "source": "openweather",
+    }
 
 
 def _extract_coords(event: Dict[str, Any]) -> Tuple[float, float]:
@@ -73,6 +264,49 @@ def _extract_coords(event: Dict[str, Any]) -> Tuple[float, float]:
     return _coerce_float(lat, LAT), _coerce_float(lon, LON)
 
 
+def _extract_mode(event: Dict[str, Any]) -> str:
+    query = (event or {}).get("queryStringParameters") or {}
+    return str(query.get("mode") or "current").strip().lower()
+
+
+def _extract_points(event: Dict[str, Any]) -> Optional[List[Tuple[float, float]]]:
+    """Return batch coordinates from a POST body or ?points=lat,lon;lat,lon, or None for single mode."""
+    event = event or {}
+    raw_points: Any = None
+    if event.get("httpMethod") == "POST":
+        body = event.get("body") or "{}"
+        if event.get("isBase64Encoded"):
+            body = base64.b64decode(body).decode("utf-8")
+        try:
+            payload = json.loads(body) if isinstance(body, str) else body
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Invalid JSON payload: {exc}") from exc
+        raw_points = (payload or {}).get("points")
+    else:
+        query = event.get("queryStringParameters") or {}
+        if query.get("points"):
+            raw_points = [pair.split(",") for pair in query["points"].split(";") if pair.strip()]
+
+    if raw_points is None:
+        return None
+    if not isinstance(raw_points, list) or not raw_points:
+        raise ValueError("points must be a non-empty list")
+    if len(raw_points) > BATCH_MAX_POINTS:
+        raise ValueError(f"points is limited to {BATCH_MAX_POINTS} entries")
+
+    points = []
+    for raw in raw_points:
+        try:
+            if isinstance(raw, dict):
+                lat, lon = float(raw["lat"]), float(raw["lon"])
+            else:
+                lat, lon = (float(value) for value in raw)
+        except (KeyError, TypeError, ValueError) as exc:
+            raise ValueError(f"Invalid point: {raw!r}") from exc
+        points.append((lat, lon))
+    return points
+
+
 def _coerce_float(value: Any, fallback: str) -> float:
     try:
         return float(value)
@@ -80,8 +314,51 @@ def _coerce_float(value: Any, fallback: str) -> float:
         return float(fallback)
 
 
-def _fetch_weather(lat: float, lon: float) -> Dict[str, Any]:
-    url = "https://api.openweathermap.org/data/2.5/weather"
+def _fetch_conditions(lat: float, lon: float) -> Tuple[Dict[str, Any], Dict[str, Any], bool]:
+    results, all_fresh = _fetch_cached(
+        lat,
+        lon,
+        {
+            "weather": (score_cache.WEATHER_CACHE, lambda timeout=None: _fetch_weather(lat, lon, timeout)),
+            "air_quality": (
+                score_cache.AIR_QUALITY_CACHE,
+                lambda timeout=None: _fetch_air_quality(lat, lon, timeout),
+            ),
+        },
+    )
+    return results["weather"], results["air_quality"], all_fresh
+
+
+def _fetch_cached(
+    lat: float,
+    lon: float,
+    sources: Dict[str, Tuple[score_cache.TTLCache, Callable[..., Dict[str, Any]]]],
+) -> Tuple[Dict[str, Dict[str, Any]], bool]:
+    """Return ({name: payload}, all_fresh), serving stale entries while they refresh."""
+    cell = score_cache.cell_id(lat, lon)
+    results: Dict[str, Dict[str, Any]] = {}
+    calls = {}
+    all_fresh = True
+    for name, (cache, loader) in sources.items():
+        value, state = cache.lookup(cell)
+        if state == score_cache.MISS:
+            calls[name] = loader
+            continue
+        results[name] = value
+        if state == score_cache.STALE:
+            all_fresh = False
+            cache.refresh_async(cell, loader)
+
+    if calls:
+        fetched = openweather.fetch_concurrently(calls)
+        for name, value in fetched.items():
+            sources[name][0].put(cell, value)
+        results.update(fetched)
+
+    return results, all_fresh
+
+
+def _fetch_weather(lat: float, lon: float, timeout: Optional[float] = None) -> Dict[str, Any]:
     params = {
         "lat": lat,
         "lon": lon,
@@ -89,44 +366,69 @@ def _fetch_weather(lat: float, lon: float) -> Dict[str, Any]:
         "units": "metric",
         "lang": "ja",
     }
-    response = requests.get(url, params=params, timeout=8)
-    response.raise_for_status()
-    return response.json()
+    return openweather.get_json("weather", params, timeout)
 
 
-def _fetch_air_quality(lat: float, lon: float) -> Dict[str, Any]:
-    url = "https://api.openweathermap.org/data/2.5/air_pollution"
+def _fetch_air_quality(lat: float, lon: float, timeout: Optional[float] = None) -> Dict[str, Any]:
     params = {"lat": lat, "lon": lon, "appid": API_KEY}
-    response = requests.get(url, params=params, timeout=8)
-    response.raise_for_status()
-    return response.json()
+    return openweather.get_json("air_pollution", params, timeout)
 
 
-def _extract_sunset(weather: Dict[str, Any]) -> Tuple[str, str]:
-    sunset_ts = weather.get("sys", {}).get("sunset")
+def _fetch_forecast(lat: float, lon: float, timeout: Optional[float] = None) -> Dict[str, Any]:
+    params = {
+        "lat": lat,
+        "lon": lon,
+        "appid": API_KEY,
+        "units": "metric",
+        "lang": "ja",
+    }
+    return openweather.get_json("forecast", params, timeout)
+
+
+def _fetch_air_quality_forecast(lat: float, lon: float, timeout: Optional[float] = None) -> Dict[str, Any]:
+    params = {"lat": lat, "lon": lon, "appid": API_KEY}
+    return openweather.get_json("air_pollution/forecast", params, timeout)
+
+
+def _extract_sunset(weather: Dict[str, Any]) -> Tuple[str, str, int]:
+    """(local HH:MM, local wall-clock ISO string, unix seconds); the ISO string is for display only."""
+    sunset_ts = _ephemeris_sunset(weather) or weather.get("sys", {}).get("sunset")
     offset = int(weather.get("timezone", 0))
     if not sunset_ts:
-        now = datetime.now(timezone.utc) + timedelta(seconds=offset)
+        now_utc = datetime.now(timezone.utc)
+        now = now_utc + timedelta(seconds=offset)
         formatted = now.strftime("%H:%M")
-        return formatted, now.isoformat()
+        return formatted, now.isoformat(), int(now_utc.timestamp())
 
     sunset_utc = datetime.fromtimestamp(int(sunset_ts), tz=timezone.utc)
     sunset_local = sunset_utc + timedelta(seconds=offset)
-    return sunset_local.strftime("%H:%M"), sunset_local.isoformat()
+    return sunset_local.strftime("%H:%M"), sunset_local.isoformat(), int(sunset_ts)
+
+
+def _ephemeris_sunset(weather: Dict[str, Any]) -> Optional[int]:
+    """Sunset from the shared ephemeris for the observation's local date, so every service agrees."""
+    coord = weather.get("coord") or {}
+    if "lat" not in coord or "lon" not in coord:
+        return None
+    offset = int(weather.get("timezone", 0))
+    observed_ts = weather.get("dt")
+    observed = datetime.fromtimestamp(int(observed_ts), tz=timezone.utc) if observed_ts else datetime.now(timezone.utc)
+    local_date = (observed + timedelta(seconds=offset)).date()
+    return ephemeris.sunset_timestamp(local_date, round(float(coord["lat"]), 4), round(float(coord["lon"]), 4), offset)
 
 
 def _compute_score(weather: Dict[str, Any], pm25: Any) -> Tuple[float, Dict[str, Any]]:
-    clouds = weather.get("clouds", {}).get("all", 50)
-    humidity = weather.get("main", {}).get("humidity", 60)
-    wind = weather.get("wind", {}).get("speed", 3.5)
-    visibility = weather.get("visibility", 10000) or 10000
-    pm_value = float(pm25) if isinstance(pm25, (int, float)) else 12.0
-
-    cloud_term = max(0, 35 - abs(45 - clouds) * 0.7)
-    humidity_term = max(0, 20 - max(0, humidity - 55) * 0.5)
-    wind_term = max(0, 20 - max(0, wind - 3) * 6)
-    visibility_term = max(0, 15 - max(0, (7000 - visibility) / 400))
-    pm_term = max(0, 30 - max(0, pm_value - 12) * 2)
+    clouds, humidity, wind, visibility, pm_value = scoring.extract_inputs(weather, pm25)
+
+    p = scoring.PARAMS
+
+    cloud_term = max(0, p["cloud_points"] - abs(p["cloud_optimum"] - clouds) * p["cloud_slope"])
+    humidity_term = max(0, p["humidity_points"] - max(0, humidity - p["humidity_threshold"]) * p["humidity_slope"])
+    wind_term = max(0, p["wind_points"] - max(0, wind - p["wind_threshold"]) * p["wind_slope"])
+    visibility_term = max(
+        0, p["visibility_points"] - max(0, (p["visibility_threshold"] - visibility) / p["visibility_scale"])
+    )
+    pm_term = max(0, p["pm25_points"] - max(0, pm_value - p["pm25_threshold"]) * p["pm25_slope"])
 
     score = min(100, cloud_term + humidity_term + wind_term + visibility_term + pm_term)
 
@@ -147,3 +449,16 @@ def _response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
         "headers": CORS_HEADERS,
         "body": json.dumps(body, ensure_ascii=False),
     }
+
+
+def prewarm() -> None:
+    """Map the score tile, exercise the NumPy scoring path and pool a connection to OpenWeather."""
+    tiles.current_tile()
+    _compute_score({}, None)
+    scoring.score_many([({}, None)])
+    _extract_sunset({"coord": {"lat": float(LAT), "lon": float(LON)}, "timezone": 9 * 3600})
+    if API_KEY:
+        coldstart.open_connection(openweather.session(), "head", url=openweather.BASE_URL, timeout=openweather.CONNECT_TIMEOUT)
+
+
+coldstart.register_prewarm(prewarm)
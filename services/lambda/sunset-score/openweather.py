@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional
+
+import telemetry
+
+BASE_URL = "https://api.openweathermap.org/data/2.5"
+CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "2"))
+CALL_TIMEOUT = float(os.getenv("UPSTREAM_CALL_TIMEOUT", "6"))
+REQUEST_BUDGET = float(os.getenv("UPSTREAM_REQUEST_BUDGET", "8"))
+MAX_WORKERS = int(os.getenv("UPSTREAM_MAX_WORKERS", "8"))
+
+# Module-level so warm invocations reuse pooled keep-alive connections and threads. The session
+# (and the requests import behind it) is created on first use, so tile-served requests never pay for it.
+_SESSION: Any = None
+_SESSION_LOCK = threading.Lock()
+_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="openweather")
+
+# Descriptions /data/2.5/weather returns per condition id, for answers rebuilt from a stored id (score tiles).
+DESCRIPTIONS = {
+    200: "thunderstorm with light rain",
+    201: "thunderstorm with rain",
+    202: "thunderstorm with heavy rain",
+    210: "light thunderstorm",
+    211: "thunderstorm",
+    212: "heavy thunderstorm",
+    221: "ragged thunderstorm",
+    230: "thunderstorm with light drizzle",
+    231: "thunderstorm with drizzle",
+    232: "thunderstorm with heavy drizzle",
+    300: "light intensity drizzle",
+    301: "drizzle",
+    302: "heavy intensity drizzle",
+    310: "light intensity drizzle rain",
+    311: "drizzle rain",
+    312: "heavy intensity drizzle rain",
+    313: "shower rain and drizzle",
+    314: "heavy shower rain and drizzle",
+    321: "shower drizzle",
+    500: "light rain",
+    501: "moderate rain",
+    502: "heavy intensity rain",
+    503: "very heavy rain",
+    504: "extreme rain",
+    511: "freezing rain",
+    520: "light intensity shower rain",
+    521: "shower rain",
+    522: "heavy intensity shower rain",
+    531: "ragged shower rain",
+    600: "light snow",
+    601: "snow",
+    602: "heavy snow",
+    611: "sleet",
+    612: "light shower sleet",
+    613: "shower sleet",
+    615: "light rain and snow",
+    616: "rain and snow",
+    620: "light shower snow",
+    621: "shower snow",
+    622: "heavy shower snow",
+    701: "mist",
+    711: "smoke",
+    721: "haze",
+    731: "sand/dust whirls",
+    741: "fog",
+    751: "sand",
+    761: "dust",
+    762: "volcanic ash",
+    771: "squalls",
+    781: "tornado",
+    800: "clear sky",
+    801: "few clouds",
+    802: "scattered clouds",
+    803: "broken clouds",
+    804: "overcast clouds",
+}
+
+
+class UpstreamTimeout(TimeoutError):
+    """Raised when upstream calls do not finish within the request budget."""
+
+
+class Deadline:
+    def __init__(self, budget_seconds: float) -> None:
+        self.expires_at = time.monotonic() + budget_seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def call_timeout(self, per_call: float = CALL_TIMEOUT) -> float:
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise UpstreamTimeout("Upstream request budget exhausted")
+        return min(per_call, remaining)
+
+
+def session() -> Any:
+    global _SESSION  # pylint: disable=global-statement
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                import requests  # pylint: disable=import-outside-toplevel
+                from requests.adapters import HTTPAdapter  # pylint: disable=import-outside-toplevel
+
+                http = requests.Session()
+                http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS, max_retries=0))
+                _SESSION = http
+    return _SESSION
+
+
+def get_json(path: str, params: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+    read_timeout = timeout if timeout is not None else CALL_TIMEOUT
+    with telemetry.span("fetch"):
+        response = session().get(
+            f"{BASE_URL}/{path.lstrip('/')}",
+            params=params,
+            timeout=(min(CONNECT_TIMEOUT, read_timeout), read_timeout),
+        )
+        response.raise_for_status()
+        return response.json()
+
+
+def fetch_concurrently(
+    calls: Dict[str, Callable[[float], Dict[str, Any]]],
+    budget_seconds: float = REQUEST_BUDGET,
+) -> Dict[str, Dict[str, Any]]:
+    """Run each call(timeout) at once and return results by name within one shared budget."""
+    deadline = Deadline(budget_seconds)
+    futures = {name: _EXECUTOR.submit(telemetry.bind(call), deadline.call_timeout()) for name, call in calls.items()}
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        for name, future in futures.items():
+            results[name] = future.result(timeout=deadline.remaining())
+    except FutureTimeoutError as exc:
+        raise UpstreamTimeout(f"Upstream calls exceeded {budget_seconds}s budget") from exc
+    finally:
+        for future in futures.values():
+            future.cancel()
+    return results
@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+GRID_DEGREES = float(os.getenv("SCORE_CACHE_GRID_DEG", "0.05"))
+WEATHER_TTL = float(os.getenv("WEATHER_CACHE_TTL", "300"))
+AIR_QUALITY_TTL = float(os.getenv("AIR_QUALITY_CACHE_TTL", "1800"))
+FORECAST_TTL = float(os.getenv("FORECAST_CACHE_TTL", "3600"))
+STALE_GRACE = float(os.getenv("SCORE_CACHE_STALE_GRACE", "600"))
+MAX_ENTRIES = int(os.getenv("SCORE_CACHE_MAX_ENTRIES", "1024"))
+BACKEND_URL = (os.getenv("SCORE_CACHE_BACKEND") or "").strip()
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+_REFRESHER = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+
+
+def grid_key(lat: float, lon: float, step: float = GRID_DEGREES) -> Tuple[float, float]:
+    """Snap a coordinate to the centre of its grid cell."""
+    if step <= 0:
+        return round(lat, 4), round(lon, 4)
+    return (
+        round(round(lat / step) * step, 6),
+        round(round(lon / step) * step, 6),
+    )
+
+
+def cell_id(lat: float, lon: float) -> str:
+    cell_lat, cell_lon = grid_key(lat, lon)
+    return f"{cell_lat:.6f},{cell_lon:.6f}"
+
+
+class SqliteBackend:
+    """Shared cache backend; a local SQLite file stands in for a networked store."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=1.0)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM cache WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+        if not row:
+            return None
+        return json.loads(row[0]), float(row[1])
+
+    def set(self, namespace: str, key: str, value: Any, stored_at: float) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, stored_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, payload, stored_at),
+            )
+
+
+def backend_from_url(url: str) -> Optional[SqliteBackend]:
+    if not url:
+        return None
+    if url.startswith("sqlite://"):
+        return SqliteBackend(url[len("sqlite://"):] or "/tmp/score-cache.sqlite3")
+    LOGGER.warning("Unsupported SCORE_CACHE_BACKEND %s; using in-process cache only", url)
+    return None
+
+
+class TTLCache:
+    """In-process LRU cache with TTL, stale-while-revalidate and an optional shared backend."""
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: float,
+        stale_grace: float = STALE_GRACE,
+        max_entries: int = MAX_ENTRIES,
+        backend: Optional[SqliteBackend] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_grace = stale_grace
+        self.max_entries = max_entries
+        self.backend = backend
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+
+    def lookup(self, key: str) -> Tuple[Any, str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None and self.backend is not None:
+            try:
+                entry = self.backend.get(self.namespace, key)
+            except sqlite3.Error:
+                LOGGER.exception("Shared cache read failed for %s/%s", self.namespace, key)
+                entry = None
+            if entry is not None:
+                self._store(key, entry[0], entry[1])
+        if entry is None:
+            return None, MISS
+
+        value, stored_at = entry
+        age = self.clock() - stored_at
+        if age <= self.ttl:
+            return value, FRESH
+        if age <= self.ttl + self.stale_grace:
+            return value, STALE
+        return None, MISS
+
+    def put(self, key: str, value: Any) -> None:
+        stored_at = self.clock()
+        self._store(key, value, stored_at)
+        if self.backend is not None:
+            try:
+                self.backend.set(self.namespace, key, value, stored_at)
+            except sqlite3.Error:
+                LOGGER.exception("Shared cache write failed for %s/%s", self.namespace, key)
+
+    def refresh_async(self, key: str, loader: Callable[[], Any]) -> bool:
+        """Schedule a single background refresh per key; returns False if one is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+
+        def _run() -> None:
+            try:
+                self.put(key, loader())
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.exception("Background refresh failed for %s/%s", self.namespace, key)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        _REFRESHER.submit(_run)
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key: str, value: Any, stored_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_BACKEND = backend_from_url(BACKEND_URL)
+WEATHER_CACHE = TTLCache("weather", WEATHER_TTL, backend=_BACKEND)
+AIR_QUALITY_CACHE = TTLCache("air_quality", AIR_QUALITY_TTL, backend=_BACKEND)
+FORECAST_CACHE = TTLCache("forecast", FORECAST_TTL, backend=_BACKEND)
+AIR_QUALITY_FORECAST_CACHE = TTLCache("air_quality_forecast", FORECAST_TTL, backend=_BACKEND)
+SCORE_CACHE = TTLCache("score", WEATHER_TTL, stale_grace=0, backend=_BACKEND)
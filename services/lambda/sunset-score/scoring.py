@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+TERMS = ("clouds", "humidity", "wind", "visibility", "pm25")
+PARAMS_PATH = os.getenv("SCORE_PARAMS_PATH") or os.path.join(os.path.dirname(__file__), "score_params.json")
+
+# Each term is max(0, points - penalty); the points fix the 0-100 scale, the rest is calibrated offline.
+DEFAULT_PARAMS: Dict[str, float] = {
+    "cloud_points": 35,
+    "cloud_optimum": 45,
+    "cloud_slope": 0.7,
+    "humidity_points": 20,
+    "humidity_threshold": 55,
+    "humidity_slope": 0.5,
+    "wind_points": 20,
+    "wind_threshold": 3,
+    "wind_slope": 6,
+    "visibility_points": 15,
+    "visibility_threshold": 7000,
+    "visibility_scale": 400,
+    "pm25_points": 30,
+    "pm25_threshold": 12,
+    "pm25_slope": 2,
+}
+
+
+def load_params(path: str = PARAMS_PATH) -> Tuple[Dict[str, float], str]:
+    """Parameters and version from a file written by calibrate.py; the defaults when there is none."""
+    try:
+        with open(path, encoding="utf-8") as handle:
+            document = json.load(handle)
+    except FileNotFoundError:
+        return dict(DEFAULT_PARAMS), "default"
+    params = {**DEFAULT_PARAMS, **{key: float(value) for key, value in document["params"].items()}}
+    unknown = set(params) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown score parameters in {path}: {sorted(unknown)}")
+    LOGGER.info("Loaded score parameters %s from %s", document["version"], path)
+    return params, str(document["version"])
+
+
+PARAMS, PARAMS_VERSION = load_params()
+
+
+def extract_inputs(weather: Dict[str, Any], pm25: Any) -> Tuple[float, float, float, float, float]:
+    clouds = weather.get("clouds", {}).get("all", 50)
+    humidity = weather.get("main", {}).get("humidity", 60)
+    wind = weather.get("wind", {}).get("speed", 3.5)
+    visibility = weather.get("visibility", 10000) or 10000
+    pm_value = float(pm25) if isinstance(pm25, (int, float)) else 12.0
+    return clouds, humidity, wind, visibility, pm_value
+
+
+def score_arrays(
+    clouds: np.ndarray,
+    humidity: np.ndarray,
+    wind: np.ndarray,
+    visibility: np.ndarray,
+    pm25: np.ndarray,
+    params: Optional[Dict[str, Any]] = None,
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Vectorized form of lambda_function._compute_score over equally shaped arrays.
+
+    ``params`` values may themselves be arrays (e.g. shaped (K, 1)) to score K parameter sets at once.
+    """
+    p = PARAMS if params is None else params
+    terms = {
+        "clouds": np.maximum(0, p["cloud_points"] - np.abs(p["cloud_optimum"] - clouds) * p["cloud_slope"]),
+        "humidity": np.maximum(
+            0, p["humidity_points"] - np.maximum(0, humidity - p["humidity_threshold"]) * p["humidity_slope"]
+        ),
+        "wind": np.maximum(0, p["wind_points"] - np.maximum(0, wind - p["wind_threshold"]) * p["wind_slope"]),
+        "visibility": np.maximum(
+            0,
+            p["visibility_points"]
+            - np.maximum(0, (p["visibility_threshold"] - visibility) / p["visibility_scale"]),
+        ),
+        "pm25": np.maximum(0, p["pm25_points"] - np.maximum(0, pm25 - p["pm25_threshold"]) * p["pm25_slope"]),
+    }
+    score = np.minimum(100, sum(terms.values()))
+    return score, terms
+
+
+def score_many(
+    conditions: Sequence[Tuple[Dict[str, Any], Any]],
+) -> List[Tuple[float, Dict[str, Any]]]:
+    """Score (weather, pm25) pairs in one pass; returns the same shape as _compute_score."""
+    if not conditions:
+        return []
+    rows = [extract_inputs(weather, pm25) for weather, pm25 in conditions]
+    score, terms = score_arrays(*np.array(rows, dtype=np.float64).T)
+
+    results = []
+    for index, raw in enumerate(rows):
+        breakdown = {
+            name: {"value": raw[column], "weight": round(float(terms[name][index]), 1)}
+            for column, name in enumerate(TERMS)
+        }
+        results.append((float(score[index]), breakdown))
+    return results
@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+
+import numpy as np
+
+import ephemeris
+import history
+import lambda_function
+import scoring
+import tiles
+
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+# Default grid covers mainland Shimane and Tottori.
+GRID_LAT_MIN = float(os.getenv("TILE_LAT_MIN", "34.3"))
+GRID_LAT_MAX = float(os.getenv("TILE_LAT_MAX", "35.7"))
+GRID_LON_MIN = float(os.getenv("TILE_LON_MIN", "131.6"))
+GRID_LON_MAX = float(os.getenv("TILE_LON_MAX", "134.5"))
+# 0.25 degrees is 7 x 13 = 91 points, two OpenWeather calls each (weather + air_pollution).
+GRID_STEP = float(os.getenv("TILE_STEP_DEG", "0.25"))
+FETCH_CONCURRENCY = int(os.getenv("TILE_FETCH_CONCURRENCY", "4"))
+# Share of the API key's per-minute limit (60 on the free plan) the job may use; live traffic gets the rest.
+CALLS_PER_MINUTE = float(os.getenv("TILE_CALLS_PER_MINUTE", "30"))
+# Seconds kept back from the Lambda timeout for scoring, writing and uploading the tile.
+WRITE_RESERVE_SECONDS = float(os.getenv("TILE_WRITE_RESERVE_SECONDS", "30"))
+CALLS_PER_POINT = 2
+DEFAULT_TZ_OFFSET = int(os.getenv("TILE_TZ_OFFSET_SECONDS", str(9 * 3600)))
+TILE_OUTPUT_URI = (os.getenv("SCORE_TILE_URI") or "/tmp/score-tile.bin").strip()
+
+
+def build_grid(
+    lat_min: float = GRID_LAT_MIN,
+    lat_max: float = GRID_LAT_MAX,
+    lon_min: float = GRID_LON_MIN,
+    lon_max: float = GRID_LON_MAX,
+    step: float = GRID_STEP,
+) -> tiles.TileGrid:
+    rows = int(round((lat_max - lat_min) / step)) + 1
+    cols = int(round((lon_max - lon_min) / step)) + 1
+    return tiles.TileGrid(lat_min, lon_min, step, step, rows, cols)
+
+
+class CallPacer:
+    """Spaces upstream calls evenly at ``per_minute`` across all fetch threads."""
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.clock = clock
+        self._next_at = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, calls: int, deadline: float) -> bool:
+        """Sleep until ``calls`` may start; False, without waiting, if that would be after ``deadline``."""
+        with self._lock:
+            start_at = max(self._next_at, self.clock())
+            if start_at > deadline:
+                return False
+            self._next_at = start_at + calls * self.interval
+        time.sleep(max(0.0, start_at - self.clock()))
+        return True
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    grid = build_grid()
+    started = time.time()
+    remaining = context.get_remaining_time_in_millis() / 1000 if context else 15 * 60
+    fetch_deadline = time.monotonic() + remaining - WRITE_RESERVE_SECONDS
+    layers, base_time, tz_offset, failures = _score_grid(grid, int(started), fetch_deadline)
+    local_path = TILE_OUTPUT_URI if not TILE_OUTPUT_URI.startswith("s3://") else "/tmp/score-tile.out"
+    size = tiles.write_tile(local_path, grid, layers, int(started), base_time, tz_offset)
+    if TILE_OUTPUT_URI.startswith("s3://"):
+        _upload(local_path, TILE_OUTPUT_URI)
+
+    summary = {
+        "event": "tile.generated",
+        "uri": TILE_OUTPUT_URI,
+        "rows": grid.rows,
+        "cols": grid.cols,
+        "bytes": size,
+        "failedCells": failures,
+        "elapsedSeconds": round(time.time() - started, 2),
+    }
+    LOGGER.info(json.dumps(summary))
+    return summary
+
+
+def _score_grid(
+    grid: tiles.TileGrid, started: int, fetch_deadline: float
+) -> Tuple[Dict[str, np.ndarray], int, int, int]:
+    lat_grid, lon_grid = grid.coordinates()
+    points = [
+        (round(float(lat), 6), round(float(lon), 6)) for lat, lon in zip(lat_grid.ravel(), lon_grid.ravel())
+    ]
+    pacer = CallPacer(CALLS_PER_MINUTE)
+
+    def _fetch(point: Tuple[float, float]) -> Any:
+        # Cells left unfetched are gaps; requests next to them fall back to the live path.
+        if not pacer.reserve(CALLS_PER_POINT, fetch_deadline):
+            return None
+        try:
+            weather, air_quality, _fresh = lambda_function._fetch_conditions(*point)
+            return weather, lambda_function._extract_pm25(air_quality)
+        except Exception as exc:  # pylint: disable=broad-except
+            LOGGER.warning("Tile fetch failed for %s: %s", point, exc)
+            return None
+
+    with ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY) as pool:
+        fetched = list(pool.map(_fetch, points))
+
+    inputs = np.full((len(points), len(scoring.TERMS)), np.nan)
+    conditions = np.zeros(len(points))
+    tz_offset = DEFAULT_TZ_OFFSET
+    for index, item in enumerate(fetched):
+        if item is None:
+            continue
+        weather, pm25 = item
+        inputs[index] = scoring.extract_inputs(weather, pm25)
+        conditions[index] = int((weather.get("weather") or [{}])[0].get("id") or 0)
+        tz_offset = int(weather.get("timezone", tz_offset))
+
+    local_day = (int(time.time()) + tz_offset) // 86400
+    sunsets = ephemeris.sunset_unix(local_day, lat_grid.ravel(), lon_grid.ravel(), tz_offset)
+
+    score, terms = scoring.score_arrays(*inputs.T)
+    _record_history(started, lat_grid.ravel(), lon_grid.ravel(), sunsets, score, terms)
+    base_time = int(np.nanmin(sunsets)) if np.isfinite(sunsets).any() else int(time.time())
+    sunset_minutes = np.nan_to_num((sunsets - base_time) / 60.0, nan=0.0)
+    shape = (grid.rows, grid.cols)
+    clean = np.nan_to_num(inputs, nan=0.0)
+    layers = {
+        "score": score.reshape(shape),
+        "clouds": np.clip(np.rint(clean[:, 0]), 0, 255).reshape(shape),
+        "humidity": np.clip(np.rint(clean[:, 1]), 0, 255).reshape(shape),
+        "wind": clean[:, 2].reshape(shape),
+        "visibility": np.clip(np.rint(clean[:, 3]), 0, 65535).reshape(shape),
+        "pm25": clean[:, 4].reshape(shape),
+        "sunset": np.clip(np.rint(sunset_minutes), 0, 65535).reshape(shape),
+        "weather": np.clip(conditions, 0, 65535).reshape(shape),
+    }
+    failures = sum(1 for item in fetched if item is None)
+    return layers, base_time, tz_offset, failures
+
+
+def _record_history(
+    started: int,
+    lats: np.ndarray,
+    lons: np.ndarray,
+    sunsets: np.ndarray,
+    score: np.ndarray,
+    terms: Dict[str, np.ndarray],
+) -> None:
+    store = history.build_history_store()
+    scored = np.isfinite(score) & np.isfinite(sunsets)
+    if store is None or not scored.any():
+        return
+    rows = {
+        "time": np.full(int(scored.sum()), started),
+        "sunset": sunsets[scored],
+        "lat": lats[scored],
+        "lon": lons[scored],
+        "score": score[scored],
+        "kind": np.full(int(scored.sum()), history.KINDS.index("tile")),
+        **{name: values[scored] for name, values in terms.items()},
+    }
+    try:
+        store.append(rows)
+    except Exception:  # pylint: disable=broad-except
+        LOGGER.exception("Failed to record tile scores to history")
+
+
+def _upload(path: str, uri: str) -> None:
+    import boto3  # pylint: disable=import-outside-toplevel
+
+    bucket, _, key = uri[len("s3://"):].partition("/")
+    boto3.client("s3").upload_file(
+        path,
+        bucket,
+        key,
+        ExtraArgs={"ContentType": "application/octet-stream", "CacheControl": "no-cache"},
+    )
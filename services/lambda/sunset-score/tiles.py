@@ -0,0 +1,207 @@
+import logging
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+import coldstart
+
+LOGGER = logging.getLogger(__name__)
+
+TILE_URI = (os.getenv("SCORE_TILE_URI") or "").strip()
+TILE_MAX_AGE = float(os.getenv("SCORE_TILE_MAX_AGE", "5400"))
+TILE_REFRESH_SECONDS = float(os.getenv("SCORE_TILE_REFRESH_SECONDS", "300"))
+TILE_LOCAL_PATH = os.getenv("SCORE_TILE_LOCAL_PATH", "/tmp/score-tile.bin")
+
+MAGIC = b"SSTL"
+VERSION = 2
+# magic, version, rows, cols, origin lat/lon, step lat/lon, generated_at, base_time, tz offset
+HEADER = struct.Struct("<4sHHHxxddddqqi4x")
+# Fixed-width row-major layers, stored back to back after the header.
+LAYERS: Tuple[Tuple[str, str], ...] = (
+    ("score", "<f2"),
+    ("clouds", "u1"),
+    ("humidity", "u1"),
+    ("wind", "<f2"),
+    ("visibility", "<u2"),
+    ("pm25", "<f2"),
+    ("sunset", "<u2"),  # minutes after base_time
+    ("weather", "<u2"),  # OpenWeather condition id, 0 when unknown
+)
+# Categorical layers: sampled from the nearest cell instead of interpolated.
+NEAREST_LAYERS = ("weather",)
+
+
+@dataclass(frozen=True)
+class TileGrid:
+    origin_lat: float
+    origin_lon: float
+    step_lat: float
+    step_lon: float
+    rows: int
+    cols: int
+
+    def coordinates(self) -> Tuple[np.ndarray, np.ndarray]:
+        lats = self.origin_lat + np.arange(self.rows) * self.step_lat
+        lons = self.origin_lon + np.arange(self.cols) * self.step_lon
+        return np.meshgrid(lats, lons, indexing="ij")
+
+
+def write_tile(
+    path: str,
+    grid: TileGrid,
+    layers: Dict[str, np.ndarray],
+    generated_at: int,
+    base_time: int,
+    tz_offset: int,
+) -> int:
+    """Write layers (each shaped rows x cols) atomically; returns the file size in bytes."""
+    shape = (grid.rows, grid.cols)
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        grid.rows,
+        grid.cols,
+        grid.origin_lat,
+        grid.origin_lon,
+        grid.step_lat,
+        grid.step_lon,
+        generated_at,
+        base_time,
+        tz_offset,
+    )
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(header)
+        for name, dtype in LAYERS:
+            layer = np.asarray(layers[name])
+            if layer.shape != shape:
+                raise ValueError(f"Layer {name} has shape {layer.shape}, expected {shape}")
+            handle.write(np.ascontiguousarray(layer, dtype=dtype).tobytes())
+        size = handle.tell()
+    os.replace(tmp_path, path)
+    return size
+
+
+class ScoreTile:
+    """Read-only, memory-mapped view over a tile written by write_tile."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        raw = np.memmap(path, dtype=np.uint8, mode="r")
+        if raw.size < HEADER.size:
+            raise ValueError(f"Tile {path} is truncated")
+        (
+            magic,
+            version,
+            rows,
+            cols,
+            origin_lat,
+            origin_lon,
+            step_lat,
+            step_lon,
+            self.generated_at,
+            self.base_time,
+            self.tz_offset,
+        ) = HEADER.unpack(raw[: HEADER.size].tobytes())
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Tile {path} has unsupported header {magic!r} v{version}")
+        self.grid = TileGrid(origin_lat, origin_lon, step_lat, step_lon, rows, cols)
+
+        self.layers: Dict[str, np.ndarray] = {}
+        offset = HEADER.size
+        for name, dtype in LAYERS:
+            count = rows * cols
+            layer = np.frombuffer(raw, dtype=dtype, count=count, offset=offset)
+            self.layers[name] = layer.reshape(rows, cols)
+            offset += layer.nbytes
+        if offset != raw.size:
+            raise ValueError(f"Tile {path} size {raw.size} does not match layout {offset}")
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (now if now is not None else time.time()) - self.generated_at
+
+    def sample(self, lat: float, lon: float) -> Optional[Dict[str, float]]:
+        """Bilinearly interpolate every layer at (lat, lon); None if outside or next to a gap.
+
+        Layers in NEAREST_LAYERS take the value of the corner with the largest weight.
+        """
+        grid = self.grid
+        row = (lat - grid.origin_lat) / grid.step_lat
+        col = (lon - grid.origin_lon) / grid.step_lon
+        if not (0 <= row <= grid.rows - 1 and 0 <= col <= grid.cols - 1):
+            return None
+
+        row0 = min(int(row), grid.rows - 2) if grid.rows > 1 else 0
+        col0 = min(int(col), grid.cols - 2) if grid.cols > 1 else 0
+        row1 = min(row0 + 1, grid.rows - 1)
+        col1 = min(col0 + 1, grid.cols - 1)
+        dr, dc = row - row0, col - col0
+        weights = np.array(
+            [(1 - dr) * (1 - dc), (1 - dr) * dc, dr * (1 - dc), dr * dc],
+            dtype=np.float64,
+        )
+
+        sample = {}
+        for name, _dtype in LAYERS:
+            layer = self.layers[name]
+            corners = np.array(
+                [layer[row0, col0], layer[row0, col1], layer[row1, col0], layer[row1, col1]],
+                dtype=np.float64,
+            )
+            if np.isnan(corners).any():
+                return None
+            sample[name] = float(corners[weights.argmax()] if name in NEAREST_LAYERS else corners @ weights)
+        return sample
+
+
+_S3 = coldstart.LazyClient("s3")
+_TILE_LOCK = threading.Lock()
+_TILE_STATE: Dict[str, Any] = {"tile": None, "checked_at": 0.0, "version": None}
+
+
+def current_tile(uri: str = TILE_URI) -> Optional[ScoreTile]:
+    """Return the mapped tile, re-checking the source at most every TILE_REFRESH_SECONDS."""
+    if not uri:
+        return None
+    now = time.monotonic()
+    with _TILE_LOCK:
+        if now - _TILE_STATE["checked_at"] < TILE_REFRESH_SECONDS:
+            return _TILE_STATE["tile"]
+        _TILE_STATE["checked_at"] = now
+        try:
+            path, version = _resolve(uri, _TILE_STATE["version"])
+            if version != _TILE_STATE["version"] or _TILE_STATE["tile"] is None:
+                _TILE_STATE["tile"] = ScoreTile(path)
+                _TILE_STATE["version"] = version
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception("Unable to load score tile from %s", uri)
+        return _TILE_STATE["tile"]
+
+
+def fresh_sample(lat: float, lon: float, max_age: float = TILE_MAX_AGE) -> Optional[Tuple[ScoreTile, Dict[str, float]]]:
+    tile = current_tile()
+    if tile is None or tile.age() > max_age:
+        return None
+    sample = tile.sample(lat, lon)
+    if sample is None:
+        return None
+    return tile, sample
+
+
+def _resolve(uri: str, known_version: Optional[str]) -> Tuple[str, str]:
+    """Map a tile URI to a local path plus a version marker (mtime or S3 ETag)."""
+    if not uri.startswith("s3://"):
+        return uri, str(os.stat(uri).st_mtime_ns)
+
+    bucket, _, key = uri[len("s3://"):].partition("/")
+    etag = _S3.head_object(Bucket=bucket, Key=key)["ETag"]
+    if etag != known_version or not os.path.exists(TILE_LOCAL_PATH):
+        tmp_path = f"{TILE_LOCAL_PATH}.download"
+        _S3.download_file(bucket, key, tmp_path)
+        os.replace(tmp_path, TILE_LOCAL_PATH)
+    return TILE_LOCAL_PATH, etag